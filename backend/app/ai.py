@@ -0,0 +1,397 @@
+"""Expectiminimax move search for bot seats and move suggestions.
+
+Positions are searched as a tree of chance nodes (the die roll of the seat
+to move) and decision nodes (the move chosen for a roll). With more than two
+players every node is valued as a vector of scores, one per seat, and each
+seat picks the move best for itself relative to the others (max-n). Depth is
+counted in turns; iterative deepening stops at the time budget and keeps the
+best move of the deepest completed iteration.
+
+Chance node values are cached in a transposition table keyed by a Zobrist
+hash of every piece, the seat to move and the 6s and penalty counters. The
+table is bounded and evicts least recently used entries; it is per process
+and shared by all searches in it, so consecutive turns of a game reuse it.
+
+The search uses its own compact copy of the rules on flat tuples, with the
+same semantics as game_state; benchmarks/check_ai.py compares the two.
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import struct
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .game_logic import ABSOLUTE_POSITIONS, BOARD_SIZE, MAX_POSITION
+from .game_state import GameState
+from .models import GameStatus, PlayerColor
+
+# Seconds a single move decision may take
+AI_TIME_BUDGET = float(os.getenv("AI_TIME_BUDGET", "0.05"))
+AI_MAX_DEPTH = int(os.getenv("AI_MAX_DEPTH", "8"))
+AI_TT_SIZE = int(os.getenv("AI_TT_SIZE", "200000"))
+# Processes running searches; 0 runs them on one background thread
+AI_WORKERS = int(os.getenv("AI_WORKERS", str(os.cpu_count() or 1)))
+# Searches queued or running at once; further decisions get a one-turn search in place
+AI_MAX_PENDING = int(os.getenv("AI_MAX_PENDING", str(2 * max(AI_WORKERS, 1))))
+
+PIECES = 4
+MAX_SEATS = 4
+PENALTY_TURNS = 4
+WIN_SCORE = 1000.0
+
+# Fixed seed: hashes must agree between processes and restarts
+_rng = random.Random(0x5EED)
+PIECE_KEYS = [[[_rng.getrandbits(64) for _ in range(MAX_POSITION + 2)] for _ in range(PIECES)]
+              for _ in range(MAX_SEATS)]
+SEAT_KEYS = [_rng.getrandbits(64) for _ in range(MAX_SEATS)]
+SIX_KEYS = [[_rng.getrandbits(64) for _ in range(2)] for _ in range(MAX_SEATS)]
+SKIP_KEYS = [[_rng.getrandbits(64) for _ in range(PENALTY_TURNS + 1)] for _ in range(MAX_SEATS)]
+COLOR_KEYS = {color: [_rng.getrandbits(64) for _ in range(MAX_SEATS)] for color in PlayerColor}
+
+
+class Position(NamedTuple):
+    # PIECES positions per seat, relative to the seat's color as in PlayerState.pieces
+    pieces: Tuple[int, ...]
+    seat: int
+    sixes: Tuple[int, ...]
+    skips: Tuple[int, ...]
+    # Seat that won, -1 while the game goes on
+    winner: int
+    key: int
+
+
+class Suggestion(NamedTuple):
+    piece_index: int
+    to_position: int
+    # Expected score of the mover relative to the other seats
+    value: float
+    depth: int
+    nodes: int
+    elapsed: float
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    """Bounded map of position hash -> packed (depth, values) with least recently used eviction.
+
+    Entries live in two generations of max_entries / 2. A hit in the old
+    generation moves the entry to the new one; when the new one is full the
+    old one, holding only entries unused since, is dropped. Plain dicts of
+    ints and bytes are never tracked by the garbage collector, which would
+    otherwise stall searches for tens of milliseconds walking the table.
+    """
+
+    def __init__(self, max_entries: int = AI_TT_SIZE):
+        self.max_entries = max_entries
+        self.new: Dict[int, bytes] = {}
+        self.old: Dict[int, bytes] = {}
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.new) + len(self.old)
+
+    def clear(self) -> None:
+        self.new, self.old = {}, {}
+
+    def get(self, key: int) -> Optional[bytes]:
+        entry = self.new.get(key)
+        if entry is None:
+            entry = self.old.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.put(key, entry)
+        self.hits += 1
+        return entry
+
+    def put(self, key: int, entry: bytes) -> None:
+        if len(self.new) >= self.max_entries // 2 and key not in self.new:
+            self.old, self.new = self.new, {}
+        self.new[key] = entry
+
+
+table = TranspositionTable()
+
+
+def position_key(pieces: Sequence[int], seat: int, sixes: Sequence[int], skips: Sequence[int]) -> int:
+    key = SEAT_KEYS[seat]
+    for s in range(len(sixes)):
+        key ^= SIX_KEYS[s][min(sixes[s], 1)] ^ SKIP_KEYS[s][skips[s]]
+        for i in range(PIECES):
+            key ^= PIECE_KEYS[s][i][pieces[s * PIECES + i] + 1]
+    return key
+
+
+class Search:
+    def __init__(self, colors: Sequence[PlayerColor], deadline: float, tt: TranspositionTable = table):
+        self.seats = len(colors)
+        self.squares = [ABSOLUTE_POSITIONS[c] for c in colors]
+        # Positions of different color line-ups never share entries
+        self.salt = 0
+        for seat, color in enumerate(colors):
+            self.salt ^= COLOR_KEYS[color][seat]
+        self.deadline = deadline
+        self.tt = tt
+        # Table entries: depth, then the value of each seat
+        self.entry = struct.Struct(f"<B{self.seats}d")
+        self.nodes = 0
+        self.check_time = False
+
+    # Rules (same semantics as game_state.valid_moves / move_piece)
+
+    def board(self, pieces: Tuple[int, ...]) -> Dict[int, List[Tuple[int, int]]]:
+        """Absolute main-track square -> (seat, piece index) of the pieces on it, in seat order"""
+        squares: Dict[int, List[Tuple[int, int]]] = {}
+        for s in range(self.seats):
+            absolute = self.squares[s]
+            for i in range(PIECES):
+                p = pieces[s * PIECES + i]
+                if 0 <= p < BOARD_SIZE:
+                    squares.setdefault(absolute[p + 1], []).append((s, i))
+        return squares
+
+    def moves(self, pos: Position, die: int, board: Dict[int, List[Tuple[int, int]]]) -> List[Tuple[int, int]]:
+        """(piece index, new position) of the valid moves; pieces sharing a position give one move"""
+        s = pos.seat
+        base = s * PIECES
+        own = pos.pieces[base:base + PIECES]
+        result = []
+        seen = set()
+        for i, p in enumerate(own):
+            if p in seen:
+                continue
+            seen.add(p)
+            if p == -1:
+                if die == 6:
+                    result.append((i, 0))
+                continue
+            new = p + die
+            if new >= BOARD_SIZE:
+                if new > MAX_POSITION or new in own:
+                    continue
+            else:
+                occupants = board.get(self.squares[s][new + 1])
+                # A stack of 2+ pieces of one opponent blocks the square
+                if occupants and len(occupants) > 1:
+                    counts = Counter(t for t, _ in occupants if t != s)
+                    if counts and max(counts.values()) >= 2:
+                        continue
+            result.append((i, new))
+        return result
+
+    def _finish(self, pos: Position, pieces: List[int], key: int, seat: int,
+                sixes: List[int], skips: List[int], winner: int) -> Position:
+        s = pos.seat
+        key ^= SEAT_KEYS[s] ^ SEAT_KEYS[seat]
+        key ^= SIX_KEYS[s][min(pos.sixes[s], 1)] ^ SIX_KEYS[s][min(sixes[s], 1)]
+        key ^= SKIP_KEYS[s][pos.skips[s]] ^ SKIP_KEYS[s][skips[s]]
+        return Position(tuple(pieces), seat, tuple(sixes), tuple(skips), winner, key)
+
+    def play(self, pos: Position, piece: int, new: int, die: int,
+             board: Dict[int, List[Tuple[int, int]]]) -> Position:
+        s = pos.seat
+        base = s * PIECES
+        pieces = list(pos.pieces)
+        key = pos.key
+        key ^= PIECE_KEYS[s][piece][pieces[base + piece] + 1] ^ PIECE_KEYS[s][piece][new + 1]
+        pieces[base + piece] = new
+        if new < BOARD_SIZE:
+            found = [o for o in board.get(self.squares[s][new + 1], ()) if o[0] != s]
+            if found:
+                t = found[0][0]
+                of_t = [i for seat, i in found if seat == t]
+                # Only a lone piece is captured; the first opponent with pieces there decides
+                if len(of_t) == 1:
+                    i = of_t[0]
+                    key ^= PIECE_KEYS[t][i][pieces[t * PIECES + i] + 1] ^ PIECE_KEYS[t][i][0]
+                    pieces[t * PIECES + i] = -1
+        sixes = list(pos.sixes)
+        skips = list(pos.skips)
+        seat, winner = s, -1
+        if all(p >= BOARD_SIZE for p in pieces[base:base + PIECES]):
+            winner = s
+            sixes[s] = 0
+        elif die == 6:
+            sixes[s] += 1
+            if sixes[s] >= 2:
+                skips[s] = PENALTY_TURNS
+                sixes[s] = 0
+                seat = (s + 1) % self.seats
+        else:
+            sixes[s] = 0
+            seat = (s + 1) % self.seats
+        return self._finish(pos, pieces, key, seat, sixes, skips, winner)
+
+    def skip(self, pos: Position) -> Position:
+        """No valid move for the roll: the turn passes"""
+        return self._finish(pos, list(pos.pieces), pos.key, (pos.seat + 1) % self.seats,
+                            list(pos.sixes), list(pos.skips), -1)
+
+    def serve_penalty(self, pos: Position) -> Position:
+        skips = list(pos.skips)
+        skips[pos.seat] -= 1
+        return self._finish(pos, list(pos.pieces), pos.key, (pos.seat + 1) % self.seats,
+                            list(pos.sixes), skips, -1)
+
+    # Search
+
+    def evaluate(self, pos: Position) -> Tuple[float, ...]:
+        """Heuristic score per seat: progress of the pieces, less turns still to skip"""
+        scores = []
+        for s in range(self.seats):
+            if pos.winner == s:
+                scores.append(WIN_SCORE)
+                continue
+            total = 0.0
+            for p in pos.pieces[s * PIECES:(s + 1) * PIECES]:
+                if p >= BOARD_SIZE:
+                    total += 60 + 2 * (p - BOARD_SIZE)
+                elif p >= 0:
+                    total += 10 + p
+            scores.append(total - 6 * pos.skips[s])
+        return tuple(scores)
+
+    def utility(self, values: Tuple[float, ...], seat: int) -> float:
+        """A seat's score relative to the others (proportional to its lead over their mean)"""
+        return self.seats * values[seat] - sum(values)
+
+    def chance(self, pos: Position, depth: int) -> Tuple[float, ...]:
+        if pos.winner >= 0 or depth == 0:
+            return self.evaluate(pos)
+        self.nodes += 1
+        if self.check_time and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        key = pos.key ^ self.salt
+        entry = self.tt.get(key)
+        if entry is not None and entry[0] >= depth:
+            return self.entry.unpack(entry)[1:]
+        if pos.skips[pos.seat] > 0:
+            values = self.chance(self.serve_penalty(pos), depth - 1)
+        else:
+            totals = [0.0] * self.seats
+            board = self.board(pos.pieces)
+            for die in range(1, 7):
+                values, _ = self.decide(pos, die, depth, board)
+                for s in range(self.seats):
+                    totals[s] += values[s]
+            values = tuple(t / 6 for t in totals)
+        self.tt.put(key, self.entry.pack(depth, *values))
+        return values
+
+    def decide(self, pos: Position, die: int, depth: int,
+               board: Dict[int, List[Tuple[int, int]]]) -> Tuple[Tuple[float, ...], int]:
+        """Values after the best move for the roll, and that move's index in moves() (-1 if none)"""
+        moves = self.moves(pos, die, board)
+        if not moves:
+            return self.chance(self.skip(pos), depth - 1), -1
+        best, best_index, best_utility = None, -1, float("-inf")
+        for index, (piece, new) in enumerate(moves):
+            values = self.chance(self.play(pos, piece, new, die, board), depth - 1)
+            u = self.utility(values, pos.seat)
+            if u > best_utility:
+                best, best_index, best_utility = values, index, u
+        return best, best_index
+
+
+def search_move(
+    colors: Sequence[PlayerColor],
+    pieces: Sequence[int],
+    seat: int,
+    sixes: Sequence[int],
+    skips: Sequence[int],
+    die: int,
+    budget: float = AI_TIME_BUDGET,
+    max_depth: int = AI_MAX_DEPTH,
+) -> Optional[Suggestion]:
+    """Best move for `seat` after rolling `die`, by iterative deepening within budget seconds.
+
+    Takes plain values so it can run in a worker process. None if there is no valid move.
+    """
+    started = time.perf_counter()
+    search = Search(colors, started + budget)
+    pos = Position(tuple(pieces), seat, tuple(sixes), tuple(skips), -1,
+                   position_key(pieces, seat, sixes, skips))
+    board = search.board(pos.pieces)
+    moves = search.moves(pos, die, board)
+    if not moves:
+        return None
+    best = None
+    for depth in range(1, max_depth + 1):
+        # The first iteration always completes, so there is always an answer
+        search.check_time = depth > 1
+        try:
+            values, index = search.decide(pos, die, depth, board)
+        except SearchTimeout:
+            break
+        piece, new = moves[index]
+        best = Suggestion(piece, new, search.utility(values, seat), depth, search.nodes,
+                          time.perf_counter() - started)
+        if len(moves) == 1 or time.perf_counter() > search.deadline:
+            break
+    return best._replace(nodes=search.nodes, elapsed=time.perf_counter() - started)
+
+
+def search_args(state: GameState, die: int) -> tuple:
+    return (
+        [p.color for p in state.players],
+        [pos for p in state.players for pos in p.pieces],
+        state.current_player_index,
+        [p.consecutive_sixes for p in state.players],
+        [p.turns_to_skip for p in state.players],
+        die,
+    )
+
+
+def suggest(state: GameState, die: int, budget: float = AI_TIME_BUDGET) -> Optional[Suggestion]:
+    """Best move for the current player of state after rolling die (in this thread)"""
+    if state.status != GameStatus.IN_PROGRESS:
+        return None
+    return search_move(*search_args(state, die), budget)
+
+
+_executor: Optional[Executor] = None
+_pending = 0
+
+
+def executor() -> Executor:
+    global _executor
+    if _executor is None:
+        # One thread at most: searches are CPU bound, so more threads would only contend for the GIL
+        if AI_WORKERS <= 0:
+            _executor = ThreadPoolExecutor(1, "ai")
+        else:
+            # Not fork: workers start on demand, and a forked one would inherit the sockets open
+            # at the time and keep them from closing after the server is done with them
+            _executor = ProcessPoolExecutor(AI_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _executor
+
+
+async def choose(args: tuple, budget: float = AI_TIME_BUDGET) -> Optional[Suggestion]:
+    """search_move on search_args() off the event loop.
+
+    Takes the arguments rather than the state, so callers can snapshot a
+    live state and let go of it for the search. With AI_MAX_PENDING
+    searches already waiting the move comes from a one-turn search instead.
+    """
+    global _pending
+    if _pending >= AI_MAX_PENDING:
+        return search_move(*args, budget, max_depth=1)
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor(), search_move, *args, budget)
+    finally:
+        _pending -= 1
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,353 @@
+"""Vectorized batch simulator for Monte Carlo rule and balance analysis.
+
+Advances thousands of games in lockstep with NumPy. Each step performs one
+turn action per live game with the same semantics as the API: a player
+serving a consecutive-6s penalty loses the turn, otherwise the die is rolled,
+one valid move is chosen uniformly at random (can_move_piece / check_capture
+rules) and the turn passes unless a 6 was rolled; with no valid move the turn
+is skipped, as the client does.
+
+Usage:
+    python -m app.batch_sim --games 100000 --players 4
+    python -m app.batch_sim --games 50000 --no-six-penalty --json
+
+Requires the optional numpy dependency (poetry install -E sim).
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .game_logic import BOARD_SIZE, MAX_POSITION, START_POSITIONS
+from .models import PlayerColor
+
+COLOR_ORDER: List[PlayerColor] = [PlayerColor.RED, PlayerColor.BLUE, PlayerColor.GREEN, PlayerColor.YELLOW]
+START_SQUARES = np.array([START_POSITIONS[c] for c in COLOR_ORDER], dtype=np.int16)
+SEATS = 4
+PIECES = 4
+
+
+@dataclass(frozen=True)
+class RuleVariant:
+    # Two consecutive 6s make the player skip `penalty_turns` turns
+    six_penalty: bool = True
+    penalty_turns: int = 4
+    # A stack of 2+ opponent pieces blocks the square for landing
+    stack_blocking: bool = True
+
+
+def move_options(
+    pieces: np.ndarray,
+    start: np.ndarray,
+    seat: np.ndarray,
+    dice: np.ndarray,
+    stack_blocking: bool = True,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Bulk can_move_piece for every piece of the moving seat.
+
+    pieces: (n, 4 seats, 4 pieces) relative positions, start: (n, 4) start
+    square per seat, seat: (n,) moving seat, dice: (n,) die values.
+    Returns (valid, new_position, target, counts, absolute): valid,
+    new_position and the absolute target square are (n, 4 pieces);
+    counts[i, s, k] is the number of seat s opponent pieces on piece k's
+    target square and absolute holds every piece's absolute square (-1 when
+    off the main track, and for the moving seat).
+    """
+    n = len(seat)
+    rows = np.arange(n)
+    own = pieces[rows, seat].astype(np.int16)
+    dice = dice.astype(np.int16)[:, None]
+
+    home = own == -1
+    new = np.where(home, 0, own + dice)
+    valid = np.where(home, dice == 6, True)
+
+    # Entering or moving inside the finish area: no overshoot, no stacking
+    finish = ~home & (new >= BOARD_SIZE)
+    in_own = (
+        (new == own[:, 0:1]) | (new == own[:, 1:2]) | (new == own[:, 2:3]) | (new == own[:, 3:4])
+    )
+    valid &= ~finish | ((new <= MAX_POSITION) & ~in_own)
+
+    # Absolute target squares on the main track and opponent counts there
+    target = (new + start[rows, seat][:, None]) % BOARD_SIZE
+    everyone = pieces.astype(np.int16)
+    on_board = (everyone >= 0) & (everyone < BOARD_SIZE)
+    on_board[rows, seat] = False
+    absolute = np.where(on_board, (everyone + start[:, :, None]) % BOARD_SIZE, -1)
+    counts = np.zeros((n, SEATS, PIECES), dtype=np.int8)
+    for piece in range(PIECES):
+        counts += absolute[:, :, piece, None] == target[:, None, :]
+
+    if stack_blocking:
+        main_track = ~home & (new < BOARD_SIZE)
+        blocked = (counts >= 2).any(axis=1)
+        valid &= ~(main_track & blocked)
+    return valid, new, target, counts, absolute
+
+
+def resolve_captures(
+    counts: np.ndarray, absolute: np.ndarray, target: np.ndarray, to_position: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bulk check_capture for chosen moves.
+
+    counts: (m, 4 seats) opponent pieces on the target square per seat,
+    absolute: (m, 4 seats, 4 pieces) as returned by move_options, target and
+    to_position: (m,). Opponents are checked in seat order; the first one
+    present on the square is captured only if it is a single piece.
+    Returns (captured, seat, piece_index).
+    """
+    present = counts > 0
+    first_seat = present.argmax(axis=1)
+    rows = np.arange(len(counts))
+    captured = present.any(axis=1) & (counts[rows, first_seat] == 1) & (to_position < BOARD_SIZE)
+    piece_index = (absolute[rows, first_seat] == target[:, None]).argmax(axis=1)
+    return captured, first_seat, piece_index
+
+
+def finished(own: np.ndarray) -> np.ndarray:
+    """Bulk check_winner: (n, 4 pieces) relative positions -> (n,) all pieces in the finish area"""
+    return (own >= BOARD_SIZE).all(axis=1)
+
+
+class BatchEngine:
+    """A batch of independent games advanced in lockstep"""
+
+    def __init__(
+        self,
+        num_games: int,
+        num_players: int = 4,
+        rules: RuleVariant = RuleVariant(),
+        rng: Optional[np.random.Generator] = None,
+        colors: Optional[Sequence[PlayerColor]] = None,
+        random_colors: bool = False,
+    ):
+        if not 2 <= num_players <= SEATS:
+            raise ValueError("num_players must be between 2 and 4")
+        self.num_games = num_games
+        self.num_players = num_players
+        self.rules = rules
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        # Seats join in color order like the API does, unless overridden
+        if random_colors:
+            keys = self.rng.random((num_games, SEATS))
+            seat_colors = np.argsort(keys, axis=1)[:, :num_players]
+        else:
+            chosen = colors or COLOR_ORDER[:num_players]
+            if len(chosen) != num_players or len(set(chosen)) != num_players:
+                raise ValueError("colors must list one distinct color per player")
+            seat_colors = np.tile([COLOR_ORDER.index(c) for c in chosen], (num_games, 1))
+        self.colors = seat_colors.astype(np.int8)
+        self.start = np.zeros((num_games, SEATS), dtype=np.int16)
+        self.start[:, :num_players] = START_SQUARES[self.colors]
+
+        self.pieces = np.full((num_games, SEATS, PIECES), -1, dtype=np.int8)
+        self.current = np.zeros(num_games, dtype=np.int8)
+        self.consecutive_sixes = np.zeros((num_games, SEATS), dtype=np.int8)
+        self.turns_to_skip = np.zeros((num_games, SEATS), dtype=np.int8)
+        self.winner = np.full(num_games, -1, dtype=np.int8)
+        self.turns = np.zeros(num_games, dtype=np.int32)
+        self.moves = np.zeros(num_games, dtype=np.int32)
+
+    def _advance(self, games: np.ndarray) -> None:
+        self.current[games] = (self.current[games] + 1) % self.num_players
+
+    def step(self, max_turns: int) -> int:
+        """Perform one turn action in every live game; returns the number of live games"""
+        live = np.nonzero((self.winner < 0) & (self.turns < max_turns))[0]
+        if len(live) == 0:
+            return 0
+        self.turns[live] += 1
+        seat = self.current[live].astype(np.intp)
+
+        # Players serving the consecutive-6s penalty lose the turn without rolling
+        penalized = self.turns_to_skip[live, seat] > 0
+        games = live[penalized]
+        self.turns_to_skip[games, seat[penalized]] -= 1
+        self._advance(games)
+
+        games, seat = live[~penalized], seat[~penalized]
+        dice = self.rng.integers(1, 7, size=len(games), dtype=np.int8)
+        valid, new, target, counts, absolute = move_options(
+            self.pieces[games], self.start[games], seat, dice, self.rules.stack_blocking
+        )
+
+        # Pick one valid move uniformly at random; no valid move skips the turn
+        has_move = valid.any(axis=1)
+        self._advance(games[~has_move])
+        scores = np.where(valid, self.rng.random(valid.shape), -1.0)
+        choice = scores.argmax(axis=1)[has_move]
+        games, seat, dice = games[has_move], seat[has_move], dice[has_move]
+        rows = np.nonzero(has_move)[0]
+        to = new[rows, choice]
+
+        captured, cap_seat, cap_piece = resolve_captures(
+            counts[rows, :, choice], absolute[rows], target[rows, choice], to
+        )
+        self.pieces[games[captured], cap_seat[captured], cap_piece[captured]] = -1
+        self.pieces[games, seat, choice] = to
+        self.moves[games] += 1
+
+        won = finished(self.pieces[games, seat])
+        self.winner[games[won]] = seat[won]
+        games, seat, dice = games[~won], seat[~won], dice[~won]
+
+        six = dice == 6
+        self.consecutive_sixes[games[~six], seat[~six]] = 0
+        self._advance(games[~six])
+        games, seat = games[six], seat[six]
+        sixes = np.minimum(self.consecutive_sixes[games, seat] + 1, 2)
+        self.consecutive_sixes[games, seat] = sixes
+        if self.rules.six_penalty:
+            penalty = sixes >= 2
+            self.turns_to_skip[games[penalty], seat[penalty]] = self.rules.penalty_turns
+            self.consecutive_sixes[games[penalty], seat[penalty]] = 0
+            self._advance(games[penalty])
+        return len(live)
+
+    def run(self, max_turns: int = 5000) -> None:
+        while self.step(max_turns):
+            pass
+
+
+def simulate(
+    num_games: int,
+    num_players: int = 4,
+    rules: RuleVariant = RuleVariant(),
+    batch_size: int = 10000,
+    seed: Optional[int] = None,
+    colors: Optional[Sequence[PlayerColor]] = None,
+    random_colors: bool = False,
+    max_turns: int = 5000,
+) -> Dict:
+    """Run num_games games in batches and aggregate the results"""
+    batches = -(-num_games // batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(batches)
+    winners, win_colors, turns, moves = [], [], [], []
+    started = time.perf_counter()
+    for i, batch_seed in enumerate(seeds):
+        size = min(batch_size, num_games - i * batch_size)
+        engine = BatchEngine(
+            size, num_players, rules, np.random.default_rng(batch_seed), colors, random_colors
+        )
+        engine.run(max_turns)
+        finished = engine.winner >= 0
+        winners.append(engine.winner[finished])
+        win_colors.append(engine.colors[np.nonzero(finished)[0], engine.winner[finished]])
+        turns.append(engine.turns[finished])
+        moves.append(engine.moves[finished])
+    elapsed = time.perf_counter() - started
+
+    winners = np.concatenate(winners)
+    win_colors = np.concatenate(win_colors)
+    turns = np.concatenate(turns)
+    moves = np.concatenate(moves)
+    finished = len(winners)
+
+    def distribution(values: np.ndarray) -> Dict:
+        if len(values) == 0:
+            return {}
+        p = np.percentile(values, [10, 50, 90, 99])
+        return {
+            "mean": float(values.mean()),
+            "std": float(values.std()),
+            "min": int(values.min()),
+            "p10": float(p[0]),
+            "p50": float(p[1]),
+            "p90": float(p[2]),
+            "p99": float(p[3]),
+            "max": int(values.max()),
+        }
+
+    return {
+        "games": num_games,
+        "players": num_players,
+        "rules": {
+            "six_penalty": rules.six_penalty,
+            "penalty_turns": rules.penalty_turns,
+            "stack_blocking": rules.stack_blocking,
+        },
+        "finished": finished,
+        "unfinished": num_games - finished,
+        "win_rate_by_seat": {
+            seat: float((winners == seat).sum() / max(finished, 1)) for seat in range(num_players)
+        },
+        "win_rate_by_color": {
+            color.value: float((win_colors == idx).sum() / max(finished, 1))
+            for idx, color in enumerate(COLOR_ORDER)
+            if random_colors or color in (colors or COLOR_ORDER[:num_players])
+        },
+        "turns": distribution(turns),
+        "moves": distribution(moves),
+        "elapsed_seconds": elapsed,
+        "games_per_second": num_games / elapsed if elapsed else 0.0,
+    }
+
+
+def _print_report(report: Dict) -> None:
+    rules = report["rules"]
+    print(f"Games: {report['games']} ({report['players']} players), "
+          f"finished: {report['finished']}, unfinished: {report['unfinished']}")
+    print(f"Rules: six_penalty={rules['six_penalty']} (skip {rules['penalty_turns']}), "
+          f"stack_blocking={rules['stack_blocking']}")
+    print("\nWin rate by seat:")
+    for seat, rate in report["win_rate_by_seat"].items():
+        print(f"  seat {seat}: {rate:7.2%}")
+    print("Win rate by color:")
+    for color, rate in report["win_rate_by_color"].items():
+        print(f"  {color:<7} {rate:7.2%}")
+    for name in ("turns", "moves"):
+        d = report[name]
+        if d:
+            print(f"\nGame length ({name}): mean {d['mean']:.1f} ± {d['std']:.1f}, "
+                  f"min {d['min']}, p10 {d['p10']:.0f}, p50 {d['p50']:.0f}, "
+                  f"p90 {d['p90']:.0f}, p99 {d['p99']:.0f}, max {d['max']}")
+    print(f"\nThroughput: {report['games_per_second']:,.0f} games/s "
+          f"({report['elapsed_seconds']:.2f} s)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Monte Carlo batch simulator for Ne Se Sardi rule analysis")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--players", type=int, default=4, choices=[2, 3, 4])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=5000,
+                        help="Turn actions after which a game is abandoned as unfinished")
+    parser.add_argument("--colors", type=str, default=None,
+                        help="Comma-separated seat colors, e.g. red,green (default: join order)")
+    parser.add_argument("--random-colors", action="store_true",
+                        help="Assign a random color to each seat in every game")
+    parser.add_argument("--no-six-penalty", action="store_true",
+                        help="Disable the two-consecutive-6s skip penalty")
+    parser.add_argument("--penalty-turns", type=int, default=4)
+    parser.add_argument("--no-stack-blocking", action="store_true",
+                        help="Allow landing on a stack of 2+ opponent pieces")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    colors = [PlayerColor(c.strip().lower()) for c in args.colors.split(",")] if args.colors else None
+    rules = RuleVariant(
+        six_penalty=not args.no_six_penalty,
+        penalty_turns=args.penalty_turns,
+        stack_blocking=not args.no_stack_blocking,
+    )
+    report = simulate(
+        args.games, args.players, rules, args.batch_size, args.seed,
+        colors, args.random_colors, args.max_turns,
+    )
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
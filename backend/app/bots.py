@@ -0,0 +1,130 @@
+"""Pluggable bot strategies built on game_logic move generation.
+
+A strategy picks one of the valid moves returned by game_state.valid_moves
+for the player whose turn it is. Strategies are stateless so that the same
+instance can drive any number of seats and games.
+"""
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, List, Type
+
+from . import ai, game_logic
+from .game_logic import BOARD_SIZE, START_POSITIONS
+from .game_state import GameState, PlayerState, opponents_board
+
+
+def threat_count(state: GameState, player: PlayerState, square: int) -> int:
+    """Number of opponent pieces that could land on the absolute square with one roll"""
+    threats = 0
+    for opp in state.players:
+        if opp.id == player.id:
+            continue
+        start = START_POSITIONS[opp.color]
+        for pos in opp.pieces:
+            if pos == -1:
+                # A piece at home enters on its start square with a 6
+                threats += square == start
+            elif pos < BOARD_SIZE:
+                distance = (square - game_logic.get_absolute_position(pos, opp.color)) % BOARD_SIZE
+                # Opponents turn into their finish area instead of passing it
+                if 1 <= distance <= 6 and pos + distance < BOARD_SIZE:
+                    threats += 1
+    return threats
+
+
+class BotStrategy(ABC):
+    """Base class for bot strategies"""
+    name = "base"
+
+    @abstractmethod
+    def choose_move(
+        self,
+        state: GameState,
+        player: PlayerState,
+        dice_value: int,
+        moves: List[dict],
+        rng: random.Random,
+    ) -> dict:
+        """One of moves for the player to play with dice_value"""
+
+    @staticmethod
+    def captures(state: GameState, player: PlayerState, move: dict) -> bool:
+        board = opponents_board(state, player)
+        players = [(p.id, p.color) for p in state.players if p.id != player.id]
+        return game_logic.board_capture(board, move["to_position"], player.color, players) is not None
+
+
+class RandomBot(BotStrategy):
+    """Picks any valid move uniformly at random"""
+    name = "random"
+
+    def choose_move(self, state, player, dice_value, moves, rng):
+        return rng.choice(moves)
+
+
+class GreedyCaptureBot(BotStrategy):
+    """Captures when possible, then finishes pieces, then advances the leading piece"""
+    name = "greedy"
+
+    def choose_move(self, state, player, dice_value, moves, rng):
+        def score(move: dict):
+            return (
+                self.captures(state, player, move),
+                move["to_position"] >= BOARD_SIZE,
+                move["from_position"] == -1,
+                move["from_position"],
+            )
+        return max(moves, key=score)
+
+
+class SafetyFirstBot(BotStrategy):
+    """Minimizes the number of own pieces exposed to capture after the move"""
+    name = "safe"
+
+    def exposure(self, state: GameState, player: PlayerState, pieces: List[int]) -> int:
+        squares: Dict[int, int] = {}
+        for pos in pieces:
+            if 0 <= pos < BOARD_SIZE:
+                square = game_logic.get_absolute_position(pos, player.color)
+                squares[square] = squares.get(square, 0) + 1
+        # Stacks of 2+ pieces cannot be captured
+        return sum(
+            1 for square, count in squares.items()
+            if count == 1 and threat_count(state, player, square) > 0
+        )
+
+    def choose_move(self, state, player, dice_value, moves, rng):
+        def score(move: dict):
+            pieces = list(player.pieces)
+            pieces[move["piece_index"]] = move["to_position"]
+            return (
+                -self.exposure(state, player, pieces),
+                self.captures(state, player, move),
+                move["to_position"] >= BOARD_SIZE,
+                move["to_position"],
+            )
+        return max(moves, key=score)
+
+
+class ExpectiminimaxBot(BotStrategy):
+    """Searches ahead over dice rolls within AI_TIME_BUDGET (see ai.py)"""
+    name = "ai"
+
+    def choose_move(self, state, player, dice_value, moves, rng):
+        suggestion = ai.suggest(state, dice_value)
+        for move in moves:
+            if suggestion is not None and move["piece_index"] == suggestion.piece_index:
+                return move
+        return moves[0]
+
+
+STRATEGIES: Dict[str, Type[BotStrategy]] = {
+    cls.name: cls for cls in (RandomBot, GreedyCaptureBot, SafetyFirstBot, ExpectiminimaxBot)
+}
+
+
+def get_strategy(name: str) -> BotStrategy:
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown strategy '{name}', choose from: {', '.join(STRATEGIES)}")
@@ -0,0 +1,139 @@
+"""Game join codes without uniqueness checks.
+
+A code is the 6-character base-36 form of a counter value scrambled by a
+keyed permutation of [0, 36^6). Distinct counter values always give distinct
+codes, and games created one after another do not get neighbouring codes.
+
+Each worker reserves counter values in blocks of CODE_BLOCK_SIZE with one
+UPDATE of the game_code_counter row, in its own short transaction, and hands
+them out from memory, so creating a game is a single INSERT with no
+pre-check. Codes of games the reaper archives go to free_game_codes and are
+handed out again before fresh counter values.
+
+CODE_KEY selects the permutation. Every worker must use the same key, and
+it must not change once games exist, or new codes can repeat old ones.
+"""
+import asyncio
+import hashlib
+import os
+import string
+from collections import deque
+from typing import Deque, List
+
+from sqlalchemy import delete, insert, select, update
+
+from .database import AsyncSessionLocal
+from .models import FreeGameCode, GameCodeCounter
+
+CODE_BLOCK_SIZE = int(os.getenv("CODE_BLOCK_SIZE", "100"))
+CODE_KEY = os.getenv("CODE_KEY", "ne-se-sardi")
+
+ALPHABET = string.digits + string.ascii_uppercase
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+_ROUNDS = 4
+_ROUND_KEYS = [
+    int.from_bytes(hashlib.blake2b(f"{CODE_KEY}:{i}".encode(), digest_size=4).digest(), "big")
+    for i in range(_ROUNDS)
+]
+
+_counter = GameCodeCounter.__table__
+_free = FreeGameCode.__table__
+
+
+def _round(half: int, key: int) -> int:
+    x = (half * 0x9E3779B1 + key) & 0xFFFFFFFF
+    x ^= x >> 15
+    x = (x * 0x85EBCA6B) & 0xFFFFFFFF
+    return (x ^ (x >> 13)) & 0xFFFF
+
+
+def _feistel(value: int) -> int:
+    """Keyed permutation of 32-bit integers"""
+    left, right = value >> 16, value & 0xFFFF
+    for key in _ROUND_KEYS:
+        left, right = right, left ^ _round(right, key)
+    return (left << 16) | right
+
+
+def permute(value: int) -> int:
+    """Keyed permutation of [0, CODE_SPACE): cycle-walk the 32-bit Feistel network until back in range"""
+    if not 0 <= value < CODE_SPACE:
+        raise ValueError(f"Counter value {value} is outside the code space")
+    value = _feistel(value)
+    while value >= CODE_SPACE:
+        value = _feistel(value)
+    return value
+
+
+def encode(value: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def code_for(counter_value: int) -> str:
+    return encode(permute(counter_value))
+
+
+class CodeAllocator:
+    """Per-process pool of reserved game codes"""
+
+    def __init__(self, session_factory, block_size: int = CODE_BLOCK_SIZE):
+        self.session_factory = session_factory
+        self.block_size = block_size
+        self._codes: Deque[str] = deque()
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    async def allocate(self) -> str:
+        while not self._codes:
+            await self.refill()
+        return self._codes.popleft()
+
+    def release(self, codes: List[str]) -> None:
+        """Put allocated codes that were not used back, to be handed out next"""
+        self._codes.extendleft(reversed(codes))
+
+    async def refill(self) -> None:
+        """Reserve the next block unless codes are still available"""
+        async with self._lock:
+            if not self._codes:
+                self._codes.extend(await self._reserve())
+
+    async def _reserve(self) -> List[str]:
+        """Claim reclaimed codes, or else the next counter block, in a transaction of its own"""
+        async with self.session_factory() as db:
+            claimed = select(_free.c.code).limit(self.block_size).with_for_update(skip_locked=True)
+            result = await db.execute(delete(_free).where(_free.c.code.in_(claimed)).returning(_free.c.code))
+            codes = list(result.scalars().all())
+            if not codes:
+                block = await self._next_block(db)
+                start = block * self.block_size
+                codes = [code_for(v) for v in range(start, min(start + self.block_size, CODE_SPACE))]
+                if not codes:
+                    raise RuntimeError("Game code space exhausted")
+            await db.commit()
+            return codes
+
+    async def _next_block(self, db) -> int:
+        result = await db.execute(
+            update(_counter).where(_counter.c.id == 1)
+            .values(next_block=_counter.c.next_block + 1)
+            .returning(_counter.c.next_block)
+        )
+        return result.scalar_one() - 1
+
+
+async def reclaim(db, codes: List[str]) -> None:
+    """Return codes of deleted games to the pool; part of the caller's transaction"""
+    if codes:
+        await db.execute(insert(_free), [{"code": c} for c in codes])
+
+
+code_allocator = CodeAllocator(AsyncSessionLocal)
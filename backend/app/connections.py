@@ -0,0 +1,276 @@
+"""WebSocket connections held by this worker process.
+
+Broadcasts are published through the pub/sub backend; every worker then
+delivers them to its own sockets, so players of one game can be spread
+over several workers.
+
+Delivery never waits on a client. Each connection has a bounded outbound
+queue drained by its own writer task, so a slow socket only delays itself.
+A connection is evicted when its queue overflows, a send exceeds
+WS_SEND_TIMEOUT, or it stops answering heartbeat pings; clients reconnect
+and fetch a fresh snapshot. When a game ends for good (the reaper expires
+it) its room is closed on every worker with CLOSE_GAME_GONE, after the
+messages already queued have been sent; clients do not reconnect then.
+The close travels as ROOM_CLOSED_SIGNAL, a control signal rather than a
+message, so no broadcast content can close a room.
+
+Broadcasts travel between workers as JSON. Connections that asked for
+MessagePack (see wire.py) get binary frames, packed once per broadcast
+per worker with the room's player seats.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Union
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketDisconnect
+
+from . import metrics, serialization, wire
+from .pubsub import Broadcaster, create_broadcaster, encode
+
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "20"))
+
+PING_MESSAGE = '{"type":"ping"}'
+PING_PACKED = wire.pack({"type": "ping"}) if wire.available() else None
+ROOM_CLOSED = {"type": "room_closed"}
+ROOM_CLOSED_MESSAGE = '{"type":"room_closed"}'
+ROOM_CLOSED_PACKED = wire.pack(ROOM_CLOSED) if wire.available() else None
+# Published by close_room in place of a message; not JSON, so no message encodes to it
+ROOM_CLOSED_SIGNAL = "room_closed"
+# 1013 "Try Again Later": the client is expected to reconnect
+CLOSE_EVICTED = 1013
+# Application code (HTTP 410 Gone): the game is over, do not reconnect
+CLOSE_GAME_GONE = 4410
+ROOM_CLOSED_REASON = "room closed"
+# The game moved to another worker (see sharding.py); closed with CLOSE_EVICTED
+MOVED_REASON = "game moved"
+
+# Text frames carry JSON, binary frames MessagePack
+Frame = Union[str, bytes]
+OnMessage = Callable[[Frame], Awaitable[None]]
+
+
+class Connection:
+    """One client socket with its outbound queue and writer task"""
+    __slots__ = ("websocket", "game_code", "binary", "queue", "last_seen", "close_reason", "_writer")
+
+    def __init__(self, websocket: WebSocket, game_code: str, binary: bool = False,
+                 queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.game_code = game_code
+        # Send MessagePack binary frames instead of JSON text
+        self.binary = binary
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.last_seen = time.monotonic()
+        self.close_reason: Optional[str] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def enqueue(self, data: Frame) -> bool:
+        """Queue a serialized message; returns False if the client is too far behind"""
+        if self.close_reason is not None:
+            return False
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            self.evict("send queue full")
+            return False
+
+    def evict(self, reason: str) -> None:
+        """Stop serving this connection; serve() returns and the socket is closed"""
+        if self.close_reason is None:
+            self.close_reason = reason
+        if self._writer is not None:
+            self._writer.cancel()
+
+    def close_after_send(self) -> None:
+        """Close the connection once everything queued so far has been sent"""
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self.evict(ROOM_CLOSED_REASON)
+
+    async def _write(self, send_timeout: float) -> None:
+        while True:
+            data = await self.queue.get()
+            if data is None:
+                self.close_reason = self.close_reason or ROOM_CLOSED_REASON
+                return
+            try:
+                if isinstance(data, bytes):
+                    await asyncio.wait_for(self.websocket.send_bytes(data), send_timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(data), send_timeout)
+            except asyncio.TimeoutError:
+                self.close_reason = self.close_reason or "send timed out"
+                return
+            except Exception:
+                self.close_reason = self.close_reason or "send failed"
+                return
+
+    async def _read(self, on_message: OnMessage) -> None:
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                self.last_seen = time.monotonic()
+                data = message.get("text")
+                await on_message(data if data is not None else message.get("bytes", b""))
+        except WebSocketDisconnect:
+            self.close_reason = self.close_reason or "client disconnected"
+
+    async def serve(self, on_message: OnMessage, send_timeout: float = WS_SEND_TIMEOUT) -> None:
+        """Run the reader and writer until the client leaves or is evicted"""
+        self._writer = asyncio.create_task(self._write(send_timeout))
+        if self.close_reason is not None:
+            # Evicted before serving started
+            self._writer.cancel()
+        reader = asyncio.create_task(self._read(on_message))
+        try:
+            await asyncio.wait({reader, self._writer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (reader, self._writer):
+                task.cancel()
+            # wait() rather than gather(): it never re-raises the children's cancellation
+            await asyncio.wait({reader, self._writer})
+        if self.close_reason != "client disconnected":
+            code = CLOSE_GAME_GONE if self.close_reason == ROOM_CLOSED_REASON else CLOSE_EVICTED
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code), send_timeout)
+            except Exception:
+                pass
+
+
+class ConnectionManager:
+    def __init__(self, backend: Optional[Broadcaster] = None):
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        # Player seats per room with binary connections, for compact messages
+        self.room_seats: Dict[str, wire.Seats] = {}
+        self.backend = backend or create_broadcaster()
+        self.evictions = 0
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def start(self, ping_interval: float = WS_PING_INTERVAL) -> None:
+        await self.backend.start(self.deliver)
+        if ping_interval > 0:
+            self._heartbeat = asyncio.create_task(self._run_heartbeat(ping_interval, WS_PING_TIMEOUT))
+
+    async def stop(self) -> None:
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        await self.backend.stop()
+
+    async def connect(self, websocket: WebSocket, game_code: str, binary: bool = False,
+                      seats: Optional[wire.Seats] = None) -> Connection:
+        """Register a client socket; binary ones need the game's current seats"""
+        # Register before accepting so that no broadcast sent after the client
+        # sees the handshake complete can be missed; it waits in the queue
+        connection = Connection(websocket, game_code, binary)
+        if binary:
+            self.room_seats.setdefault(game_code, {}).update(seats or {})
+        first = game_code not in self.active_connections
+        self.active_connections.setdefault(game_code, set()).add(connection)
+        try:
+            if first:
+                await self.backend.subscribe(game_code)
+            await websocket.accept()
+        except BaseException:
+            # The handshake failed: nothing will serve or disconnect this connection
+            connection.close_reason = "client disconnected"
+            await self.disconnect(connection)
+            raise
+        return connection
+
+    async def disconnect(self, connection: Connection):
+        connections = self.active_connections.get(connection.game_code)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        if connection.close_reason not in (None, "client disconnected", ROOM_CLOSED_REASON, MOVED_REASON):
+            self.evictions += 1
+            logger.info("Evicted connection for game %s: %s", connection.game_code, connection.close_reason)
+        if not connections:
+            del self.active_connections[connection.game_code]
+            self.room_seats.pop(connection.game_code, None)
+            await self.backend.unsubscribe(connection.game_code)
+
+    async def broadcast(self, game_code: str, message: dict):
+        """Publish a message to every connection watching the game, on any worker"""
+        started = time.perf_counter()
+        try:
+            await self.backend.publish(game_code, message)
+        except Exception:
+            logger.exception("Publishing broadcast for game %s failed", game_code)
+        if metrics.METRICS_ENABLED:
+            metrics.BROADCAST_PUBLISH.observe(time.perf_counter() - started)
+
+    async def close_room(self, game_code: str):
+        """Tell every connection watching the game, on any worker, that it is gone and close them"""
+        try:
+            await self.backend.publish_data(game_code, ROOM_CLOSED_SIGNAL)
+        except Exception:
+            logger.exception("Publishing room close for game %s failed", game_code)
+
+    def evict_room(self, game_code: str, reason: str = MOVED_REASON) -> int:
+        """Evict this worker's connections watching a game; returns how many"""
+        connections = list(self.active_connections.get(game_code, ()))
+        for connection in connections:
+            connection.evict(reason)
+        return len(connections)
+
+    def encode_for(self, connection: Connection, message: Any) -> Frame:
+        """A message serialized in the connection's wire format"""
+        if connection.binary:
+            return wire.pack(message, self.room_seats.get(connection.game_code))
+        return encode(message)
+
+    def _pack(self, game_code: str, data: str) -> bytes:
+        message = serialization.loads(data)
+        seats = self.room_seats.setdefault(game_code, {})
+        # Players who joined since the room's seats were loaded
+        wire.learn_seats(message, seats)
+        return wire.pack(message, seats)
+
+    async def deliver(self, game_code: str, data: str):
+        """Queue an already serialized message on this worker's connections for the game"""
+        started = time.perf_counter()
+        connections = list(self.active_connections.get(game_code, ()))
+        if data == ROOM_CLOSED_SIGNAL:
+            for connection in connections:
+                if connection.enqueue(ROOM_CLOSED_PACKED if connection.binary else ROOM_CLOSED_MESSAGE):
+                    connection.close_after_send()
+            return
+        packed = None
+        for connection in connections:
+            frame = data
+            if connection.binary:
+                if packed is None:
+                    packed = self._pack(game_code, data)
+                frame = packed
+            connection.enqueue(frame)
+        if metrics.METRICS_ENABLED:
+            metrics.BROADCAST_FANOUT.observe(time.perf_counter() - started)
+            metrics.BROADCAST_RECIPIENTS.inc(amount=len(connections))
+
+    async def _run_heartbeat(self, interval: float, timeout: float) -> None:
+        """Ping every connection; evict those silent for longer than interval + timeout"""
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - (interval + timeout)
+            for connections in list(self.active_connections.values()):
+                for connection in list(connections):
+                    if connection.last_seen < deadline:
+                        connection.evict("heartbeat timed out")
+                    else:
+                        connection.enqueue(PING_PACKED if connection.binary else PING_MESSAGE)
+
+
+manager = ConnectionManager()
@@ -1,5 +1,5 @@
 import random
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from .models import PlayerColor
 
 
@@ -10,6 +10,7 @@ from .models import PlayerColor
 
 BOARD_SIZE = 40
 FINISH_TRACK_SIZE = 6  # 5 colored cells + center
+MAX_POSITION = BOARD_SIZE + FINISH_TRACK_SIZE - 1  # Center of the finish area
 
 # Starting positions for each color on the main board
 START_POSITIONS = {
@@ -33,26 +34,161 @@ def roll_dice() -> int:
     return random.randint(1, 6)
 
 
-def get_absolute_position(piece_position: int, player_color: PlayerColor) -> int:
-    """Convert player-relative position to absolute board position"""
+def _to_absolute(piece_position: int, player_color: PlayerColor) -> int:
     if piece_position < 0:  # At home
         return -1
     if piece_position >= BOARD_SIZE:  # In finish area
         return piece_position  # Finish positions are player-specific
-    
-    start = START_POSITIONS[player_color]
-    return (piece_position + start) % BOARD_SIZE
+    return (piece_position + START_POSITIONS[player_color]) % BOARD_SIZE
 
 
-def get_relative_position(absolute_position: int, player_color: PlayerColor) -> int:
-    """Convert absolute board position to player-relative position"""
+def _to_relative(absolute_position: int, player_color: PlayerColor) -> int:
     if absolute_position < 0:
         return -1
     if absolute_position >= BOARD_SIZE:
         return absolute_position
-    
-    start = START_POSITIONS[player_color]
-    return (absolute_position - start) % BOARD_SIZE
+    return (absolute_position - START_POSITIONS[player_color]) % BOARD_SIZE
+
+
+# Lookup tables for every color and position from home (-1) to the center (45),
+# indexed by position + 1
+ABSOLUTE_POSITIONS: Dict[PlayerColor, Tuple[int, ...]] = {
+    color: tuple(_to_absolute(pos, color) for pos in range(-1, MAX_POSITION + 1))
+    for color in START_POSITIONS
+}
+RELATIVE_POSITIONS: Dict[PlayerColor, Tuple[int, ...]] = {
+    color: tuple(_to_relative(pos, color) for pos in range(-1, MAX_POSITION + 1))
+    for color in START_POSITIONS
+}
+
+
+def get_absolute_position(piece_position: int, player_color: PlayerColor) -> int:
+    """Convert player-relative position to absolute board position"""
+    if -1 <= piece_position <= MAX_POSITION:
+        return ABSOLUTE_POSITIONS[player_color][piece_position + 1]
+    return _to_absolute(piece_position, player_color)
+
+
+def get_relative_position(absolute_position: int, player_color: PlayerColor) -> int:
+    """Convert absolute board position to player-relative position"""
+    if -1 <= absolute_position <= MAX_POSITION:
+        return RELATIVE_POSITIONS[player_color][absolute_position + 1]
+    return _to_relative(absolute_position, player_color)
+
+
+class Board:
+    """Occupancy of the main track: per-color piece counts indexed by absolute square.
+
+    Build it once per turn from the opponents' pieces; blocking and capture
+    checks against it are then O(1) per piece.
+    """
+    __slots__ = ("counts", "first_piece")
+
+    def __init__(self):
+        self.counts: Dict[PlayerColor, List[int]] = {}
+        # Index of the first piece of each color on a square, -1 if none
+        self.first_piece: Dict[PlayerColor, List[int]] = {}
+
+    @classmethod
+    def from_pieces(cls, pieces_by_color: Dict[PlayerColor, List[int]]) -> "Board":
+        board = cls()
+        for color, pieces in pieces_by_color.items():
+            board.add(color, pieces)
+        return board
+
+    def add(self, color: PlayerColor, pieces: Iterable[int]) -> None:
+        counts = self.counts.setdefault(color, [0] * BOARD_SIZE)
+        first = self.first_piece.setdefault(color, [-1] * BOARD_SIZE)
+        table = ABSOLUTE_POSITIONS[color]
+        for idx, pos in enumerate(pieces):
+            if 0 <= pos < BOARD_SIZE:
+                square = table[pos + 1]
+                counts[square] += 1
+                if first[square] < 0:
+                    first[square] = idx
+
+    def is_blocked(self, square: int, moving_color: PlayerColor) -> bool:
+        """True if another color has 2+ pieces stacked on the absolute square"""
+        for color, counts in self.counts.items():
+            if color != moving_color and counts[square] >= 2:
+                return True
+        return False
+
+
+def board_can_move(
+    board: Optional[Board],
+    piece_position: int,
+    dice_value: int,
+    player_color: PlayerColor,
+    own_pieces: List[int],
+) -> Tuple[bool, int]:
+    """can_move_piece against a prebuilt opponents Board (None skips stack blocking)"""
+    # Piece is at home: can move to start position on a 6; own pieces may stack there
+    if piece_position == -1:
+        if dice_value == 6:
+            return True, 0
+        return False, -1
+
+    new_position = piece_position + dice_value
+
+    # Entering or moving inside the finish area; no stacking there
+    if new_position >= BOARD_SIZE:
+        if new_position > MAX_POSITION or new_position in own_pieces:
+            return False, -1
+        return True, new_position
+
+    # Normal move on the main board: own pieces may stack, but a stack of 2+
+    # opponent pieces blocks the square
+    if board is not None and board.is_blocked(ABSOLUTE_POSITIONS[player_color][new_position + 1], player_color):
+        return False, -1
+    return True, new_position
+
+
+def board_capture(
+    board: Board,
+    new_position: int,
+    moving_player_color: PlayerColor,
+    players: Iterable[Tuple[object, PlayerColor]],
+) -> Optional[Tuple[object, int]]:
+    """check_capture against a Board holding the opponents in `players` (id, color) order"""
+    if new_position < 0 or new_position >= BOARD_SIZE:
+        return None
+    square = ABSOLUTE_POSITIONS[moving_player_color][new_position + 1]
+    for player_id, color in players:
+        if color == moving_player_color:
+            continue
+        count = board.counts[color][square]
+        if count >= 2:
+            return None
+        if count == 1:
+            return (player_id, board.first_piece[color][square])
+    return None
+
+
+def board_valid_moves(
+    board: Optional[Board],
+    pieces: List[int],
+    dice_value: int,
+    player_color: PlayerColor,
+) -> List[dict]:
+    """get_valid_moves against a prebuilt opponents Board"""
+    valid_moves = []
+    for idx, piece_pos in enumerate(pieces):
+        can_move, new_pos = board_can_move(board, piece_pos, dice_value, player_color, pieces)
+        if can_move:
+            valid_moves.append({
+                "piece_index": idx,
+                "from_position": piece_pos,
+                "to_position": new_pos
+            })
+    return valid_moves
+
+
+def opponents_board(player_color: PlayerColor, opponent_pieces: Optional[dict]) -> Optional[Board]:
+    """Board of opponent pieces for stack-blocking checks, or None if there are none"""
+    if not opponent_pieces:
+        return None
+    return Board.from_pieces({c: p for c, p in opponent_pieces.items() if c != player_color})
 
 
 def can_move_piece(
@@ -63,59 +199,31 @@ def can_move_piece(
     opponent_pieces: Optional[dict] = None  # {color: pieces_list} for checking blocked stacks
 ) -> Tuple[bool, int]:
     """Check if a piece can move with given dice value. Returns (can_move, new_position)."""
-    # Piece is at home
+    # Same rules as board_can_move; for a single check, counting opponent pieces
+    # on the one target square is cheaper than building a Board
     if piece_position == -1:
         if dice_value == 6:
-            # Can move to start position; allow stacking with own pieces on start
-            new_pos = 0
-            return True, new_pos
+            return True, 0
         return False, -1
 
-    # Piece is on the board or in finish area
     new_position = piece_position + dice_value
-
-    # Check if entering or in finish area
-    if piece_position < BOARD_SIZE and new_position >= BOARD_SIZE:
-        # Entering finish area
-        finish_pos = new_position
-        if finish_pos > BOARD_SIZE + FINISH_TRACK_SIZE - 1:
-            # Overshooting the finish - can't move
-            return False, -1
-        # Still forbid stacking in finish area
-        if finish_pos in all_pieces:
-            return False, -1
-        return True, finish_pos
-
-    # Already in finish area
-    if piece_position >= BOARD_SIZE:
-        if new_position > BOARD_SIZE + FINISH_TRACK_SIZE - 1:
-            return False, -1
-        # Still forbid stacking in finish area
-        if new_position in all_pieces:
+    if new_position >= BOARD_SIZE:
+        if new_position > MAX_POSITION or new_position in all_pieces:
             return False, -1
         return True, new_position
 
-    # Normal move on the main board: allow stacking with own pieces
-    new_position = new_position % BOARD_SIZE
-
-    # Check if opponent has 2+ pieces stacked at target (blocked)
     if opponent_pieces:
-        target_abs_pos = get_absolute_position(new_position, player_color)
-        for opp_color, opp_pieces in opponent_pieces.items():
-            if opp_color == player_color:
+        square = ABSOLUTE_POSITIONS[player_color][new_position + 1]
+        for color, pieces in opponent_pieces.items():
+            if color == player_color:
                 continue
-            # Count opponent pieces at target absolute position
-            count = 0
-            for opp_piece_pos in opp_pieces:
-                if opp_piece_pos < 0 or opp_piece_pos >= BOARD_SIZE:
-                    continue
-                opp_abs_pos = get_absolute_position(opp_piece_pos, opp_color)
-                if opp_abs_pos == target_abs_pos:
-                    count += 1
-            if count >= 2:
-                # Cannot land on stack of 2+ opponent pieces
+            table = ABSOLUTE_POSITIONS[color]
+            stacked = 0
+            for pos in pieces:
+                if 0 <= pos < BOARD_SIZE and table[pos + 1] == square:
+                    stacked += 1
+            if stacked >= 2:
                 return False, -1
-
     return True, new_position
 
 
@@ -131,37 +239,14 @@ def check_capture(
 
     RULE: If opponent has 2+ pieces stacked on same square, they cannot be captured.
     """
-    # Can't capture in finish area
-    if new_position >= BOARD_SIZE:
-        return None
-    
-    # Convert moving player's new position to absolute board position
-    moving_abs_pos = get_absolute_position(new_position, moving_player_color)
-    
+    board = Board()
+    players = []
     for player_id, (color, pieces) in all_players_pieces.items():
         if color == moving_player_color:
             continue
-        
-        # First, count how many pieces this opponent has at each absolute position
-        pieces_at_position: dict[int, List[int]] = {}
-        for idx, piece_pos in enumerate(pieces):
-            if piece_pos < 0 or piece_pos >= BOARD_SIZE:
-                continue
-            abs_pos = get_absolute_position(piece_pos, color)
-            if abs_pos not in pieces_at_position:
-                pieces_at_position[abs_pos] = []
-            pieces_at_position[abs_pos].append(idx)
-
-        # Check if there's a capturable piece at the target position
-        if moving_abs_pos in pieces_at_position:
-            piece_indices = pieces_at_position[moving_abs_pos]
-            # If 2+ pieces are stacked, they CANNOT be captured
-            if len(piece_indices) >= 2:
-                return None
-            # Single piece can be captured
-            return (player_id, piece_indices[0])
-
-    return None
+        board.add(color, pieces)
+        players.append((player_id, color))
+    return board_capture(board, new_position, moving_player_color, players)
 
 
 def check_winner(pieces: List[int]) -> bool:
@@ -176,15 +261,4 @@ def get_valid_moves(
     opponent_pieces: Optional[dict] = None  # {color: pieces_list}
 ) -> List[dict]:
     """Get all valid moves for a player given a dice roll"""
-    valid_moves = []
-    
-    for idx, piece_pos in enumerate(pieces):
-        can_move, new_pos = can_move_piece(piece_pos, dice_value, player_color, pieces, opponent_pieces)
-        if can_move:
-            valid_moves.append({
-                "piece_index": idx,
-                "from_position": piece_pos,
-                "to_position": new_pos
-            })
-    
-    return valid_moves
+    return board_valid_moves(opponents_board(player_color, opponent_pieces), pieces, dice_value, player_color)
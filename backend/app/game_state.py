@@ -0,0 +1,281 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional
+
+from .models import Game, GameStatus, PlayerColor
+from . import game_logic, move_log
+
+
+class TurnError(Exception):
+    """A turn action the rules do not allow; reported to clients as HTTP 400"""
+
+
+@dataclass(slots=True)
+class PlayerState:
+    id: Any
+    name: str
+    color: PlayerColor
+    pieces: List[int]
+    order: int
+    is_connected: bool = True
+    is_bot: bool = False
+    consecutive_sixes: int = 0
+    turns_to_skip: int = 0
+
+
+@dataclass(slots=True)
+class MoveOutcome:
+    player_id: Any
+    piece_index: int
+    from_position: int
+    to_position: int
+    dice_value: int
+    captured_player: Optional[PlayerState]
+    captured_piece_index: Optional[int]
+    winner_id: Any
+    message: str
+    created_at: datetime
+
+
+@dataclass(slots=True)
+class GameState:
+    """Compact, ORM-free copy of a game that the turn rules operate on"""
+    id: Any
+    code: str
+    status: GameStatus
+    current_player_index: int
+    players: List[PlayerState]
+    version: int = 0
+    winner_id: Any = None
+    created_at: Optional[datetime] = None
+    # Die rolled by the current player and not yet played; None until they roll
+    pending_roll: Optional[int] = None
+    # Valid moves for pending_roll, computed on first use
+    pending_moves: Optional[List[dict]] = field(default=None, repr=False)
+    # Binary turn history and its periodic snapshots, see move_log.py
+    move_log: bytearray = field(default_factory=bytearray, repr=False)
+    move_snapshots: bytearray = field(default_factory=bytearray, repr=False)
+    # Moves applied since the state was last persisted
+    unsaved_moves: List[MoveOutcome] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def from_model(cls, game: Game) -> "GameState":
+        return cls(
+            id=game.id,
+            code=game.code,
+            status=game.status,
+            current_player_index=game.current_player_index or 0,
+            version=game.version or 0,
+            winner_id=game.winner_id,
+            created_at=game.created_at,
+            pending_roll=game.pending_roll,
+            move_log=bytearray(game.move_log or b""),
+            move_snapshots=bytearray(game.move_snapshots or b""),
+            players=[
+                PlayerState(
+                    id=p.id,
+                    name=p.name,
+                    color=p.color,
+                    pieces=list(p.pieces),
+                    order=p.order,
+                    is_connected=p.is_connected,
+                    is_bot=p.is_bot or False,
+                    consecutive_sixes=p.consecutive_sixes or 0,
+                    turns_to_skip=p.turns_to_skip or 0,
+                )
+                for p in game.players
+            ],
+        )
+
+    def write_to(self, game: Game) -> None:
+        """Copy changed fields back onto the ORM game and its players"""
+        game.status = self.status
+        game.current_player_index = self.current_player_index
+        game.version = self.version
+        game.winner_id = self.winner_id
+        game.pending_roll = self.pending_roll
+        # The log only ever grows, so its length tells whether it changed
+        if len(game.move_log or b"") != len(self.move_log):
+            game.move_log = bytes(self.move_log)
+            game.move_snapshots = bytes(self.move_snapshots)
+        players = {p.id: p for p in self.players}
+        for model in game.players:
+            player = players[model.id]
+            if list(model.pieces) != player.pieces:
+                model.pieces = list(player.pieces)
+            if (model.consecutive_sixes or 0) != player.consecutive_sixes:
+                model.consecutive_sixes = player.consecutive_sixes
+            if (model.turns_to_skip or 0) != player.turns_to_skip:
+                model.turns_to_skip = player.turns_to_skip
+
+    @property
+    def current_player(self) -> PlayerState:
+        return self.players[self.current_player_index]
+
+    def player(self, player_id: Any) -> Optional[PlayerState]:
+        for p in self.players:
+            if p.id == player_id:
+                return p
+        return None
+
+    def bump_version(self) -> int:
+        self.version += 1
+        return self.version
+
+    def advance_turn(self) -> None:
+        self.current_player_index = (self.current_player_index + 1) % len(self.players)
+
+
+def current_player_for(state: GameState, player_id: Any, require_in_progress: bool = True) -> PlayerState:
+    """Return the player whose turn it is, checking it is player_id"""
+    if require_in_progress and state.status != GameStatus.IN_PROGRESS:
+        raise TurnError("Game is not in progress")
+    player = state.current_player
+    if player.id != player_id:
+        raise TurnError("Not your turn")
+    return player
+
+
+def opponents_board(state: GameState, player: PlayerState) -> game_logic.Board:
+    board = game_logic.Board()
+    for p in state.players:
+        if p.id != player.id:
+            board.add(p.color, p.pieces)
+    return board
+
+
+def serve_penalty(state: GameState, player: PlayerState) -> bool:
+    """Consume one skipped turn if the player is serving a consecutive-6s penalty"""
+    if player.turns_to_skip > 0:
+        player.turns_to_skip -= 1
+        state.advance_turn()
+        move_log.record(state, player.order, 0, move_log.DIE_PENALTY)
+        return True
+    return False
+
+
+def skip_turn(state: GameState, player: PlayerState) -> None:
+    """Pass the turn without moving"""
+    state.advance_turn()
+    move_log.record(state, player.order, 0, move_log.DIE_SKIP)
+
+
+def valid_moves(state: GameState, player: PlayerState, dice_value: int) -> List[dict]:
+    return game_logic.board_valid_moves(
+        opponents_board(state, player), player.pieces, dice_value, player.color
+    )
+
+
+def roll(state: GameState, player: PlayerState, dice_value: int) -> List[dict]:
+    """Record the current player's roll as pending and return its valid moves"""
+    if state.pending_roll is not None:
+        raise TurnError("Dice already rolled")
+    state.pending_roll = dice_value
+    state.pending_moves = None
+    return pending_moves(state)
+
+
+def pending_moves(state: GameState) -> List[dict]:
+    """Valid moves for the pending roll of the current player"""
+    if state.pending_roll is None:
+        return []
+    if state.pending_moves is None:
+        state.pending_moves = valid_moves(state, state.current_player, state.pending_roll)
+    return state.pending_moves
+
+
+def clear_roll(state: GameState) -> None:
+    state.pending_roll = None
+    state.pending_moves = None
+
+
+def play_roll(state: GameState, player: PlayerState, piece_index: int, dice_value: Optional[int] = None) -> MoveOutcome:
+    """Move a piece by the pending roll; dice_value, if given, must match it"""
+    if state.pending_roll is None:
+        raise TurnError("Roll the dice first")
+    if dice_value is not None and dice_value != state.pending_roll:
+        raise TurnError("Dice value does not match the roll")
+    if not any(m["piece_index"] == piece_index for m in pending_moves(state)):
+        raise TurnError("Invalid move")
+    dice_value = state.pending_roll
+    clear_roll(state)
+    return move_piece(state, player, piece_index, dice_value)
+
+
+def pass_roll(state: GameState, player: PlayerState) -> None:
+    """Give up the turn after a roll that allows no move"""
+    if state.pending_roll is None:
+        raise TurnError("Roll the dice first")
+    if pending_moves(state):
+        raise TurnError("A valid move is available")
+    clear_roll(state)
+    skip_turn(state, player)
+
+
+def move_piece(state: GameState, player: PlayerState, piece_index: int, dice_value: int) -> MoveOutcome:
+    """Apply a move for the current player, including captures, the 6s rules and winning"""
+    if piece_index < 0 or piece_index > 3:
+        raise TurnError("Invalid piece index")
+
+    pieces = list(player.pieces)
+    board = opponents_board(state, player)
+    can_move, new_pos = game_logic.board_can_move(
+        board, pieces[piece_index], dice_value, player.color, pieces
+    )
+    if not can_move:
+        raise TurnError("Invalid move")
+
+    opponents = {p.id: p for p in state.players if p.id != player.id}
+    capture = game_logic.board_capture(
+        board, new_pos, player.color, [(pid, p.color) for pid, p in opponents.items()]
+    )
+    captured_player = None
+    captured_piece_index = None
+    if capture:
+        captured_player = opponents[capture[0]]
+        captured_piece_index = capture[1]
+        cap_pieces = list(captured_player.pieces)
+        cap_pieces[captured_piece_index] = -1  # Send back home
+        captured_player.pieces = cap_pieces
+
+    old_pos = pieces[piece_index]
+    pieces[piece_index] = new_pos
+    player.pieces = pieces
+
+    winner_id = None
+    if game_logic.check_winner(pieces):
+        state.status = GameStatus.FINISHED
+        state.winner_id = player.id
+        winner_id = player.id
+        message = f"{player.name} wins!"
+        player.consecutive_sixes = 0
+    elif dice_value == 6:
+        player.consecutive_sixes += 1
+        if player.consecutive_sixes >= 2:
+            # Penalty: skip 4 turns
+            player.turns_to_skip = 4
+            player.consecutive_sixes = 0
+            state.advance_turn()
+            message = "Two consecutive 6s! Must skip 4 turns."
+        else:
+            message = "Rolled 6! Roll again."
+    else:
+        player.consecutive_sixes = 0
+        state.advance_turn()
+        message = "Move successful"
+
+    outcome = MoveOutcome(
+        player_id=player.id,
+        piece_index=piece_index,
+        from_position=old_pos,
+        to_position=new_pos,
+        dice_value=dice_value,
+        captured_player=captured_player,
+        captured_piece_index=captured_piece_index,
+        winner_id=winner_id,
+        message=message,
+        created_at=datetime.utcnow(),
+    )
+    move_log.record(state, player.order, piece_index, dice_value, captured_player is not None)
+    state.unsaved_moves.append(outcome)
+    return outcome
@@ -0,0 +1,257 @@
+"""In-process authoritative store for live games.
+
+Turn endpoints apply the game_state rules to cached GameState objects and the
+store persists the resulting Move rows and player/game snapshots in batched
+write-behind flushes. After a crash, games are rebuilt from their rows with
+the position replayed from the game's binary move log.
+
+The store is per-process, so it must only be enabled when a single worker
+serves each game (GAME_STORE_ENABLED=true): one worker in all, or shards
+behind the shard router (see sharding.py).
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Game, Player, Move, GameStatus
+from .game_state import GameState
+from . import move_log, queries, replay
+
+logger = logging.getLogger(__name__)
+
+GAME_STORE_ENABLED = os.getenv("GAME_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+GAME_STORE_FLUSH_INTERVAL = float(os.getenv("GAME_STORE_FLUSH_INTERVAL", "0.5"))
+
+
+# Core UPDATE rather than an ORM bulk update: the ORM would add a
+# version_id_col check against the *new* version and match no rows. The row
+# must still be at the version the store last wrote and not expired, so a
+# game changed behind the store (the reaper expiring it) is never overwritten.
+_games = Game.__table__
+GAME_SNAPSHOT_UPDATE = (
+    update(_games)
+    .where(_games.c.id == bindparam("game_id"),
+           _games.c.version == bindparam("stored_version"),
+           _games.c.status != GameStatus.EXPIRED)
+    .values(
+        status=bindparam("status"),
+        current_player_index=bindparam("current_player_index"),
+        version=bindparam("version"),
+        winner_id=bindparam("winner_id"),
+        pending_roll=bindparam("pending_roll"),
+        move_log=bindparam("move_log"),
+        move_snapshots=bindparam("move_snapshots"),
+        updated_at=bindparam("updated_at"),
+    )
+)
+
+
+class GameStore:
+    def __init__(self, enabled: bool = GAME_STORE_ENABLED):
+        self.enabled = enabled
+        self._games: Dict[Any, GameState] = {}
+        self._codes: Dict[str, Any] = {}
+        self._game_locks: Dict[Any, asyncio.Lock] = {}
+        self._pending_moves: List[dict] = []
+        self._dirty: Set[Any] = set()
+        # Version of each game's row as the store last read or wrote it
+        self._stored_versions: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    @property
+    def pending_move_count(self) -> int:
+        """Move rows waiting for the next flush"""
+        return len(self._pending_moves)
+
+    @property
+    def dirty_count(self) -> int:
+        """Games whose snapshot waits for the next flush"""
+        return len(self._dirty)
+
+    def get(self, game_id: Any) -> Optional[GameState]:
+        return self._games.get(game_id)
+
+    def game_ids(self) -> List[Any]:
+        return list(self._games)
+
+    def get_by_code(self, code: str) -> Optional[GameState]:
+        game_id = self._codes.get(code)
+        return self._games.get(game_id) if game_id is not None else None
+
+    def lock(self, game_id: Any) -> asyncio.Lock:
+        """Per-game lock serializing turn actions on the same game"""
+        lock = self._game_locks.get(game_id)
+        if lock is None:
+            lock = self._game_locks[game_id] = asyncio.Lock()
+        return lock
+
+    async def load(self, db: AsyncSession, game_id: Any) -> Optional[GameState]:
+        """Return the live state, hydrating it from the database if needed.
+
+        Only games in progress are kept: waiting games are still changed
+        through the ORM (join, bots, start) and finished ones no longer are
+        at all, so their states are returned without being cached.
+        Callers must hold lock(game_id).
+        """
+        state = self._games.get(game_id)
+        if state is not None:
+            return state
+        game = await queries.load_game(db, game_id)
+        if not game:
+            return None
+        state = GameState.from_model(game)
+        try:
+            replay.restore(state)
+        except move_log.MoveLogError:
+            # Started before the move log existed (migration 0002); the rows are all there is
+            logger.warning("Move log of game %s does not replay; using the stored position", game_id)
+        if state.status == GameStatus.IN_PROGRESS:
+            self._games[game_id] = state
+            self._codes[state.code] = game_id
+            self._stored_versions[game_id] = game.version
+        return state
+
+    def mark_dirty(self, state: GameState) -> None:
+        """Queue the state's unsaved moves and snapshot for the next flush"""
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "game_id": state.id,
+                "player_id": m.player_id,
+                "dice_value": m.dice_value,
+                "piece_index": m.piece_index,
+                "from_position": m.from_position,
+                "to_position": m.to_position,
+                "captured_player_id": m.captured_player.id if m.captured_player else None,
+                "captured_piece_index": m.captured_piece_index,
+                "created_at": m.created_at,
+            }
+            for m in state.unsaved_moves
+        ] if move_log.MOVE_ROWS_ENABLED else []
+        state.unsaved_moves.clear()
+        self._pending_moves.extend(rows)
+        self._dirty.add(state.id)
+
+    def evict(self, game_id: Any) -> None:
+        state = self._games.pop(game_id, None)
+        if state is not None:
+            self._codes.pop(state.code, None)
+        self._stored_versions.pop(game_id, None)
+        lock = self._game_locks.get(game_id)
+        # A held lock stays, or a second caller could lock a fresh one meanwhile
+        if lock is not None and not lock.locked():
+            del self._game_locks[game_id]
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write queued moves and dirty snapshots in one transaction; returns moves written.
+
+        Games whose row changed behind the store since it was loaded or last
+        written (expired by the reaper) are evicted with their unsaved moves.
+        """
+        queued_moves, self._pending_moves = self._pending_moves, []
+        dirty, self._dirty = self._dirty, set()
+        states = [s for s in (self._games.get(g) for g in dirty) if s is not None]
+        if not queued_moves and not states:
+            return 0
+
+        current: Dict[Any, int] = {}
+        try:
+            if states:
+                rows = await db.execute(
+                    select(_games.c.id, _games.c.version)
+                    .where(_games.c.id.in_([s.id for s in states]), _games.c.status != GameStatus.EXPIRED)
+                    .with_for_update()
+                )
+                current = dict(rows.all())
+        except Exception:
+            await db.rollback()
+            self._pending_moves[:0] = queued_moves
+            self._dirty.update(dirty)
+            raise
+        stale = {s.id for s in states if current.get(s.id) != self._stored_versions.get(s.id)}
+        for game_id in stale:
+            logger.warning("Game %s changed in the database behind the store; dropping its state", game_id)
+            self.evict(game_id)
+        states = [s for s in states if s.id not in stale]
+        # Moves of evicted games go with them
+        written = {s.id for s in states}
+        moves = [m for m in queued_moves if m["game_id"] in written]
+        if not moves and not states:
+            await db.rollback()
+            return 0
+
+        # Snapshots are taken without awaiting, so no turn action can interleave
+        now = datetime.utcnow()
+        game_rows: List[dict] = []
+        player_rows: List[dict] = []
+        for state in states:
+            game_rows.append({
+                "game_id": state.id,
+                "stored_version": self._stored_versions[state.id],
+                "status": state.status,
+                "current_player_index": state.current_player_index,
+                "version": state.version,
+                "winner_id": state.winner_id,
+                "pending_roll": state.pending_roll,
+                "move_log": bytes(state.move_log),
+                "move_snapshots": bytes(state.move_snapshots),
+                "updated_at": now,
+            })
+            player_rows.extend(
+                {
+                    "id": p.id,
+                    "pieces": list(p.pieces),
+                    "consecutive_sixes": p.consecutive_sixes,
+                    "turns_to_skip": p.turns_to_skip,
+                }
+                for p in state.players
+            )
+
+        try:
+            if player_rows:
+                await db.execute(update(Player), player_rows)
+            if moves:
+                await db.execute(insert(Move), moves)
+            if game_rows:
+                await db.execute(GAME_SNAPSHOT_UPDATE, game_rows)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self._pending_moves[:0] = moves
+            self._dirty.update(written)
+            raise
+
+        for row in game_rows:
+            self._stored_versions[row["game_id"]] = row["version"]
+        for state in states:
+            if state.status == GameStatus.FINISHED:
+                self.evict(state.id)
+        return len(moves)
+
+    async def run_flusher(self, session_factory, interval: float = GAME_STORE_FLUSH_INTERVAL) -> None:
+        """Background task flushing the store every interval seconds"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self._flush_with(session_factory)
+        finally:
+            # Final flush on shutdown
+            await self._flush_with(session_factory)
+
+    async def _flush_with(self, session_factory) -> None:
+        async with session_factory() as db:
+            try:
+                await self.flush(db)
+            except Exception:
+                logger.exception("Game store flush failed; will retry")
+
+
+game_store = GameStore()
@@ -1,39 +1,91 @@
 import os
-import random
-import string
-from typing import Dict, List
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 from uuid import UUID
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
 
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, WebSocket, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+from pydantic import TypeAdapter, ValidationError
 
-from .database import get_db, engine, Base
+from .database import get_async_db, async_engine, AsyncSessionLocal, Base
 from .models import Game, Player, Move, GameStatus, PlayerColor
 from .schemas import (
-    GameCreate, GameJoin, GameResponse,
-    # PlayerResponse is kept for future API extensions (e.g., player details endpoint)
-    PlayerResponse,
-    DiceRoll, DiceRollResponse, MoveRequest, MoveResponse, SkipTurnRequest
+    GameCreate, GameJoin, BotCreate, GameResponse, GameDelta, MatchRequest, MatchTicket,
+    DiceRoll, DiceRollResponse, MoveRequest, MoveResponse, MoveSuggestion, SkipTurnRequest,
+    TurnAction, BatchRequest, BatchResponse, ActionResult, CommandResult,
+    GameHistoryResponse, HistoryEvent, RingUpdate, BATCH_MAX_ACTIONS, BATCH_LIMIT_DETAIL
 )
-from . import game_logic
+from . import (
+    ai, game_logic, game_state, matchmaking, metrics, move_log, queries, reaper, replay, serialization, sharding, wire
+)
+from .game_state import GameState, PlayerState, TurnError
+from .serialization import FastJSONResponse, game_document, player_document, serialize_game
+from .codes import code_allocator
+from .game_store import game_store
+from .matchmaking import Ticket, matchmaker
+from .connections import Connection, manager
+from .snapshot_cache import Snapshot, snapshot_cache, etag_matches
+from .sharding import HashRing, shard
+
+logger = logging.getLogger(__name__)
+
+# Create missing tables on startup. Disable when the schema is managed with
+# Alembic migrations (alembic upgrade head), as in production.
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "true").lower() in ("1", "true", "yes")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup
-    try:
-        Base.metadata.create_all(bind=engine)
-    except Exception as e:
-        print(f"Warning: Could not create tables: {e}")
+    if DB_CREATE_ALL:
+        try:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        except Exception as e:
+            print(f"Warning: Could not create tables: {e}")
+
+    await manager.start()
+    flusher = None
+    if game_store.enabled:
+        flusher = asyncio.create_task(game_store.run_flusher(AsyncSessionLocal))
+    reaper_task = None
+    if reaper.REAPER_ENABLED:
+        reaper_task = asyncio.create_task(reaper.run_reaper(AsyncSessionLocal))
+    matchmaker_task = None
+    if matchmaking.MATCHMAKING_ENABLED:
+        matchmaker_task = asyncio.create_task(matchmaker.run(AsyncSessionLocal))
     yield
+    for task in list(bot_tasks.values()):
+        task.cancel()
+    ai.shutdown()
+    if matchmaker_task:
+        matchmaker_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await matchmaker_task
+    if reaper_task:
+        reaper_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await reaper_task
+    if flusher:
+        flusher.cancel()
+        with suppress(asyncio.CancelledError):
+            await flusher
+    await manager.stop()
+    await async_engine.dispose()
 
 
 app = FastAPI(
     title="Не се сърди човече",
     description="Multiplayer Ludo Game API",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # CORS middleware - configurable via environment variable
@@ -46,39 +98,170 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# WebSocket connections manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
 
-    async def connect(self, websocket: WebSocket, game_code: str):
-        await websocket.accept()
-        if game_code not in self.active_connections:
-            self.active_connections[game_code] = []
-        self.active_connections[game_code].append(websocket)
+async def games_by_status():
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(Game.status, func.count()).group_by(Game.status))
+        return [({"status": status.value}, count) for status, count in rows.all()]
+
+
+def register_metrics() -> None:
+    """Install the metrics middleware, hooks and scrape-time gauges"""
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(async_engine.sync_engine)
+    metrics.instrument_module(game_logic)
+    registry = metrics.registry
+    registry.collect("games", "Games in the database by status", games_by_status)
+    registry.collect("game_store_games", "Games held in the in-memory store",
+                     lambda: [({}, len(game_store))])
+    registry.collect("game_store_pending_moves", "Move rows queued for the next store flush",
+                     lambda: [({}, game_store.pending_move_count)])
+    registry.collect("game_store_dirty_games", "Game snapshots queued for the next store flush",
+                     lambda: [({}, game_store.dirty_count)])
+    registry.collect("snapshot_cache_games", "Games with a cached serialized snapshot",
+                     lambda: [({}, len(snapshot_cache))])
+    registry.collect("ws_connections", "WebSocket connections on this worker per room",
+                     lambda: [({"room": code}, len(conns)) for code, conns in manager.active_connections.items()])
+    registry.collect("ws_send_queue_messages", "Messages waiting in outbound WebSocket queues per room",
+                     lambda: [({"room": code}, sum(c.queue.qsize() for c in conns))
+                              for code, conns in manager.active_connections.items()])
+    registry.collect("matchmaking_waiting", "Players waiting in this worker's matchmaking queue",
+                     lambda: [({}, len(matchmaker))])
+    registry.collect("matchmaking_games_total", "Games started by this worker's matchmaker",
+                     lambda: [({}, matchmaker.games_formed)], type="counter")
+    registry.collect("ws_evictions_total", "WebSocket connections evicted as slow or dead",
+                     lambda: [({}, manager.evictions)], type="counter")
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        return Response(await registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+if metrics.METRICS_ENABLED:
+    register_metrics()
+
+
+async def resolve_code(code: str) -> Optional[UUID]:
+    """Id of the game with a join code, from cached state when there is any"""
+    snapshot = snapshot_cache.get_by_code(code)
+    if snapshot is not None:
+        return snapshot.game_id
+    state = game_store.get_by_code(code) if game_store.enabled else None
+    if state is not None:
+        return state.id
+    async with AsyncSessionLocal() as db:
+        return await queries.game_id_for_code(db, code)
+
+
+async def hand_off_games() -> int:
+    """Let go of the games this shard no longer owns; returns how many it held in the store.
+
+    Their running turns finish first, and the store is flushed before they are
+    evicted, so the new owner loads every turn from the database.
+    """
+    moved = [game_id for game_id in game_store.game_ids() if not shard.owns(game_id)]
+    if moved:
+        async with AsyncExitStack() as stack:
+            # In game_turns' lock order
+            for game_id in sorted(moved, key=str):
+                await stack.enter_async_context(game_store.lock(game_id))
+            async with AsyncSessionLocal() as db:
+                await game_store.flush(db)
+            for game_id in moved:
+                game_store.evict(game_id)
+    for game_id in snapshot_cache.game_ids():
+        if not shard.owns(game_id):
+            snapshot_cache.invalidate(game_id)
+    rooms = list(manager.active_connections)
+    if rooms:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(Game.id, Game.code).where(Game.code.in_(rooms)))).all()
+        for game_id, code in rows:
+            if not shard.owns(game_id):
+                # The clients reconnect through the router, to the new owner
+                manager.evict_room(code)
+    if not shard.owns(sharding.MATCHMAKING_KEY):
+        matchmaker.expire_waiting()
+    return len(moved)
+
+
+async def resume_bots() -> int:
+    """Start bot turns of owned games where a bot seat is to move, as after a hand-off.
+
+    Only once the previous owners have flushed: the game rows must be current.
+    """
+    async with AsyncSessionLocal() as db:
+        game_ids = await db.scalars(
+            select(Game.id)
+            .join(Player, and_(Player.game_id == Game.id, Player.order == Game.current_player_index))
+            .where(Game.status == GameStatus.IN_PROGRESS, Player.is_bot.is_(True))
+        )
+        game_ids = [game_id for game_id in game_ids if shard.owns(game_id) and game_id not in bot_tasks]
+    for game_id in game_ids:
+        bot_tasks[game_id] = asyncio.create_task(play_bot_turns(game_id))
+    return len(game_ids)
+
+
+def register_sharding() -> None:
+    """Turn away traffic for other shards' games and accept rings from the shard router"""
+    app.add_middleware(sharding.ShardMiddleware, resolve_code=resolve_code)
+    ring_lock = asyncio.Lock()
+
+    @app.get("/internal/ring", include_in_schema=False)
+    async def get_ring():
+        ring = shard.ring
+        return {
+            "shard": shard.id,
+            "epoch": ring.epoch if ring else None,
+            "shards": list(ring.shards) if ring else None,
+            "games": len(game_store),
+            "rooms": len(manager.active_connections),
+            "bot_games": len(bot_tasks),
+        }
+
+    @app.put("/internal/ring", include_in_schema=False)
+    async def put_ring(update: RingUpdate, request: Request):
+        if sharding.SHARD_TOKEN and request.headers.get(sharding.TOKEN_HEADER) != sharding.SHARD_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid shard token")
+        async with ring_lock:
+            if not shard.set_ring(HashRing(update.shards, update.vnodes, update.epoch)):
+                raise HTTPException(status_code=409, detail="A newer ring is in use")
+            handed_off = await hand_off_games()
+        return {"shard": shard.id, "epoch": update.epoch, "handed_off": handed_off}
+
+    @app.post("/internal/ring/{epoch}/settled", include_in_schema=False)
+    async def ring_settled(epoch: int, request: Request):
+        """Every shard has adopted the ring and handed off its games: take over their bot turns"""
+        if sharding.SHARD_TOKEN and request.headers.get(sharding.TOKEN_HEADER) != sharding.SHARD_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid shard token")
+        if shard.ring is None or shard.ring.epoch != epoch:
+            raise HTTPException(status_code=409, detail="A different ring is in use")
+        return {"shard": shard.id, "epoch": epoch, "bots_resumed": await resume_bots()}
 
-    def disconnect(self, websocket: WebSocket, game_code: str):
-        if game_code in self.active_connections:
-            if websocket in self.active_connections[game_code]:
-                self.active_connections[game_code].remove(websocket)
 
-    async def broadcast(self, game_code: str, message: dict):
-        if game_code in self.active_connections:
-            for connection in self.active_connections[game_code]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    # Silently ignore send failures - connection may have closed
-                    # The disconnect handler will clean up stale connections
-                    pass
+if shard.enabled:
+    register_sharding()
 
+GAME_CONFLICT_DETAIL = "Game state has changed, please refresh and try again"
+CREATE_GAME_ATTEMPTS = 3
+TURN_ACTION = TypeAdapter(TurnAction)
+# Seconds a bot waits before each of its turns, so watchers can follow along
+BOT_TURN_DELAY = float(os.getenv("BOT_TURN_DELAY", "0"))
 
-manager = ConnectionManager()
+# Running bot turn loops by game id, and games to check again before one exits
+bot_tasks: Dict[UUID, asyncio.Task] = {}
+bot_wakeups = set()
 
 
-def generate_game_code() -> str:
-    """Generate a unique 6-character game code"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request, exc: StaleDataError):
+    # Another request committed a change to the same game first
+    return JSONResponse(status_code=409, content={"detail": GAME_CONFLICT_DETAIL})
+
+
+@app.exception_handler(TurnError)
+async def turn_error_handler(request, exc: TurnError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 
 def get_available_color(existing_players: List[Player]) -> PlayerColor:
@@ -91,301 +274,811 @@ def get_available_color(existing_players: List[Player]) -> PlayerColor:
     raise HTTPException(status_code=400, detail="Game is full")
 
 
+@asynccontextmanager
+async def game_turns(db: AsyncSession, game_ids: List[UUID]) -> AsyncIterator[Dict[UUID, GameState]]:
+    """Yield the states of several games for turn actions and persist them afterwards.
+
+    Games that do not exist are missing from the yielded dict. With the
+    in-memory store enabled these are the live store objects, locked for the
+    duration, and persistence is left to the write-behind flusher; otherwise
+    the states are built from the ORM rows and every changed game is written
+    back in one transaction, where the version check on the games rows
+    rejects concurrent writers. Nothing is persisted if the block raises.
+    Changed games where a bot seat is to move get their bot turns scheduled.
+    """
+    game_ids = list(dict.fromkeys(game_ids))
+    if game_store.enabled:
+        async with AsyncExitStack() as stack:
+            states = {}
+            # Always lock in the same order, so overlapping batches cannot deadlock
+            for game_id in sorted(game_ids, key=str):
+                await stack.enter_async_context(game_store.lock(game_id))
+                if not shard.owns(game_id):
+                    # Handed off to another shard while this waited for the lock
+                    raise HTTPException(status_code=sharding.MISDIRECTED, detail=sharding.MISDIRECTED_DETAIL)
+                state = await game_store.load(db, game_id)
+                if state is not None:
+                    states[game_id] = state
+            versions = {game_id: state.version for game_id, state in states.items()}
+            yield states
+            for game_id, state in states.items():
+                if state.version != versions[game_id]:
+                    game_store.mark_dirty(state)
+                    snapshot_cache.invalidate(game_id)
+        for game_id, state in states.items():
+            if state.version != versions[game_id]:
+                schedule_bots(state)
+        return
+
+    games = {game.id: game for game in await queries.load_games(db, game_ids)}
+    states = {game_id: GameState.from_model(game) for game_id, game in games.items()}
+    versions = {game_id: state.version for game_id, state in states.items()}
+    yield states
+    changed = [game_id for game_id, state in states.items() if state.version != versions[game_id]]
+    if not changed:
+        return
+    for game_id in changed:
+        state, game = states[game_id], games[game_id]
+        state.write_to(game)
+        for outcome in state.unsaved_moves if move_log.MOVE_ROWS_ENABLED else ():
+            db.add(Move(
+                game_id=game.id,
+                player_id=outcome.player_id,
+                dice_value=outcome.dice_value,
+                piece_index=outcome.piece_index,
+                from_position=outcome.from_position,
+                to_position=outcome.to_position,
+                captured_player_id=outcome.captured_player.id if outcome.captured_player else None,
+                captured_piece_index=outcome.captured_piece_index,
+                created_at=outcome.created_at,
+            ))
+        state.unsaved_moves.clear()
+    await db.commit()
+    for game_id in changed:
+        snapshot_cache.invalidate(game_id)
+        schedule_bots(states[game_id])
+
+
+@asynccontextmanager
+async def game_turn(db: AsyncSession, game_id: UUID, expected_version: Optional[int] = None) -> AsyncIterator[GameState]:
+    """game_turns for a single game: 404 if it does not exist, 409 on a stale expected_version"""
+    async with game_turns(db, [game_id]) as states:
+        state = states.get(game_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Game not found")
+        check_version(state, expected_version)
+        yield state
+
+
+@asynccontextmanager
+async def lobby_change(game_id: UUID) -> AsyncIterator[None]:
+    """Commit a change to a waiting game (a seat taken, the start) made through the ORM.
+
+    With the in-memory store enabled the game's lock is held, so no turn
+    action runs meanwhile, and any state cached from before is dropped: the
+    next turn action loads the committed rows.
+    """
+    if not game_store.enabled:
+        yield
+        return
+    async with game_store.lock(game_id):
+        game_store.evict(game_id)
+        yield
+
+
+def check_version(state: GameState, expected_version: Optional[int]) -> None:
+    if expected_version is not None and expected_version != state.version:
+        raise HTTPException(status_code=409, detail=GAME_CONFLICT_DETAIL)
+
+
+def bump_version(game: Game) -> int:
+    """Advance the game's state version; call once per committed state change"""
+    game.version = (game.version or 0) + 1
+    return game.version
+
+
+def player_changes(player: Union[Player, PlayerState]) -> dict:
+    """Partial player object for a delta, carrying only mutable fields"""
+    return {"id": str(player.id), "pieces": list(player.pieces)}
+
+
+def build_delta(game: Union[Game, GameState], event: str, changes: dict, meta: Optional[dict] = None) -> dict:
+    """Build the versioned delta message for a state change.
+
+    Must be called after bump_version().
+    """
+    return GameDelta(
+        game_id=game.id,
+        version=game.version,
+        event=event,
+        changes=changes,
+        meta=meta or {},
+    ).model_dump(mode="json")
+
+
+def move_delta(state: GameState, player: PlayerState, outcome: game_state.MoveOutcome) -> dict:
+    changed_players = [player_changes(player)]
+    if outcome.captured_player:
+        changed_players.append(player_changes(outcome.captured_player))
+    return build_delta(state, "piece_moved", {
+        "status": state.status.value,
+        "current_player_index": state.current_player_index,
+        "winner_id": str(outcome.winner_id) if outcome.winner_id else None,
+        "pending_roll": None,
+        "players": changed_players,
+    }, {
+        "player_id": str(player.id),
+        "piece_index": outcome.piece_index,
+        "from_position": outcome.from_position,
+        "to_position": outcome.to_position,
+        "dice_value": outcome.dice_value,
+        "captured": outcome.captured_player is not None,
+    })
+
+
+def move_response(outcome: game_state.MoveOutcome) -> MoveResponse:
+    return MoveResponse(
+        success=True,
+        new_position=outcome.to_position,
+        captured=outcome.captured_player is not None,
+        captured_player_id=outcome.captured_player.id if outcome.captured_player else None,
+        winner_id=outcome.winner_id,
+        message=outcome.message
+    )
+
+
+def skip_delta(state: GameState, player: PlayerState) -> dict:
+    return build_delta(
+        state, "turn_skipped",
+        {"current_player_index": state.current_player_index, "pending_roll": None},
+        {"player_id": str(player.id)},
+    )
+
+
+async def game_snapshot(db: AsyncSession, game_id: Optional[UUID] = None, code: Optional[str] = None) -> Snapshot:
+    """Serialized snapshot of a game's current version, from the cache when possible"""
+    state = None
+    if game_store.enabled:
+        state = game_store.get(game_id) if game_id is not None else game_store.get_by_code(code)
+    cached = snapshot_cache.get(game_id) if game_id is not None else snapshot_cache.get_by_code(code)
+    if state is not None:
+        if cached is not None and cached.version == state.version:
+            return cached
+        return snapshot_cache.put(state.id, state.code, state.version, serialize_game(state))
+    if cached is not None:
+        if snapshot_cache.trusted or await queries.game_version(db, cached.game_id) == cached.version:
+            return cached
+
+    game = await queries.load_game(db, game_id) if game_id is not None else await queries.load_game_by_code(db, code)
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return snapshot_cache.put(game.id, game.code, game.version, serialize_game(game))
+
+
+def snapshot_response(snapshot: Snapshot, request: Request) -> Response:
+    packed = wants_msgpack(request)
+    # Each representation has its own ETag
+    etag = snapshot.etag[:-1] + '-msgpack"' if packed else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if not packed:
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    if snapshot.packed is None:
+        snapshot = snapshot_cache.add_packed(snapshot, wire.pack(serialization.loads(snapshot.body)))
+    return Response(content=snapshot.packed, media_type=wire.MSGPACK_MEDIA_TYPE, headers=headers)
+
+
+def wants_msgpack(request: Request) -> bool:
+    return wire.available() and wire.accepts_msgpack(request.headers.get("accept"))
+
+
+def negotiate(request: Request, content: Any, players: Iterable[Any] = ()) -> Response:
+    """A response model or document as MessagePack if the client asked for it, else as JSON.
+
+    The rendered response bypasses FastAPI's response_model validation.
+    players gives the seats of player ids that content does not list itself.
+    """
+    if not wants_msgpack(request):
+        return FastJSONResponse(content)
+    return Response(content=wire.pack(serialization.jsonable(content), wire.seat_map(players)),
+                    media_type=wire.MSGPACK_MEDIA_TYPE, headers={"Vary": "Accept"})
+
+
 @app.get("/")
-def root():
+async def root():
     return {"message": "Не се сърди човече - API", "version": "1.0.0"}
 
 
 @app.post("/api/games", response_model=GameResponse)
-def create_game(game_data: GameCreate, db: Session = Depends(get_db)):
+async def create_game(game_data: GameCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Create a new game and add the first player"""
-    code = generate_game_code()
-    
-    # Ensure unique code
-    while db.query(Game).filter(Game.code == code).first():
-        code = generate_game_code()
-    
-    game = Game(code=code, status=GameStatus.WAITING)
-    db.add(game)
-    db.flush()
-    
-    player = Player(
-        game_id=game.id,
-        name=game_data.player_name,
-        color=PlayerColor.RED,
-        pieces=[-1, -1, -1, -1],
-        order=0
-    )
-    db.add(player)
-    db.commit()
-    db.refresh(game)
-    
-    return game
+    for attempt in range(CREATE_GAME_ATTEMPTS):
+        player = Player(
+            name=game_data.player_name,
+            color=PlayerColor.RED,
+            pieces=[-1, -1, -1, -1],
+            order=0
+        )
+        game = Game(code=await code_allocator.allocate(), status=GameStatus.WAITING, players=[player])
+        db.add(game)
+        try:
+            await db.commit()
+            return negotiate(request, game_document(game))
+        except IntegrityError:
+            # Allocated codes never repeat; only a random code from before the
+            # allocator existed can still be taken
+            await db.rollback()
+    raise HTTPException(status_code=503, detail="Could not allocate a game code")
 
 
 @app.post("/api/games/join", response_model=GameResponse)
-def join_game(join_data: GameJoin, db: Session = Depends(get_db)):
+async def join_game(join_data: GameJoin, request: Request, background_tasks: BackgroundTasks,
+                    db: AsyncSession = Depends(get_async_db)):
     """Join an existing game"""
-    game = db.query(Game).filter(Game.code == join_data.code.upper()).first()
-    
+    game = await queries.load_game_by_code(db, join_data.code.upper())
+
+    if not game:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    if game.status != GameStatus.WAITING:
+        raise HTTPException(status_code=400, detail="Game has already started")
+
+    await seat_player(db, game, join_data.player_name, background_tasks)
+    return negotiate(request, game_document(game))
+
+
+@app.post("/api/games/{game_id}/bots", response_model=GameResponse)
+async def add_bot(game_id: UUID, bot_data: BotCreate, request: Request, background_tasks: BackgroundTasks,
+                  db: AsyncSession = Depends(get_async_db)):
+    """Fill an empty seat of a waiting game with a bot played by the server"""
+    game = await queries.load_game(db, game_id)
+
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    
+
     if game.status != GameStatus.WAITING:
         raise HTTPException(status_code=400, detail="Game has already started")
-    
+
+    await seat_player(db, game, bot_data.name or f"Bot {len(game.players) + 1}", background_tasks, is_bot=True)
+    return negotiate(request, game_document(game))
+
+
+async def seat_player(db: AsyncSession, game: Game, name: str, background_tasks: BackgroundTasks,
+                      is_bot: bool = False) -> Player:
+    """Add a player to the next free seat of a waiting game and announce it"""
     if len(game.players) >= 4:
         raise HTTPException(status_code=400, detail="Game is full")
-    
+
     color = get_available_color(game.players)
-    
+
     player = Player(
-        game_id=game.id,
-        name=join_data.player_name,
+        name=name,
         color=color,
         pieces=[-1, -1, -1, -1],
-        order=len(game.players)
+        order=len(game.players),
+        is_bot=is_bot,
     )
-    db.add(player)
-    db.commit()
-    db.refresh(game)
-    
-    return game
+    game.players.append(player)
+    await db.flush()
+
+    bump_version(game)
+    delta = build_delta(game, "player_joined", {
+        "players": [player_document(player)]
+    })
+    async with lobby_change(game.id):
+        await db.commit()
+    snapshot_cache.invalidate(game.id)
+    background_tasks.add_task(manager.broadcast, game.code, delta)
+    return player
 
 
 @app.get("/api/games/{game_id}", response_model=GameResponse)
-def get_game(game_id: UUID, db: Session = Depends(get_db)):
-    """Get game details"""
-    game = db.query(Game).filter(Game.id == game_id).first()
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
-    return game
+async def get_game(game_id: UUID, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get game details; supports If-None-Match with the returned ETag"""
+    return snapshot_response(await game_snapshot(db, game_id=game_id), request)
 
 
 @app.get("/api/games/code/{code}", response_model=GameResponse)
-def get_game_by_code(code: str, db: Session = Depends(get_db)):
-    """Get game details by code"""
-    game = db.query(Game).filter(Game.code == code.upper()).first()
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
-    return game
+async def get_game_by_code(code: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get game details by code; supports If-None-Match with the returned ETag"""
+    return snapshot_response(await game_snapshot(db, code=code.upper()), request)
 
 
 @app.post("/api/games/{game_id}/start", response_model=GameResponse)
-def start_game(game_id: UUID, db: Session = Depends(get_db)):
+async def start_game(game_id: UUID, request: Request, background_tasks: BackgroundTasks,
+                     db: AsyncSession = Depends(get_async_db)):
     """Start the game"""
-    game = db.query(Game).filter(Game.id == game_id).first()
-    
+    game = await queries.load_game(db, game_id)
+
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    
+
     if len(game.players) < 2:
         raise HTTPException(status_code=400, detail="Need at least 2 players to start")
-    
+
     if game.status != GameStatus.WAITING:
         raise HTTPException(status_code=400, detail="Game has already started")
-    
+
     game.status = GameStatus.IN_PROGRESS
-    db.commit()
-    db.refresh(game)
-    
-    return game
+    bump_version(game)
+    delta = build_delta(game, "game_started", {"status": GameStatus.IN_PROGRESS.value})
+    async with lobby_change(game.id):
+        await db.commit()
+    snapshot_cache.invalidate(game.id)
+    background_tasks.add_task(manager.broadcast, game.code, delta)
+    schedule_bots(GameState.from_model(game))
 
+    return negotiate(request, game_document(game))
+
+
+def match_ticket(ticket: Ticket) -> MatchTicket:
+    game = ticket.game
+    return MatchTicket(
+        ticket_id=ticket.id,
+        status=ticket.status,
+        game_id=game.id if game else None,
+        game_code=game.code if game else None,
+        player_id=ticket.player_id,
+    )
+
+
+@app.post("/api/matchmaking", response_model=MatchTicket)
+async def join_matchmaking(match_data: MatchRequest, request: Request):
+    """Queue for a game with other players, started as soon as it is formed (see matchmaking.py).
+
+    Wait for the game on /ws/matchmaking/{ticket_id}, or poll the ticket.
+    """
+    if not matchmaking.MATCHMAKING_ENABLED:
+        raise HTTPException(status_code=503, detail="Matchmaking is disabled")
+    return negotiate(request, match_ticket(matchmaker.join(match_data.player_name)))
+
+
+def get_ticket(ticket_id: UUID) -> Ticket:
+    ticket = matchmaker.get(ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return ticket
+
+
+@app.get("/api/matchmaking/{ticket_id}", response_model=MatchTicket)
+async def get_match_ticket(ticket_id: UUID, request: Request):
+    """Status of a matchmaking ticket, with the game once matched"""
+    ticket = get_ticket(ticket_id)
+    return negotiate(request, match_ticket(ticket), players=ticket.game.players if ticket.game else ())
+
+
+@app.delete("/api/matchmaking/{ticket_id}", response_model=MatchTicket)
+async def leave_matchmaking(ticket_id: UUID, request: Request):
+    """Leave the matchmaking queue"""
+    ticket = get_ticket(ticket_id)
+    if not matchmaker.cancel(ticket_id):
+        raise HTTPException(status_code=409, detail="Ticket is no longer waiting")
+    return negotiate(request, match_ticket(ticket))
+
+
+def roll_action(state: GameState, player_id: UUID, auto_apply: bool = False) -> Tuple[DiceRollResponse, List[dict]]:
+    """Roll for the player whose turn it is; returns the response and the deltas to broadcast"""
+    current_player = game_state.current_player_for(state, player_id)
 
-@app.post("/api/games/roll-dice", response_model=DiceRollResponse)
-def roll_dice(roll_data: DiceRoll, db: Session = Depends(get_db)):
-    """Roll the dice for a player's turn"""
-    game = db.query(Game).filter(Game.id == roll_data.game_id).first()
-    
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    if game.status != GameStatus.IN_PROGRESS:
-        raise HTTPException(status_code=400, detail="Game is not in progress")
-    
-    current_player = game.players[game.current_player_index]
-    
-    if current_player.id != roll_data.player_id:
-        raise HTTPException(status_code=400, detail="Not your turn")
-    
     # Check if player must skip turns (penalty for consecutive 6s)
-    if current_player.turns_to_skip and current_player.turns_to_skip > 0:
-        current_player.turns_to_skip -= 1
-        game.current_player_index = (game.current_player_index + 1) % len(game.players)
-        db.commit()
-        return DiceRollResponse(
-            value=0,
-            can_move=False,
-            valid_moves=[]
+    if state.pending_roll is None and game_state.serve_penalty(state, current_player):
+        state.bump_version()
+        delta = build_delta(
+            state, "turn_penalty_skipped",
+            {"current_player_index": state.current_player_index},
+            {"player_id": str(current_player.id)},
         )
+        return DiceRollResponse(value=0, can_move=False, valid_moves=[], version=state.version), [delta]
 
-    dice_value = game_logic.roll_dice()
+    deltas = []
+    if state.pending_roll is None:
+        valid_moves = game_state.roll(state, current_player, game_logic.roll_dice())
+        state.bump_version()
+        deltas.append(build_delta(
+            state, "dice_rolled", {"pending_roll": state.pending_roll},
+            {"player_id": str(current_player.id), "value": state.pending_roll, "valid_moves": valid_moves},
+        ))
+    else:
+        valid_moves = game_state.pending_moves(state)
+    dice_value = state.pending_roll
 
-    # Build opponent pieces dict for stack blocking check
-    opponent_pieces = {
-        p.color: list(p.pieces)
-        for p in game.players
-        if p.id != current_player.id
-    }
+    applied = move = None
+    if auto_apply and len(valid_moves) == 1:
+        outcome = game_state.play_roll(state, current_player, valid_moves[0]["piece_index"])
+        state.bump_version()
+        deltas.append(move_delta(state, current_player, outcome))
+        applied, move = "moved", move_response(outcome)
+    elif auto_apply and not valid_moves:
+        game_state.pass_roll(state, current_player)
+        state.bump_version()
+        deltas.append(skip_delta(state, current_player))
+        applied = "skipped"
 
-    valid_moves = game_logic.get_valid_moves(
-        current_player.pieces,
-        dice_value,
-        current_player.color,
-        opponent_pieces
-    )
-    
     return DiceRollResponse(
         value=dice_value,
         can_move=len(valid_moves) > 0,
-        valid_moves=valid_moves
-    )
+        valid_moves=valid_moves,
+        version=state.version,
+        applied=applied,
+        move=move,
+    ), deltas
 
 
-@app.post("/api/games/move", response_model=MoveResponse)
-def make_move(move_data: MoveRequest, db: Session = Depends(get_db)):
-    """Make a move"""
-    game = db.query(Game).filter(Game.id == move_data.game_id).first()
-    
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    if game.status != GameStatus.IN_PROGRESS:
-        raise HTTPException(status_code=400, detail="Game is not in progress")
-    
-    current_player = game.players[game.current_player_index]
-    
-    if current_player.id != move_data.player_id:
-        raise HTTPException(status_code=400, detail="Not your turn")
-    
-    piece_idx = move_data.piece_index
-    if piece_idx < 0 or piece_idx > 3:
-        raise HTTPException(status_code=400, detail="Invalid piece index")
-    
-    pieces = list(current_player.pieces)
-
-    # Build opponent pieces dict for stack blocking check
-    opponent_pieces = {
-        p.color: list(p.pieces)
-        for p in game.players
-        if p.id != current_player.id
-    }
+def move_action(state: GameState, player_id: UUID, piece_index: int,
+                dice_value: Optional[int] = None) -> Tuple[MoveResponse, List[dict]]:
+    current_player = game_state.current_player_for(state, player_id)
+    outcome = game_state.play_roll(state, current_player, piece_index, dice_value)
+    state.bump_version()
+    return move_response(outcome), [move_delta(state, current_player, outcome)]
 
-    can_move, new_pos = game_logic.can_move_piece(
-        pieces[piece_idx],
-        move_data.dice_value,
-        current_player.color,
-        pieces,
-        opponent_pieces
-    )
-    
-    if not can_move:
-        raise HTTPException(status_code=400, detail="Invalid move")
-    
-    # Check for capture
-    all_players = {
-        str(p.id): (p.color, list(p.pieces))
-        for p in game.players
-        if p.id != current_player.id
-    }
-    
-    capture = game_logic.check_capture(new_pos, current_player.color, all_players)
-    captured_player_id = None
-    
-    if capture:
-        captured_player_id_str, captured_piece_idx = capture
-        captured_player = db.query(Player).filter(Player.id == UUID(captured_player_id_str)).first()
-        if captured_player:
-            cap_pieces = list(captured_player.pieces)
-            cap_pieces[captured_piece_idx] = -1  # Send back home
-            captured_player.pieces = cap_pieces
-            captured_player_id = captured_player.id
-    
-    # Update piece position
-    old_pos = pieces[piece_idx]
-    pieces[piece_idx] = new_pos
-    current_player.pieces = pieces
-    
-    # Record the move
-    move = Move(
-        game_id=game.id,
-        player_id=current_player.id,
-        dice_value=move_data.dice_value,
-        piece_index=piece_idx,
-        from_position=old_pos,
-        to_position=new_pos,
-        captured_player_id=captured_player_id,
-        captured_piece_index=capture[1] if capture else None
-    )
-    db.add(move)
-    
-    # Check for winner
-    winner_id = None
-    if game_logic.check_winner(pieces):
-        game.status = GameStatus.FINISHED
-        game.winner_id = current_player.id
-        winner_id = current_player.id
-        message = f"{current_player.name} wins!"
-        # Reset consecutive sixes on game end
-        current_player.consecutive_sixes = 0
+
+def skip_action(state: GameState, player_id: UUID) -> List[dict]:
+    current_player = game_state.current_player_for(state, player_id)
+    game_state.pass_roll(state, current_player)
+    state.bump_version()
+    return [skip_delta(state, current_player)]
+
+
+def apply_action(state: GameState, action: TurnAction) -> Tuple[ActionResult, List[dict]]:
+    """Apply one batch action or WebSocket command to its game's state.
+
+    The game_state checks run before anything is changed, so an action that
+    raises leaves the state as it was.
+    """
+    check_version(state, action.expected_version)
+    result = ActionResult(action=action.action, game_id=state.id, ok=True)
+    if action.action == "roll":
+        result.roll, deltas = roll_action(state, action.player_id, action.auto_apply)
+    elif action.action == "move":
+        result.move, deltas = move_action(state, action.player_id, action.piece_index, action.dice_value)
     else:
-        # Handle consecutive 6s rule
-        if move_data.dice_value == 6:
-            current_player.consecutive_sixes = (current_player.consecutive_sixes or 0) + 1
-            if current_player.consecutive_sixes >= 2:
-                # Penalty: skip 4 turns
-                current_player.turns_to_skip = 4
-                current_player.consecutive_sixes = 0
-                game.current_player_index = (game.current_player_index + 1) % len(game.players)
-                message = "Two consecutive 6s! Must skip 4 turns."
-            else:
-                # Roll again on 6
-                message = "Rolled 6! Roll again."
-        else:
-            # Reset consecutive sixes counter and pass turn
-            current_player.consecutive_sixes = 0
-            game.current_player_index = (game.current_player_index + 1) % len(game.players)
-            message = "Move successful"
+        deltas = skip_action(state, action.player_id)
+    result.version = state.version
+    return result, deltas
 
-    db.commit()
-    
-    return MoveResponse(
-        success=True,
-        new_position=new_pos,
-        captured=capture is not None,
-        captured_player_id=captured_player_id,
-        winner_id=winner_id,
-        message=message
-    )
+
+def failed_action(action: TurnAction, exc: Exception) -> ActionResult:
+    status, detail = (exc.status_code, exc.detail) if isinstance(exc, HTTPException) else (400, str(exc))
+    return ActionResult(action=action.action, game_id=action.game_id, ok=False, status=status, detail=detail)
+
+
+async def run_actions(db: AsyncSession, actions: List[TurnAction],
+                      players: Optional[List[PlayerState]] = None) -> Tuple[List[ActionResult], List[Tuple[str, dict]]]:
+    """Apply actions in order in one transaction; returns per-action results and (game code, delta) pairs.
+
+    A rejected action is reported in its result and the following ones still run.
+    The players of the games involved are added to players if given.
+    """
+    results, deltas = [], []
+    async with game_turns(db, [a.game_id for a in actions]) as states:
+        if players is not None:
+            players.extend(p for state in states.values() for p in state.players)
+        for action in actions:
+            state = states.get(action.game_id)
+            try:
+                if state is None:
+                    raise HTTPException(status_code=404, detail="Game not found")
+                result, action_deltas = apply_action(state, action)
+            except (HTTPException, TurnError) as exc:
+                results.append(failed_action(action, exc))
+                continue
+            results.append(result)
+            deltas.extend((state.code, delta) for delta in action_deltas)
+    return results, deltas
+
+
+def broadcast_later(background_tasks: BackgroundTasks, game_code: str, deltas: List[dict]) -> None:
+    for delta in deltas:
+        background_tasks.add_task(manager.broadcast, game_code, delta)
+
+
+def schedule_bots(state: GameState) -> None:
+    """Play the game's bot turns in the background if a bot seat is to move"""
+    if state.status != GameStatus.IN_PROGRESS or not state.current_player.is_bot:
+        return
+    if state.id in bot_tasks:
+        # The running loop may be about to exit; make it look again
+        bot_wakeups.add(state.id)
+        return
+    bot_tasks[state.id] = asyncio.create_task(play_bot_turns(state.id))
+
+
+async def choose_move(search: tuple) -> Optional[ai.Suggestion]:
+    """The AI's move for ai.search_args() of a state and roll"""
+    started = time.perf_counter()
+    suggestion = await ai.choose(search)
+    if metrics.METRICS_ENABLED:
+        metrics.AI_DECISION.observe(time.perf_counter() - started)
+    return suggestion
+
+
+async def bot_turn(game_id: UUID) -> bool:
+    """Roll and move for the bot seat to move; False if it is not a bot's turn.
+
+    The roll is committed first, and the move is searched with no game lock
+    or transaction held, then played only if the game is still as rolled.
+    """
+    async with AsyncSessionLocal() as db:
+        async with game_turns(db, [game_id]) as states:
+            state = states.get(game_id)
+            if state is None or state.status != GameStatus.IN_PROGRESS or not state.current_player.is_bot:
+                return False
+            player = state.current_player
+            roll, deltas = roll_action(state, player.id, auto_apply=True)
+            # auto_apply already played forced turns
+            search = ai.search_args(state, roll.value) if roll.can_move and roll.applied is None else None
+            rolled_version = state.version
+    for delta in deltas:
+        await manager.broadcast(state.code, delta)
+    if search is None:
+        return True
+
+    suggestion = await choose_move(search)
+    async with AsyncSessionLocal() as db:
+        async with game_turns(db, [game_id]) as states:
+            state = states.get(game_id)
+            if state is None or state.version != rolled_version:
+                # Changed during the search; the loop looks at the new state
+                return True
+            deltas = move_action(state, player.id, suggestion.piece_index)[1]
+    for delta in deltas:
+        await manager.broadcast(state.code, delta)
+    return True
+
+
+async def play_bot_turns(game_id: UUID) -> None:
+    """Play bot turns of a game until a human is to move or the game ends"""
+    try:
+        while True:
+            bot_wakeups.discard(game_id)
+            if BOT_TURN_DELAY:
+                await asyncio.sleep(BOT_TURN_DELAY)
+            if not shard.owns(game_id):
+                # Handed off; the new owner resumes the bot turns
+                return
+            try:
+                played = await bot_turn(game_id)
+            except StaleDataError:
+                # Another writer got there first; look at the new state
+                continue
+            except HTTPException:
+                # 421: handed off during the turn; the new owner resumes the bot turns
+                return
+            if not played and game_id not in bot_wakeups:
+                return
+    except Exception:
+        logger.exception("Bot turns of game %s failed", game_id)
+    finally:
+        bot_tasks.pop(game_id, None)
+
+
+@app.post("/api/games/roll-dice", response_model=DiceRollResponse)
+async def roll_dice(roll_data: DiceRoll, request: Request, background_tasks: BackgroundTasks,
+                    db: AsyncSession = Depends(get_async_db)):
+    """Roll the dice for a player's turn.
+
+    The roll is stored with the game and the following move or skip is checked
+    against it. Rolling again before playing returns the same roll. With
+    auto_apply a forced turn (a single valid move, or none) is played at once.
+    """
+    async with game_turn(db, roll_data.game_id, roll_data.expected_version) as state:
+        response, deltas = roll_action(state, roll_data.player_id, roll_data.auto_apply)
+    broadcast_later(background_tasks, state.code, deltas)
+    return negotiate(request, response, players=state.players)
+
+
+@app.post("/api/games/move", response_model=MoveResponse)
+async def make_move(move_data: MoveRequest, request: Request, background_tasks: BackgroundTasks,
+                    db: AsyncSession = Depends(get_async_db)):
+    """Move a piece by the pending roll"""
+    async with game_turn(db, move_data.game_id, move_data.expected_version) as state:
+        response, deltas = move_action(state, move_data.player_id, move_data.piece_index, move_data.dice_value)
+    broadcast_later(background_tasks, state.code, deltas)
+    return negotiate(request, response, players=state.players)
 
 
 @app.post("/api/games/{game_id}/skip-turn")
-def skip_turn(game_id: UUID, skip_data: SkipTurnRequest, db: Session = Depends(get_db)):
-    """Skip turn when no valid moves available"""
-    game = db.query(Game).filter(Game.id == game_id).first()
-    
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
-    
-    current_player = game.players[game.current_player_index]
-    
-    if current_player.id != skip_data.player_id:
-        raise HTTPException(status_code=400, detail="Not your turn")
-    
-    game.current_player_index = (game.current_player_index + 1) % len(game.players)
-    db.commit()
-    
-    return {"message": "Turn skipped"}
+async def skip_turn(game_id: UUID, skip_data: SkipTurnRequest, request: Request, background_tasks: BackgroundTasks,
+                    db: AsyncSession = Depends(get_async_db)):
+    """Skip turn when the pending roll allows no valid move"""
+    async with game_turn(db, game_id, skip_data.expected_version) as state:
+        deltas = skip_action(state, skip_data.player_id)
+    broadcast_later(background_tasks, state.code, deltas)
+    return negotiate(request, {"message": "Turn skipped"})
+
+
+@app.post("/api/games/batch", response_model=BatchResponse)
+async def batch_actions(batch: BatchRequest, request: Request, background_tasks: BackgroundTasks,
+                        db: AsyncSession = Depends(get_async_db)):
+    """Apply a sequence of roll / move / skip actions, for one or more games, in one transaction.
+
+    Actions run in order and each gets a result; a rejected action changes
+    nothing and does not stop the ones after it.
+    """
+    if len(batch.actions) > BATCH_MAX_ACTIONS:
+        raise HTTPException(status_code=400, detail=BATCH_LIMIT_DETAIL)
+    players = []
+    results, deltas = await run_actions(db, batch.actions, players)
+    for game_code, delta in deltas:
+        background_tasks.add_task(manager.broadcast, game_code, delta)
+    return negotiate(request, BatchResponse(results=results), players=players)
+
+
+@app.get("/api/games/{game_id}/history", response_model=GameHistoryResponse)
+async def get_game_history(game_id: UUID, request: Request, at: Optional[int] = None,
+                           db: AsyncSession = Depends(get_async_db)):
+    """Turn events of a game and its position after the first `at` of them (default: all)"""
+    state = game_store.get(game_id) if game_store.enabled else None
+    if state is None:
+        game = await queries.load_game(db, game_id)
+        if not game:
+            raise HTTPException(status_code=404, detail="Game not found")
+        state = GameState.from_model(game)
+    total = len(state.move_log)
+    if at is not None and not 0 <= at <= total:
+        raise HTTPException(status_code=400, detail=f"Move number must be between 0 and {total}")
+    try:
+        position = replay.replay(state, at)
+    except move_log.MoveLogError:
+        # Games started before the move log existed only have part of their history
+        raise HTTPException(status_code=409, detail="History is not available for this game")
+    return negotiate(request, GameHistoryResponse(
+        game_id=state.id,
+        move_number=len(position.move_log),
+        total_moves=total,
+        status=position.status,
+        current_player_index=position.current_player_index,
+        winner_id=position.winner_id,
+        players=serialization.PLAYERS.validate_python(position.players, from_attributes=True),
+        events=[
+            HistoryEvent(
+                seat=e.seat,
+                player_id=state.players[e.seat].id,
+                kind=e.kind,
+                piece_index=e.piece_index if e.kind == "move" else None,
+                dice_value=e.die if e.kind == "move" else None,
+                captured=e.captured,
+            )
+            for e in move_log.decode(state.move_log)
+        ],
+    ))
+
+
+@app.get("/api/games/{game_id}/suggest-move", response_model=MoveSuggestion)
+async def suggest_move(game_id: UUID, player_id: UUID, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """The AI's choice of move for the player's pending roll, searched within AI_TIME_BUDGET"""
+    state = game_store.get(game_id) if game_store.enabled else None
+    if state is None:
+        game = await queries.load_game(db, game_id)
+        if not game:
+            raise HTTPException(status_code=404, detail="Game not found")
+        state = GameState.from_model(game)
+    game_state.current_player_for(state, player_id)
+    if state.pending_roll is None:
+        raise TurnError("Roll the dice first")
+    suggestion = await choose_move(ai.search_args(state, state.pending_roll))
+    if suggestion is None:
+        raise TurnError("No valid move for this roll")
+    return negotiate(request, MoveSuggestion(
+        piece_index=suggestion.piece_index,
+        to_position=suggestion.to_position,
+        value=suggestion.value,
+        depth=suggestion.depth,
+        nodes=suggestion.nodes,
+        elapsed_ms=suggestion.elapsed * 1000,
+    ))
+
+
+async def run_command(connection: Connection, game_id: Optional[UUID], message: dict) -> None:
+    """Apply a {"type": "command", "action": ...} message to the socket's game.
+
+    The result goes back to the commanding socket only; the resulting deltas
+    are broadcast to the whole room as for HTTP turn actions.
+    """
+    reply = CommandResult(id=message.get("id"), action=message.get("action"), game_id=game_id, ok=False)
+    deltas = []
+    if game_id is None:
+        reply.status, reply.detail = 404, "Game not found"
+    else:
+        try:
+            action = TURN_ACTION.validate_python({**message, "game_id": game_id})
+            async with AsyncSessionLocal() as db:
+                results, deltas = await run_actions(db, [action])
+            reply = CommandResult(id=reply.id, **results[0].model_dump())
+        except ValidationError as e:
+            reply.status, reply.detail = 422, str(e)
+        except StaleDataError:
+            reply.status, reply.detail = 409, GAME_CONFLICT_DETAIL
+    connection.enqueue(manager.encode_for(connection, reply.model_dump(mode="json")))
+    for game_code, delta in deltas:
+        await manager.broadcast(game_code, delta)
+
+
+async def room_seats(game_code: str) -> wire.Seats:
+    """Seats of a game's players, for compact messages to binary WebSocket clients"""
+    state = game_store.get_by_code(game_code) if game_store.enabled else None
+    if state is not None:
+        return wire.seat_map(state.players)
+    async with AsyncSessionLocal() as db:
+        game = await queries.load_game_by_code(db, game_code)
+        return wire.seat_map(game.players) if game else {}
 
 
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws/{game_code}")
 async def websocket_endpoint(websocket: WebSocket, game_code: str):
-    await manager.connect(websocket, game_code)
+    """Game room; connect with ?format=msgpack for MessagePack binary frames (see wire.py).
+
+    Only the server broadcasts to the room. Clients send heartbeat pongs and
+    turn commands; anything else they send is ignored.
+    """
+    binary = websocket.query_params.get("format") == wire.WS_FORMAT and wire.available()
+    seats = await room_seats(game_code) if binary else None
+    connection = await manager.connect(websocket, game_code, binary, seats)
+    game_id = None
+
+    async def on_message(data: Union[str, bytes]):
+        nonlocal game_id
+        try:
+            message = wire.loads(data)
+        except ValueError:
+            return
+        # Turn commands from bots, answered on this socket; heartbeat pongs and
+        # anything else only refresh the connection's last_seen
+        if not isinstance(message, dict) or message.get("type") != "command":
+            return
+        if game_id is None:
+            async with AsyncSessionLocal() as db:
+                game_id = await queries.game_id_for_code(db, game_code)
+        await run_command(connection, game_id, message)
+
     try:
-        while True:
-            data = await websocket.receive_json()
-            # Broadcast game state updates to all players
-            await manager.broadcast(game_code, data)
-    except WebSocketDisconnect:
-        manager.disconnect(websocket, game_code)
+        await connection.serve(on_message)
+    finally:
+        await manager.disconnect(connection)
+
+
+@app.websocket("/ws/matchmaking/{ticket_id}")
+async def matchmaking_socket(websocket: WebSocket, ticket_id: UUID):
+    """Wait for a matchmaking ticket's game.
+
+    Sends one message when the ticket stops waiting and closes: "match_found"
+    with the ticket and the started game, or "match_expired" /
+    "match_cancelled". Closing the socket before that leaves the queue.
+    Connect with ?format=msgpack for a MessagePack binary frame.
+    """
+    binary = websocket.query_params.get("format") == wire.WS_FORMAT and wire.available()
+    await websocket.accept()
+    ticket = matchmaker.get(ticket_id)
+    if ticket is None:
+        await websocket.close(code=matchmaking.CLOSE_UNKNOWN_TICKET)
+        return
+
+    async def until_disconnect():
+        with suppress(Exception):
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+    matched = asyncio.create_task(ticket.done.wait())
+    disconnected = asyncio.create_task(until_disconnect())
+    await asyncio.wait((matched, disconnected), return_when=asyncio.FIRST_COMPLETED)
+    matched.cancel()
+    disconnected.cancel()
+    if not ticket.done.is_set():
+        # The player left before a game was formed
+        matchmaker.cancel(ticket.id)
+        return
+
+    message = {
+        "type": "match_found" if ticket.status == matchmaking.MATCHED else f"match_{ticket.status}",
+        **match_ticket(ticket).model_dump(mode="json"),
+        "game": game_document(ticket.game) if ticket.game else None,
+    }
+    with suppress(Exception):
+        if binary:
+            await websocket.send_bytes(wire.pack(serialization.jsonable(message), wire.seat_map(ticket.game.players)
+                                                 if ticket.game else None))
+        else:
+            await websocket.send_text(serialization.dumps(message).decode())
+        await websocket.close()
@@ -0,0 +1,244 @@
+"""In-process matchmaking: groups waiting players into started games.
+
+POST /api/matchmaking queues a player and returns a ticket. Every
+MATCHMAKING_INTERVAL seconds the matchmaker forms games from the waiting
+tickets, in arrival order:
+
+  - every four waiting players make a 4-seat game at once;
+  - the one to three left over make a smaller game once the oldest of them
+    has waited the window for that size, MATCHMAKING_WINDOWS as
+    "seats:seconds" pairs (by default 3 seats after 5 s, 2 after 15 s);
+  - a ticket still waiting after MATCHMAKING_TIMEOUT expires.
+
+All games formed in one pass are inserted already started, with all their
+players, in one transaction of two bulk INSERTs. Ticket holders learn their
+game and player id on /ws/matchmaking/{ticket_id}, or by polling
+GET /api/matchmaking/{ticket_id}, and then join the game room as usual.
+
+The queue lives in the worker process: with several workers, a ticket's
+requests must reach the worker that issued it. The shard router sends all
+of them to one shard (see sharding.py); when the queue moves to another
+shard, the tickets waiting on the old one expire and their players must
+queue again.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from . import metrics
+from .codes import code_allocator
+from .game_state import GameState, PlayerState
+from .models import Game, GameStatus, Player, PlayerColor
+
+logger = logging.getLogger(__name__)
+
+MAX_SEATS = 4
+
+
+def parse_windows(value: str) -> Dict[int, float]:
+    """Seconds the oldest waiting player waits before a game of each size may be formed"""
+    windows = {MAX_SEATS: 0.0}
+    for part in value.split(","):
+        if part.strip():
+            seats, _, seconds = part.partition(":")
+            windows[int(seats)] = float(seconds)
+    return windows
+
+
+MATCHMAKING_ENABLED = os.getenv("MATCHMAKING_ENABLED", "true").lower() in ("1", "true", "yes")
+MATCHMAKING_INTERVAL = float(os.getenv("MATCHMAKING_INTERVAL", "0.25"))
+MATCHMAKING_WINDOWS = parse_windows(os.getenv("MATCHMAKING_WINDOWS", "3:5,2:15"))
+MATCHMAKING_TIMEOUT = float(os.getenv("MATCHMAKING_TIMEOUT", "60"))
+
+WAITING = "waiting"
+MATCHED = "matched"
+EXPIRED = "expired"
+CANCELLED = "cancelled"
+
+SEAT_COLORS = list(PlayerColor)
+# WebSocket close code for an unknown or forgotten ticket (HTTP 404 Not Found)
+CLOSE_UNKNOWN_TICKET = 4404
+
+
+@dataclass(slots=True)
+class Ticket:
+    id: uuid.UUID
+    player_name: str
+    # time.monotonic() when queued, and when the ticket stopped waiting
+    queued_at: float
+    finished_at: Optional[float] = None
+    status: str = WAITING
+    # The started game and the ticket holder's player in it, once matched
+    game: Optional[GameState] = None
+    player_id: Optional[uuid.UUID] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def finish(self, status: str, now: float) -> None:
+        self.status = status
+        self.finished_at = now
+        self.done.set()
+
+
+def new_game(code: str, tickets: List[Ticket]) -> GameState:
+    """A started game seating the tickets' players in order"""
+    return GameState(
+        id=uuid.uuid4(),
+        code=code,
+        status=GameStatus.IN_PROGRESS,
+        current_player_index=0,
+        # Created and started in one change
+        version=1,
+        created_at=datetime.utcnow(),
+        players=[
+            PlayerState(id=uuid.uuid4(), name=ticket.player_name, color=SEAT_COLORS[order],
+                        pieces=[-1, -1, -1, -1], order=order)
+            for order, ticket in enumerate(tickets)
+        ],
+    )
+
+
+async def insert_games(db, states: List[GameState]) -> None:
+    """Insert started games and all their players: one executemany per table, one commit"""
+    await db.execute(insert(Game), [
+        {
+            "id": state.id,
+            "code": state.code,
+            "status": state.status,
+            "current_player_index": state.current_player_index,
+            "version": state.version,
+            "created_at": state.created_at,
+            "updated_at": state.created_at,
+        }
+        for state in states
+    ])
+    await db.execute(insert(Player), [
+        {
+            "id": player.id,
+            "game_id": state.id,
+            "name": player.name,
+            "color": player.color,
+            "pieces": player.pieces,
+            "order": player.order,
+            "is_connected": player.is_connected,
+            "is_bot": player.is_bot,
+        }
+        for state in states
+        for player in state.players
+    ])
+    await db.commit()
+
+
+class Matchmaker:
+    def __init__(self, windows: Dict[int, float] = MATCHMAKING_WINDOWS, timeout: float = MATCHMAKING_TIMEOUT):
+        self.windows = windows
+        self.timeout = timeout
+        # Queued tickets in arrival order
+        self.waiting: Dict[uuid.UUID, Ticket] = {}
+        # Every ticket, kept for timeout seconds after it stopped waiting
+        self.tickets: Dict[uuid.UUID, Ticket] = {}
+        self.games_formed = 0
+
+    def __len__(self) -> int:
+        return len(self.waiting)
+
+    def join(self, player_name: str) -> Ticket:
+        ticket = Ticket(id=uuid.uuid4(), player_name=player_name, queued_at=time.monotonic())
+        self.waiting[ticket.id] = ticket
+        self.tickets[ticket.id] = ticket
+        return ticket
+
+    def get(self, ticket_id: uuid.UUID) -> Optional[Ticket]:
+        return self.tickets.get(ticket_id)
+
+    def cancel(self, ticket_id: uuid.UUID) -> bool:
+        """Leave the queue; False if the ticket is no longer waiting"""
+        ticket = self.waiting.pop(ticket_id, None)
+        if ticket is None:
+            return False
+        ticket.finish(CANCELLED, time.monotonic())
+        return True
+
+    def expire_waiting(self) -> int:
+        """Expire every waiting ticket, when the queue moves to another shard"""
+        now = time.monotonic()
+        tickets, self.waiting = list(self.waiting.values()), {}
+        for ticket in tickets:
+            ticket.finish(EXPIRED, now)
+        return len(tickets)
+
+    def form_groups(self, now: float) -> List[List[Ticket]]:
+        """Tickets to seat together, taken from the front of the queue"""
+        tickets = list(self.waiting.values())
+        full = len(tickets) - len(tickets) % MAX_SEATS
+        groups = [tickets[i:i + MAX_SEATS] for i in range(0, full, MAX_SEATS)]
+        rest = tickets[full:]
+        if rest:
+            waited = now - rest[0].queued_at
+            for seats in range(len(rest), 1, -1):
+                if waited >= self.windows.get(seats, float("inf")):
+                    groups.append(rest[:seats])
+                    break
+        return groups
+
+    async def match(self, session_factory, now: Optional[float] = None) -> List[GameState]:
+        """One matchmaking pass; returns the games it started"""
+        now = time.monotonic() if now is None else now
+        groups = self.form_groups(now)
+        states = []
+        if groups:
+            codes = [await code_allocator.allocate() for _ in groups]
+            # Tickets may have been cancelled while the codes were allocated
+            groups = self.form_groups(now)[:len(codes)]
+            code_allocator.release(codes[len(groups):])
+        if groups:
+            for group in groups:
+                for ticket in group:
+                    del self.waiting[ticket.id]
+            try:
+                states = [new_game(code, group) for code, group in zip(codes, groups)]
+                async with session_factory() as db:
+                    await insert_games(db, states)
+            except BaseException as e:
+                # Back to the front of the queue, for the next pass
+                self.waiting = {ticket.id: ticket for group in groups for ticket in group} | self.waiting
+                if isinstance(e, IntegrityError):
+                    # Only a random code from before the allocator existed can be taken
+                    logger.warning("Matchmaking pass hit a taken game code; retrying")
+                    return []
+                raise
+            for group, state in zip(groups, states):
+                for ticket, player in zip(group, state.players):
+                    ticket.game, ticket.player_id = state, player.id
+                    ticket.finish(MATCHED, now)
+                    if metrics.METRICS_ENABLED:
+                        metrics.MATCHMAKING_WAIT.observe(now - ticket.queued_at)
+            self.games_formed += len(states)
+        for ticket in list(self.waiting.values()):
+            if now - ticket.queued_at < self.timeout:
+                break
+            del self.waiting[ticket.id]
+            ticket.finish(EXPIRED, now)
+        for ticket_id in [t.id for t in self.tickets.values() if t.finished_at is not None
+                          and now - t.finished_at >= self.timeout]:
+            del self.tickets[ticket_id]
+        return states
+
+    async def run(self, session_factory, interval: float = MATCHMAKING_INTERVAL) -> None:
+        """Background task running a matchmaking pass every interval seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.match(session_factory)
+            except Exception:
+                logger.exception("Matchmaking pass failed; will retry")
+
+
+matchmaker = Matchmaker()
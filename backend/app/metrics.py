@@ -0,0 +1,242 @@
+"""Prometheus-style metrics, rendered in the text exposition format at /metrics.
+
+Disabled unless METRICS_ENABLED is set: the middleware, the SQLAlchemy
+listeners and the game_logic wrappers are then never installed, and the
+remaining call sites only test METRICS_ENABLED. There is no client library
+dependency; scrape /metrics with Prometheus or just curl it.
+
+Recorded:
+    http_request_duration_seconds   per route, method and status
+    http_request_db_seconds         time spent in SQL statements per request
+    broadcast_publish_seconds       publishing one broadcast to the backend
+    broadcast_fanout_seconds        queuing one broadcast on this worker's sockets
+    game_logic_call_seconds         per game_logic function (its count is the call count)
+    ai_decision_seconds             one AI move choice for a bot seat or suggest-move
+plus gauges collected at scrape time (registered in main.py).
+"""
+import inspect
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Rule engine calls take microseconds
+FAST_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+# Matchmaking waits last up to the wait windows
+WAIT_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], Union[Iterable[Sample], Awaitable[Iterable[Sample]]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            suffix = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Union[Counter, Histogram]] = []
+        # name -> (help, type, collector) for values read at scrape time
+        self._collectors: Dict[str, Tuple[str, str, Collector]] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, name: str, help: str, collector: Collector, type: str = "gauge") -> None:
+        """Register a callable (sync or async) returning [(labels, value)] at scrape time"""
+        self._collectors[name] = (help, type, collector)
+
+    async def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, (help, type, collector) in self._collectors.items():
+            samples = collector()
+            if inspect.isawaitable(samples):
+                samples = await samples
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+REQUEST_DB_TIME = registry.histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request", ("method", "route"))
+BROADCAST_PUBLISH = registry.histogram(
+    "broadcast_publish_seconds", "Time to publish one broadcast to the pub/sub backend")
+BROADCAST_FANOUT = registry.histogram(
+    "broadcast_fanout_seconds", "Time to queue one broadcast on this worker's connections", buckets=FAST_BUCKETS)
+BROADCAST_RECIPIENTS = registry.counter(
+    "broadcast_messages_queued_total", "Messages queued on WebSocket connections by broadcasts")
+GAME_LOGIC_CALLS = registry.histogram(
+    "game_logic_call_seconds", "Duration of game_logic rule calls", ("function",), FAST_BUCKETS)
+AI_DECISION = registry.histogram(
+    "ai_decision_seconds", "Time to choose one bot move or move suggestion, including queueing")
+MATCHMAKING_WAIT = registry.histogram(
+    "matchmaking_wait_seconds", "Time from joining the matchmaking queue to being seated in a game",
+    buckets=WAIT_BUCKETS)
+
+# Accumulated SQL time of the request being served ([seconds]), None outside requests
+_db_time: ContextVar[Optional[list]] = ContextVar("metrics_db_time", default=None)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and SQL time per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        db_time = [0.0]
+        token = _db_time.set(db_time)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _db_time.reset(token)
+            route = scope.get("route")
+            # Route templates, not raw paths, so game ids do not explode the label space
+            path = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.observe(elapsed, scope["method"], path, str(status[0]))
+            REQUEST_DB_TIME.observe(db_time[0], scope["method"], path)
+
+
+def instrument_engine(sync_engine) -> None:
+    """Add statement timings on sync_engine to the current request's SQL time"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        db_time = _db_time.get()
+        if db_time is not None:
+            db_time[0] += elapsed
+
+
+def _timed(fn: Callable, name: str) -> Callable:
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            GAME_LOGIC_CALLS.observe(time.perf_counter() - started, name)
+    return wrapper
+
+
+def instrument_module(module) -> None:
+    """Replace the module's public functions with timed wrappers.
+
+    Callers that look them up as module attributes (game_logic.x(...)) are
+    timed; names imported with `from module import x` beforehand are not.
+    """
+    for name, fn in list(vars(module).items()):
+        if name.startswith("_") or not inspect.isfunction(fn) or fn.__module__ != module.__name__:
+            continue
+        setattr(module, name, _timed(fn, name))
@@ -1,7 +1,12 @@
+import os
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Boolean, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column, String, Integer, SmallInteger, BigInteger, DateTime, ForeignKey, JSON, Boolean, Enum, LargeBinary, Index
+)
+from sqlalchemy import DDL, event, false
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 import enum
 
@@ -12,6 +17,8 @@ class GameStatus(str, enum.Enum):
     WAITING = "waiting"
     IN_PROGRESS = "in_progress"
     FINISHED = "finished"
+    # Abandoned and closed by the reaper
+    EXPIRED = "expired"
 
 
 class PlayerColor(str, enum.Enum):
@@ -21,6 +28,26 @@ class PlayerColor(str, enum.Enum):
     YELLOW = "yellow"
 
 
+# Column type of Player.pieces: "json" (portable, the default) or "array", a
+# native smallint[] on PostgreSQL; other databases keep JSON. Migration 0004
+# converts an existing column, so run it with the same setting as the app.
+PIECES_STORAGE = os.getenv("PIECES_STORAGE", "json").lower()
+
+
+class Pieces(TypeDecorator):
+    """List of 4 piece positions stored as JSON or a smallint array"""
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if PIECES_STORAGE == "array" and dialect.name == "postgresql":
+            return dialect.type_descriptor(ARRAY(SmallInteger))
+        return dialect.type_descriptor(JSON())
+
+    def process_result_value(self, value, dialect):
+        return list(value) if value is not None else None
+
+
 class Game(Base):
     __tablename__ = "games"
 
@@ -28,13 +55,29 @@ class Game(Base):
     code = Column(String(6), unique=True, nullable=False)
     status = Column(Enum(GameStatus), default=GameStatus.WAITING)
     current_player_index = Column(Integer, default=0)
+    # Bumped on every state change; clients use it to detect missed deltas
+    version = Column(Integer, default=0, nullable=False)
     winner_id = Column(UUID(as_uuid=True), ForeignKey("players.id"), nullable=True)
+    # Die rolled by the current player and not yet played (NULL until they roll)
+    pending_roll = Column(Integer, nullable=True)
+    # One byte per turn event and periodic position snapshots (see move_log.py)
+    move_log = Column(LargeBinary, default=b"", nullable=False)
+    move_snapshots = Column(LargeBinary, default=b"", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    players = relationship("Player", back_populates="game", foreign_keys="Player.game_id")
+    players = relationship(
+        "Player", back_populates="game", foreign_keys="Player.game_id", order_by="Player.order"
+    )
     winner = relationship("Player", foreign_keys=[winner_id])
 
+    # Compare-and-swap on version: every UPDATE of a game row checks the version
+    # it was read at, so concurrent turn actions cannot both commit
+    __mapper_args__ = {"version_id_col": version, "version_id_generator": False}
+
+    # The reaper scans for idle games by status and age
+    __table_args__ = (Index("ix_games_status_updated_at", "status", "updated_at"),)
+
 
 class Player(Base):
     __tablename__ = "players"
@@ -44,9 +87,11 @@ class Player(Base):
     name = Column(String(50), nullable=False)
     color = Column(Enum(PlayerColor), nullable=False)
     # Positions of 4 pieces: -1 = home, 0-39 = on board, 40-45 = in finish area (6 cells)
-    pieces = Column(JSON, default=[-1, -1, -1, -1])
+    pieces = Column(Pieces, default=[-1, -1, -1, -1])
     order = Column(Integer, nullable=False)
     is_connected = Column(Boolean, default=True)
+    # Seat played by the server (ai.py) instead of a client
+    is_bot = Column(Boolean, nullable=False, default=False, server_default=false())
     # Track consecutive 6s rolled
     consecutive_sixes = Column(Integer, default=0)
     # Turns to skip (penalty for rolling two 6s in a row)
@@ -55,6 +100,9 @@ class Player(Base):
 
     game = relationship("Game", back_populates="players", foreign_keys=[game_id])
 
+    # Games load their players in seat order
+    __table_args__ = (Index("ix_players_game_id_order", "game_id", "order"),)
+
 
 class Move(Base):
     __tablename__ = "moves"
@@ -72,3 +120,58 @@ class Move(Base):
 
     game = relationship("Game")
     player = relationship("Player", foreign_keys=[player_id])
+
+    __table_args__ = (Index("ix_moves_game_id_created_at", "game_id", "created_at"),)
+
+
+class ArchivedGame(Base):
+    """A finished or expired game moved out of the hot tables by the reaper"""
+    __tablename__ = "archived_games"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    code = Column(String(6), nullable=False)
+    status = Column(String(20), nullable=False)
+    winner_id = Column(UUID(as_uuid=True), nullable=True)
+    # [{id, name, color, order, pieces}] in seat order
+    players = Column(JSON, nullable=False)
+    move_log = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedMove(Base):
+    __tablename__ = "archived_moves"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    game_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    player_id = Column(UUID(as_uuid=True), nullable=False)
+    dice_value = Column(Integer, nullable=False)
+    piece_index = Column(Integer, nullable=False)
+    from_position = Column(Integer, nullable=False)
+    to_position = Column(Integer, nullable=False)
+    captured_player_id = Column(UUID(as_uuid=True), nullable=True)
+    captured_piece_index = Column(Integer, nullable=True)
+    created_at = Column(DateTime)
+
+
+class GameCodeCounter(Base):
+    """Single row holding the next block of game code counter values (see codes.py)"""
+    __tablename__ = "game_code_counter"
+
+    id = Column(Integer, primary_key=True)
+    next_block = Column(BigInteger, nullable=False, default=0)
+
+
+class FreeGameCode(Base):
+    """Codes of archived games, handed out again before fresh counter values"""
+    __tablename__ = "free_game_codes"
+
+    code = Column(String(6), primary_key=True)
+
+
+# The allocator only ever updates this row; migration 0006 inserts it too
+event.listen(
+    GameCodeCounter.__table__, "after_create",
+    DDL("INSERT INTO game_code_counter (id, next_block) VALUES (1, 0)"),
+)
@@ -0,0 +1,108 @@
+"""Compact binary encoding of a game's turn history.
+
+Every turn event is one byte, appended to Game.move_log:
+
+    bit  7-6   seat (player order, 0-3)
+    bit  5-4   piece index (0 for skips)
+    bit  3-1   die: 1-6 for a move, DIE_PENALTY for a penalty turn served,
+               DIE_SKIP for a turn passed without a move
+    bit  0     capture flag
+
+Origins, destinations and captured pieces are implied by the rules, so the
+log plus the seating is enough to rebuild a game (see replay.py). Every
+SNAPSHOT_INTERVAL events a fixed-size snapshot of the whole position is
+appended to Game.move_snapshots, which bounds a seek to any event to
+SNAPSHOT_INTERVAL replayed events.
+"""
+import os
+import struct
+from typing import Iterator, List, NamedTuple, Optional
+
+DIE_PENALTY = 0
+DIE_SKIP = 7
+
+# Fixed for the lifetime of stored logs: snapshot offsets are derived from it
+SNAPSHOT_INTERVAL = 32
+MAX_SEATS = 4
+
+# pieces (4 x 4 signed), consecutive_sixes x 4, turns_to_skip x 4,
+# current_player_index, winner seat + 1 (0 = no winner)
+_SNAPSHOT = struct.Struct("<16b4B4BBB")
+SNAPSHOT_SIZE = _SNAPSHOT.size
+
+# Keep writing a row per move to the moves table next to the log
+MOVE_ROWS_ENABLED = os.getenv("MOVE_ROWS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class MoveLogError(ValueError):
+    """A log that does not replay under the rules"""
+
+
+class Event(NamedTuple):
+    seat: int
+    piece_index: int
+    die: int
+    captured: bool
+
+    @property
+    def kind(self) -> str:
+        if self.die == DIE_PENALTY:
+            return "penalty"
+        if self.die == DIE_SKIP:
+            return "skip"
+        return "move"
+
+
+def encode_event(seat: int, piece_index: int, die: int, captured: bool = False) -> int:
+    if not (0 <= seat < MAX_SEATS and 0 <= piece_index <= 3 and 0 <= die <= 7):
+        raise MoveLogError(f"Event out of range: seat={seat} piece={piece_index} die={die}")
+    return seat << 6 | piece_index << 4 | die << 1 | int(captured)
+
+
+def decode_event(byte: int) -> Event:
+    return Event(byte >> 6, (byte >> 4) & 3, (byte >> 1) & 7, bool(byte & 1))
+
+
+def decode(log: bytes) -> Iterator[Event]:
+    return (decode_event(b) for b in log)
+
+
+def encode_snapshot(state) -> bytes:
+    """Pack the position of a GameState (pieces, 6s/penalty counters, turn, winner)"""
+    pieces: List[int] = []
+    sixes: List[int] = []
+    skips: List[int] = []
+    winner = 0
+    for seat in range(MAX_SEATS):
+        if seat < len(state.players):
+            p = state.players[seat]
+            pieces.extend(p.pieces)
+            sixes.append(p.consecutive_sixes)
+            skips.append(p.turns_to_skip)
+            if state.winner_id is not None and p.id == state.winner_id:
+                winner = seat + 1
+        else:
+            pieces.extend((-1, -1, -1, -1))
+            sixes.append(0)
+            skips.append(0)
+    return _SNAPSHOT.pack(*pieces, *sixes, *skips, state.current_player_index, winner)
+
+
+def decode_snapshot(data: bytes, index: int) -> tuple:
+    """Unpack snapshot `index` as (pieces per seat, sixes, skips, current index, winner seat or None)"""
+    values = _SNAPSHOT.unpack_from(data, index * SNAPSHOT_SIZE)
+    pieces = [list(values[i:i + 4]) for i in range(0, 16, 4)]
+    sixes, skips = values[16:20], values[20:24]
+    current, winner = values[24], values[25]
+    return pieces, sixes, skips, current, (winner - 1 if winner else None)
+
+
+def snapshot_count(data: Optional[bytes]) -> int:
+    return len(data or b"") // SNAPSHOT_SIZE
+
+
+def record(state, seat: int, piece_index: int, die: int, captured: bool = False) -> None:
+    """Append an event to the state's log, and a snapshot every SNAPSHOT_INTERVAL events"""
+    state.move_log.append(encode_event(seat, piece_index, die, captured))
+    if len(state.move_log) % SNAPSHOT_INTERVAL == 0:
+        state.move_snapshots.extend(encode_snapshot(state))
@@ -0,0 +1,273 @@
+"""Pluggable pub/sub transport for game broadcasts.
+
+A broadcast is published once to the backend and delivered by every worker
+process to the WebSocket connections it holds itself. Workers subscribe to
+a game's channel while at least one local socket is watching that game, so
+traffic for a game only reaches the workers that serve it.
+
+Backends, selected with BROADCAST_BACKEND:
+    memory    in-process only (single worker, the default)
+    postgres  LISTEN/NOTIFY on the application database (asyncpg)
+    redis     Redis PUBLISH/SUBSCRIBE (requires the `redis` extra)
+
+Messages travel as JSON text, serialized once by the publisher. Server
+control signals (see connections.py) travel as plain, non-JSON text that no
+message can encode to, published with publish_data.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Optional, Set
+
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "memory").lower()
+BROADCAST_URL = os.getenv("BROADCAST_URL")
+
+CHANNEL_PREFIX = "game_"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+PG_NOTIFY_MAX_BYTES = 7999
+RECONNECT_MAX_DELAY = 30.0
+
+Deliver = Callable[[str, str], Awaitable[None]]
+
+
+def channel_for(game_code: str) -> str:
+    return f"{CHANNEL_PREFIX}{game_code}"
+
+
+def encode(message: dict) -> str:
+    return dumps(message).decode()
+
+
+class Broadcaster:
+    """Base class for broadcast backends.
+
+    deliver(game_code, data) is called for every message published to a game
+    this process is subscribed to, including its own messages.
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+        self.channels: Set[str] = set()
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self.channels.clear()
+
+    async def subscribe(self, game_code: str) -> None:
+        self.channels.add(game_code)
+
+    async def unsubscribe(self, game_code: str) -> None:
+        self.channels.discard(game_code)
+
+    async def publish(self, game_code: str, message: dict) -> None:
+        await self.publish_data(game_code, encode(message))
+
+    async def publish_data(self, game_code: str, data: str) -> None:
+        """Publish already serialized text"""
+        raise NotImplementedError
+
+    async def _dispatch(self, game_code: str, data: str) -> None:
+        if self._deliver is None or game_code not in self.channels:
+            return
+        try:
+            await self._deliver(game_code, data)
+        except Exception:
+            logger.exception("Delivering broadcast for game %s failed", game_code)
+
+
+class MemoryHub:
+    """In-process stand-in for a message broker.
+
+    Every MemoryBroadcaster attached to the same hub behaves like a separate
+    worker on a shared broker, which lets multi-worker fan-out be exercised
+    in a single process.
+    """
+
+    def __init__(self):
+        self.members: Set["MemoryBroadcaster"] = set()
+
+    async def publish(self, game_code: str, data: str) -> None:
+        await asyncio.gather(*(m._dispatch(game_code, data) for m in list(self.members)))
+
+
+class MemoryBroadcaster(Broadcaster):
+    def __init__(self, hub: Optional[MemoryHub] = None):
+        super().__init__()
+        self.hub = hub or MemoryHub()
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self.hub.members.add(self)
+
+    async def stop(self) -> None:
+        self.hub.members.discard(self)
+        await super().stop()
+
+    async def publish_data(self, game_code: str, data: str) -> None:
+        await self.hub.publish(game_code, data)
+
+
+def _asyncpg_dsn(url: str) -> str:
+    """asyncpg takes plain postgresql:// URLs without a SQLAlchemy driver suffix"""
+    scheme, _, rest = url.partition("://")
+    return f"postgresql://{rest}" if scheme.startswith("postgres") else url
+
+
+class PostgresBroadcaster(Broadcaster):
+    """LISTEN/NOTIFY on one channel per game.
+
+    A dedicated connection holds the LISTENs and is re-established with
+    backoff if it drops; publishing goes through a small separate pool.
+    """
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.dsn = _asyncpg_dsn(url)
+        self._listener = None
+        self._pool = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self, deliver: Deliver) -> None:
+        import asyncpg
+
+        await super().start(deliver)
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        await self._connect_listener()
+
+    async def stop(self) -> None:
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self._listener is not None and not self._listener.is_closed():
+            await self._listener.close()
+        if self._pool is not None:
+            await self._pool.close()
+        await super().stop()
+
+    async def _connect_listener(self) -> None:
+        import asyncpg
+
+        self._listener = await asyncpg.connect(self.dsn)
+        self._listener.add_termination_listener(self._on_terminated)
+        for game_code in list(self.channels):
+            await self._listener.add_listener(channel_for(game_code), self._on_notify)
+
+    def _on_terminated(self, connection) -> None:
+        if self._deliver is not None and self._reconnect_task is None:
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 0.5
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    async with self._lock:
+                        await self._connect_listener()
+                    logger.info("Broadcast listener reconnected")
+                    return
+                except Exception:
+                    logger.warning("Broadcast listener reconnect failed; retrying in %.1fs", delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            self._reconnect_task = None
+
+    def _on_notify(self, connection, pid, channel: str, payload: str) -> None:
+        game_code = channel[len(CHANNEL_PREFIX):]
+        asyncio.get_running_loop().create_task(self._dispatch(game_code, payload))
+
+    async def subscribe(self, game_code: str) -> None:
+        await super().subscribe(game_code)
+        async with self._lock:
+            if self._listener is not None and not self._listener.is_closed():
+                await self._listener.add_listener(channel_for(game_code), self._on_notify)
+
+    async def unsubscribe(self, game_code: str) -> None:
+        await super().unsubscribe(game_code)
+        async with self._lock:
+            if self._listener is not None and not self._listener.is_closed():
+                await self._listener.remove_listener(channel_for(game_code), self._on_notify)
+
+    async def publish_data(self, game_code: str, data: str) -> None:
+        if len(data.encode()) > PG_NOTIFY_MAX_BYTES:
+            logger.error("Broadcast for game %s exceeds the NOTIFY payload limit; dropped", game_code)
+            return
+        await self._pool.execute("SELECT pg_notify($1, $2)", channel_for(game_code), data)
+
+
+class RedisBroadcaster(Broadcaster):
+    """Redis PUBLISH/SUBSCRIBE with one channel per game"""
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("BROADCAST_BACKEND=redis requires the redis extra: poetry install -E redis")
+
+        await super().start(deliver)
+        self._client = redis.from_url(self.url, decode_responses=True)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._reader = asyncio.create_task(self._read())
+
+    async def stop(self) -> None:
+        if self._reader:
+            self._reader.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+        await super().stop()
+
+    async def _read(self) -> None:
+        delay = 0.5
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self._pubsub.get_message(timeout=1.0)
+                delay = 0.5
+                if message and message["type"] == "message":
+                    await self._dispatch(message["channel"][len(CHANNEL_PREFIX):], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # redis-py resubscribes to the tracked channels when it reconnects
+                logger.warning("Redis broadcast reader failed; retrying in %.1fs", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def subscribe(self, game_code: str) -> None:
+        await super().subscribe(game_code)
+        await self._pubsub.subscribe(channel_for(game_code))
+
+    async def unsubscribe(self, game_code: str) -> None:
+        await super().unsubscribe(game_code)
+        await self._pubsub.unsubscribe(channel_for(game_code))
+
+    async def publish_data(self, game_code: str, data: str) -> None:
+        await self._client.publish(channel_for(game_code), data)
+
+
+def create_broadcaster(backend: str = BROADCAST_BACKEND, url: Optional[str] = BROADCAST_URL) -> Broadcaster:
+    if backend == "memory":
+        return MemoryBroadcaster()
+    if backend == "postgres":
+        from .database import DATABASE_URL
+        return PostgresBroadcaster(url or DATABASE_URL)
+    if backend == "redis":
+        return RedisBroadcaster(url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown BROADCAST_BACKEND '{backend}', choose from: memory, postgres, redis")
@@ -0,0 +1,77 @@
+"""Game loading helpers and SQL statement accounting.
+
+Every endpoint that reads a game also serializes or mutates its players, so
+games are always loaded with their players in the same SELECT (a joined
+eager load). Endpoints must reuse the loaded objects instead of querying
+players again; tests/test_query_counts.py pins the number of statements per
+endpoint so regressions show up as a failing count.
+"""
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import joinedload
+
+from .models import Game
+
+
+async def _one_game(db: AsyncSession, *criteria) -> Optional[Game]:
+    result = await db.execute(select(Game).options(joinedload(Game.players)).where(*criteria))
+    # unique() collapses the one-row-per-player result of the join
+    return result.unique().scalar_one_or_none()
+
+
+async def load_game(db: AsyncSession, game_id: Any) -> Optional[Game]:
+    """Load a game with its players in one statement"""
+    return await _one_game(db, Game.id == game_id)
+
+
+async def load_game_by_code(db: AsyncSession, code: str) -> Optional[Game]:
+    """Load a game by join code with its players in one statement"""
+    return await _one_game(db, Game.code == code)
+
+
+async def load_games(db: AsyncSession, game_ids: List[Any]) -> List[Game]:
+    """Load several games with their players in one statement"""
+    result = await db.execute(select(Game).options(joinedload(Game.players)).where(Game.id.in_(game_ids)))
+    return list(result.unique().scalars().all())
+
+
+async def game_id_for_code(db: AsyncSession, code: str) -> Optional[Any]:
+    return await db.scalar(select(Game.id).where(Game.code == code))
+
+
+async def game_version(db: AsyncSession, game_id: Any) -> Optional[int]:
+    """Current state version of a game, without loading it"""
+    return await db.scalar(select(Game.version).where(Game.id == game_id))
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_statements(engine) -> Iterator[StatementCounter]:
+    """Record every SQL statement sent to the database by engine while active.
+
+    An executemany() call counts as a single statement, matching one network
+    round trip.
+    """
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    counter = StatementCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
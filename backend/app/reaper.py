@@ -0,0 +1,252 @@
+"""Background lifecycle reaper: expires abandoned games and archives old ones.
+
+Every REAPER_INTERVAL seconds the reaper runs two passes in batches of
+REAPER_BATCH_SIZE games:
+
+  expire   waiting games idle for WAITING_GAME_TTL and games in progress idle
+           for IDLE_GAME_TTL (by updated_at) become EXPIRED. Their watchers
+           get a "game_expired" delta and the room is closed on every worker.
+  archive  finished and expired games untouched for ARCHIVE_AFTER are moved
+           with their players and moves out of the hot tables, into the
+           archived_games / archived_moves tables (ARCHIVE_TARGET=table) or
+           into gzip-compressed JSON lines under ARCHIVE_DIR (ARCHIVE_TARGET=file).
+           Their join codes are released for reuse (see codes.py).
+
+Both passes are opt-in: the reaper runs with REAPER_ENABLED=true, and the
+archive pass only with an ARCHIVE_TARGET.
+
+Both passes claim rows with FOR UPDATE SKIP LOCKED on PostgreSQL, so several
+workers can run the reaper at once without blocking each other or turns.
+Shards (see sharding.py) only expire the games they own, whose cached state
+and room they hold, paging past the idle games of other shards. The store's flushes never write over an expired game
+(see game_store.py).
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import codes
+from .connections import manager
+from .game_store import game_store
+from .models import ArchivedGame, ArchivedMove, Game, GameStatus, Move, Player
+from .schemas import GameDelta
+from .sharding import shard
+from .snapshot_cache import snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+REAPER_ENABLED = os.getenv("REAPER_ENABLED", "false").lower() in ("1", "true", "yes")
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "60"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "100"))
+WAITING_GAME_TTL = float(os.getenv("WAITING_GAME_TTL", "3600"))
+IDLE_GAME_TTL = float(os.getenv("IDLE_GAME_TTL", "86400"))
+ARCHIVE_AFTER = float(os.getenv("ARCHIVE_AFTER", "604800"))
+# table, file, or none to keep finished games in place
+ARCHIVE_TARGET = os.getenv("ARCHIVE_TARGET", "none").lower()
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive"))
+
+_games = Game.__table__
+_moves = Move.__table__
+
+
+async def owned_idle_ids(db: AsyncSession, idle, batch_size: int, owns: Callable[[Any], bool]) -> List[Any]:
+    """Ids of up to batch_size idle games that owns accepts, oldest first.
+
+    Pages through the idle games, since the oldest ones may all belong to
+    other shards. Nothing is locked: only this shard expires its games.
+    """
+    ids = []
+    after = None
+    while len(ids) < batch_size:
+        query = select(_games.c.id, _games.c.updated_at).where(idle)
+        if after is not None:
+            query = query.where(or_(_games.c.updated_at > after[0],
+                                    and_(_games.c.updated_at == after[0], _games.c.id > after[1])))
+        rows = (await db.execute(query.order_by(_games.c.updated_at, _games.c.id).limit(batch_size))).all()
+        ids.extend(game_id for game_id, _ in rows if owns(game_id))
+        if len(rows) < batch_size:
+            break
+        after = rows[-1][1], rows[-1][0]
+    return ids[:batch_size]
+
+
+async def expire_idle_games(db: AsyncSession, now: datetime, batch_size: int = REAPER_BATCH_SIZE,
+                            owns: Optional[Callable[[Any], bool]] = None) -> List[Tuple[Any, str, int]]:
+    """Expire one batch of idle games; returns (id, code, version) of each and commits.
+
+    With owns, the batch is made of the idle games it accepts.
+    """
+    idle = or_(
+        and_(_games.c.status == GameStatus.WAITING,
+             _games.c.updated_at < now - timedelta(seconds=WAITING_GAME_TTL)),
+        and_(_games.c.status == GameStatus.IN_PROGRESS,
+             _games.c.updated_at < now - timedelta(seconds=IDLE_GAME_TTL)),
+    )
+    if owns is not None:
+        claimed = await owned_idle_ids(db, idle, batch_size, owns)
+        if not claimed:
+            await db.commit()
+            return []
+    else:
+        claimed = (
+            select(_games.c.id).where(idle).order_by(_games.c.updated_at)
+            .limit(batch_size).with_for_update(skip_locked=True)
+        )
+    # The idle condition is repeated so a game played since the scan is left alone
+    result = await db.execute(
+        update(_games)
+        .where(_games.c.id.in_(claimed), idle)
+        .values(status=GameStatus.EXPIRED, pending_roll=None,
+                version=_games.c.version + 1, updated_at=now)
+        .returning(_games.c.id, _games.c.code, _games.c.version)
+    )
+    expired = [tuple(row) for row in result.all()]
+    await db.commit()
+    return expired
+
+
+async def close_expired(expired: List[Tuple[Any, str, int]]) -> None:
+    """Drop cached state of expired games and close their rooms"""
+    for game_id, code, version in expired:
+        async with game_store.lock(game_id):
+            game_store.evict(game_id)
+        snapshot_cache.invalidate(game_id)
+        await manager.broadcast(code, GameDelta(
+            game_id=game_id,
+            version=version,
+            event="game_expired",
+            changes={"status": GameStatus.EXPIRED.value, "pending_roll": None},
+        ).model_dump(mode="json"))
+        await manager.close_room(code)
+
+
+def archived_game_row(game: Game, now: datetime) -> dict:
+    return {
+        "id": game.id,
+        "code": game.code,
+        "status": game.status.value,
+        "winner_id": game.winner_id,
+        "players": [
+            {"id": str(p.id), "name": p.name, "color": p.color.value, "order": p.order, "pieces": list(p.pieces), "is_bot": p.is_bot}
+            for p in game.players
+        ],
+        "move_log": bytes(game.move_log or b""),
+        "created_at": game.created_at,
+        "updated_at": game.updated_at,
+        "archived_at": now,
+    }
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def write_archive_file(games: List[dict], moves: List[dict], now: datetime) -> Path:
+    """Write one batch as gzip JSON lines (a game, then its moves) to a temporary file"""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = ARCHIVE_DIR / f"games-{now:%Y%m%dT%H%M%S%f}-{games[0]['id']}.jsonl.gz.tmp"
+    by_game = {}
+    for move in moves:
+        by_game.setdefault(move["game_id"], []).append(move)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for game in games:
+            record = dict(game, moves=by_game.get(game["id"], []))
+            f.write(json.dumps(record, default=_json_default, separators=(",", ":")) + "\n")
+    return path
+
+
+async def archive_finished_games(db: AsyncSession, now: datetime, batch_size: int = REAPER_BATCH_SIZE) -> int:
+    """Move one batch of old finished/expired games out of the hot tables; returns games archived"""
+    result = await db.execute(
+        select(Game).options(selectinload(Game.players))
+        .where(Game.status.in_([GameStatus.FINISHED, GameStatus.EXPIRED]),
+               Game.updated_at < now - timedelta(seconds=ARCHIVE_AFTER))
+        .order_by(Game.updated_at).limit(batch_size)
+        .with_for_update(skip_locked=True, of=Game)
+    )
+    games = list(result.scalars().all())
+    if not games:
+        await db.rollback()
+        return 0
+    ids = [g.id for g in games]
+    game_rows = [archived_game_row(g, now) for g in games]
+    move_result = await db.execute(
+        select(_moves).where(_moves.c.game_id.in_(ids)).order_by(_moves.c.game_id, _moves.c.created_at)
+    )
+    move_rows = [dict(row._mapping) for row in move_result.all()]
+
+    archive_file = None
+    if ARCHIVE_TARGET == "file":
+        archive_file = write_archive_file(game_rows, move_rows, now)
+    else:
+        await db.execute(insert(ArchivedGame), game_rows)
+        if move_rows:
+            await db.execute(insert(ArchivedMove), move_rows)
+
+    # Expunge the loaded objects: the rows go away underneath them
+    db.expunge_all()
+    # winner_id points into players, which point into games
+    await db.execute(update(_games).where(_games.c.id.in_(ids)).values(winner_id=None))
+    await db.execute(delete(_moves).where(_moves.c.game_id.in_(ids)))
+    await db.execute(delete(Player.__table__).where(Player.__table__.c.game_id.in_(ids)))
+    await db.execute(delete(_games).where(_games.c.id.in_(ids)))
+    await codes.reclaim(db, [g["code"] for g in game_rows])
+    try:
+        await db.commit()
+    except Exception:
+        if archive_file is not None:
+            archive_file.unlink(missing_ok=True)
+        raise
+    if archive_file is not None:
+        archive_file.rename(archive_file.with_suffix(""))
+
+    for game_id in ids:
+        game_store.evict(game_id)
+        snapshot_cache.invalidate(game_id)
+    return len(ids)
+
+
+async def reap(session_factory, batch_size: int = REAPER_BATCH_SIZE) -> Tuple[int, int]:
+    """One full pass; returns (games expired, games archived)"""
+    now = datetime.utcnow()
+    expired_total = archived_total = 0
+    while True:
+        async with session_factory() as db:
+            expired = await expire_idle_games(db, now, batch_size, shard.owns if shard.enabled else None)
+        await close_expired(expired)
+        expired_total += len(expired)
+        if len(expired) < batch_size:
+            break
+    if ARCHIVE_TARGET in ("table", "file"):
+        while True:
+            async with session_factory() as db:
+                archived = await archive_finished_games(db, now, batch_size)
+            archived_total += archived
+            if archived < batch_size:
+                break
+    if expired_total or archived_total:
+        logger.info("Reaper expired %d games and archived %d", expired_total, archived_total)
+    return expired_total, archived_total
+
+
+async def run_reaper(session_factory, interval: float = REAPER_INTERVAL) -> None:
+    """Background task running a reaper pass every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reap(session_factory)
+        except Exception:
+            logger.exception("Reaper pass failed; will retry")
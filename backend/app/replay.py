@@ -0,0 +1,109 @@
+"""Rebuild game states from the binary move log.
+
+The rules are re-applied event by event through game_state, so a replayed
+state is exactly what the live game had after the same events, including
+its own log prefix. Seeking starts from the nearest stored snapshot at or
+before the target, so reaching any event costs at most SNAPSHOT_INTERVAL
+replayed events.
+"""
+from typing import Optional
+
+from . import game_state, move_log
+from .game_state import GameState, PlayerState
+from .models import GameStatus
+from .move_log import Event, MoveLogError, SNAPSHOT_INTERVAL
+
+
+def initial_state(state: GameState) -> GameState:
+    """The game as it was when it started: same seating, nothing moved"""
+    return GameState(
+        id=state.id,
+        code=state.code,
+        # Games are only logged from the start; a waiting game has no history yet
+        status=GameStatus.WAITING if state.status == GameStatus.WAITING else GameStatus.IN_PROGRESS,
+        current_player_index=0,
+        created_at=state.created_at,
+        players=[
+            PlayerState(
+                id=p.id,
+                name=p.name,
+                color=p.color,
+                pieces=[-1, -1, -1, -1],
+                order=p.order,
+                is_connected=p.is_connected,
+                is_bot=p.is_bot,
+            )
+            for p in state.players
+        ],
+    )
+
+
+def apply_event(state: GameState, event: Event) -> None:
+    """Re-apply one logged event to state, checking it against the rules"""
+    if state.status != GameStatus.IN_PROGRESS:
+        raise MoveLogError("Event logged after the game ended")
+    if event.seat >= len(state.players) or state.current_player_index != event.seat:
+        raise MoveLogError(f"Event for seat {event.seat} out of turn")
+    player = state.players[event.seat]
+    if event.die == move_log.DIE_PENALTY:
+        if not game_state.serve_penalty(state, player):
+            raise MoveLogError(f"Seat {event.seat} has no penalty turn to serve")
+    elif event.die == move_log.DIE_SKIP:
+        game_state.skip_turn(state, player)
+    else:
+        try:
+            outcome = game_state.move_piece(state, player, event.piece_index, event.die)
+        except game_state.TurnError as e:
+            raise MoveLogError(f"Seat {event.seat} cannot move piece {event.piece_index} by {event.die}: {e}")
+        state.unsaved_moves.clear()
+        if (outcome.captured_player is not None) != event.captured:
+            raise MoveLogError("Capture flag does not match the replayed move")
+
+
+def restore_snapshot(state: GameState, snapshots: bytes, index: int) -> None:
+    """Overwrite state's position with snapshot `index` (taken after (index + 1) * SNAPSHOT_INTERVAL events)"""
+    pieces, sixes, skips, current, winner = move_log.decode_snapshot(snapshots, index)
+    for seat, p in enumerate(state.players):
+        p.pieces = pieces[seat]
+        p.consecutive_sixes = sixes[seat]
+        p.turns_to_skip = skips[seat]
+    state.current_player_index = current
+    if winner is not None:
+        state.status = GameStatus.FINISHED
+        state.winner_id = state.players[winner].id
+
+
+def replay(state: GameState, upto: Optional[int] = None) -> GameState:
+    """A new state for state's game after its first `upto` logged events (all if None)"""
+    log = state.move_log
+    total = len(log)
+    upto = total if upto is None else upto
+    if not 0 <= upto <= total:
+        raise MoveLogError(f"Event {upto} is outside the log of {total} events")
+
+    result = initial_state(state)
+    snapshot = min(upto // SNAPSHOT_INTERVAL, move_log.snapshot_count(state.move_snapshots))
+    start = snapshot * SNAPSHOT_INTERVAL
+    if snapshot:
+        restore_snapshot(result, state.move_snapshots, snapshot - 1)
+        result.move_log = bytearray(log[:start])
+        result.move_snapshots = bytearray(state.move_snapshots[:snapshot * move_log.SNAPSHOT_SIZE])
+    for byte in log[start:upto]:
+        apply_event(result, move_log.decode_event(byte))
+    return result
+
+
+def restore(state: GameState) -> None:
+    """Reset state's position to what its log says; used when hydrating a game after a restart"""
+    if not state.move_log:
+        return
+    replayed = replay(state)
+    for p, r in zip(state.players, replayed.players):
+        p.pieces = r.pieces
+        p.consecutive_sixes = r.consecutive_sixes
+        p.turns_to_skip = r.turns_to_skip
+    state.current_player_index = replayed.current_player_index
+    # Expiry is not a logged event
+    if state.status != GameStatus.EXPIRED:
+        state.status = replayed.status
+    state.winner_id = replayed.winner_id
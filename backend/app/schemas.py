@@ -1,14 +1,18 @@
-from pydantic import BaseModel
-from typing import Optional, List
+import os
+
+from pydantic import BaseModel, Field
+from typing import Annotated, Any, Literal, Optional, List, Union
 from uuid import UUID
 from datetime import datetime
 from enum import Enum
+from typing_extensions import TypedDict
 
 
 class GameStatus(str, Enum):
     WAITING = "waiting"
     IN_PROGRESS = "in_progress"
     FINISHED = "finished"
+    EXPIRED = "expired"
 
 
 class PlayerColor(str, Enum):
@@ -29,6 +33,7 @@ class PlayerResponse(BaseModel):
     pieces: List[int]
     order: int
     is_connected: bool
+    is_bot: bool = False
 
     class Config:
         from_attributes = True
@@ -43,12 +48,33 @@ class GameJoin(BaseModel):
     player_name: str
 
 
+class BotCreate(BaseModel):
+    name: Optional[str] = None
+
+
+class MatchRequest(BaseModel):
+    player_name: str
+
+
+class MatchTicket(BaseModel):
+    ticket_id: UUID
+    # "waiting", "matched", "expired" (no game formed within MATCHMAKING_TIMEOUT) or "cancelled"
+    status: str
+    # Once matched: the started game and the ticket holder's player in it
+    game_id: Optional[UUID] = None
+    game_code: Optional[str] = None
+    player_id: Optional[UUID] = None
+
+
 class GameResponse(BaseModel):
     id: UUID
     code: str
     status: GameStatus
     current_player_index: int
+    version: int = 0
     winner_id: Optional[UUID] = None
+    # Die rolled by the current player and not yet played
+    pending_roll: Optional[int] = None
     players: List[PlayerResponse]
     created_at: datetime
 
@@ -59,19 +85,19 @@ class GameResponse(BaseModel):
 class DiceRoll(BaseModel):
     game_id: UUID
     player_id: UUID
-
-
-class DiceRollResponse(BaseModel):
-    value: int
-    can_move: bool
-    valid_moves: List[dict]
+    # Game version the client acted on; stale requests are rejected with 409
+    expected_version: Optional[int] = None
+    # Play forced turns right away: the only valid move, or a skip if there is none
+    auto_apply: bool = False
 
 
 class MoveRequest(BaseModel):
     game_id: UUID
     player_id: UUID
     piece_index: int
-    dice_value: int
+    # Optional; the server moves by the pending roll and rejects a different value
+    dice_value: Optional[int] = None
+    expected_version: Optional[int] = None
 
 
 class MoveResponse(BaseModel):
@@ -83,10 +109,132 @@ class MoveResponse(BaseModel):
     message: str
 
 
+class MoveSuggestion(BaseModel):
+    piece_index: int
+    to_position: int
+    # Expected score of the player relative to the others, as seen by the search
+    value: float
+    depth: int
+    nodes: int
+    elapsed_ms: float
+
+
+class ValidMove(TypedDict):
+    """A move the rolled die allows, as listed by game_logic.get_valid_moves"""
+    piece_index: int
+    from_position: int
+    to_position: int
+
+
+class DiceRollResponse(BaseModel):
+    value: int
+    can_move: bool
+    valid_moves: List[ValidMove]
+    # Game version after the roll (and after an auto-applied turn)
+    version: int = 0
+    # "moved" or "skipped" when auto_apply played a forced turn
+    applied: Optional[str] = None
+    move: Optional[MoveResponse] = None
+
+
 class SkipTurnRequest(BaseModel):
     player_id: UUID
+    expected_version: Optional[int] = None
+
+
+class RollAction(DiceRoll):
+    action: Literal["roll"]
+
+
+class MoveAction(MoveRequest):
+    action: Literal["move"]
+
+
+class SkipAction(SkipTurnRequest):
+    action: Literal["skip"]
+    game_id: UUID
+
+
+# One turn action of a batch or a WebSocket command, told apart by "action"
+TurnAction = Annotated[Union[RollAction, MoveAction, SkipAction], Field(discriminator="action")]
+
+
+# Checked by the batch endpoint, and by the shard router before it splits a batch
+BATCH_MAX_ACTIONS = int(os.getenv("BATCH_MAX_ACTIONS", "100"))
+BATCH_LIMIT_DETAIL = f"At most {BATCH_MAX_ACTIONS} actions per batch"
+
+
+class BatchRequest(BaseModel):
+    actions: List[TurnAction]
+
+
+class ActionResult(BaseModel):
+    action: str
+    game_id: UUID
+    ok: bool
+    # Status the action would have had as a request of its own
+    status: int = 200
+    detail: Optional[str] = None
+    # Game version after the action
+    version: Optional[int] = None
+    roll: Optional[DiceRollResponse] = None
+    move: Optional[MoveResponse] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[ActionResult]
+
+
+class CommandResult(ActionResult):
+    """Reply to a {"type": "command"} message, sent to the commanding socket only"""
+    type: str = "command_result"
+    # Echo of the command's "id", for matching replies to commands
+    id: Optional[Any] = None
+    # Unknown when the command itself could not be read
+    action: Optional[str] = None
+    game_id: Optional[UUID] = None
+
+
+class HistoryEvent(BaseModel):
+    seat: int
+    player_id: UUID
+    # "move", "skip" (passed without moving) or "penalty" (consecutive-6s turn served)
+    kind: str
+    piece_index: Optional[int] = None
+    dice_value: Optional[int] = None
+    captured: bool = False
+
+
+class GameHistoryResponse(BaseModel):
+    """Position of a game after move_number of its total_moves turn events"""
+    game_id: UUID
+    move_number: int
+    total_moves: int
+    status: GameStatus
+    current_player_index: int
+    winner_id: Optional[UUID] = None
+    players: List[PlayerResponse]
+    events: List[HistoryEvent]
 
 
 class WebSocketMessage(BaseModel):
     type: str
     data: dict
+
+
+class GameDelta(BaseModel):
+    """Versioned state change pushed to clients subscribed to /ws/{game_code}"""
+    type: str = "game_delta"
+    game_id: UUID
+    version: int
+    event: str
+    # Changed game fields; "players" holds partial player objects keyed by "id"
+    changes: dict
+    meta: dict = {}
+
+
+class RingUpdate(BaseModel):
+    """Shard ring pushed by the shard router to PUT /internal/ring"""
+    epoch: int
+    shards: List[str]
+    vnodes: int
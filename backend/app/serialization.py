@@ -0,0 +1,126 @@
+"""Fast JSON rendering of responses and game snapshots.
+
+When an endpoint returns a value, FastAPI validates it against the
+response_model, converts the result to plain Python objects and only then
+encodes it with json.dumps(). Endpoints return a FastJSONResponse instead,
+which skips those passes: Pydantic models are written straight to bytes by
+their prebuilt pydantic-core serializer, and other documents by orjson.
+
+Game snapshots are never built as GameResponse models. game_document()
+copies the fields of a GameState, or the loaded values in the instance
+dicts of ORM objects, into a document of UUID, enum and datetime objects
+that orjson encodes natively. It renders byte-for-byte like
+GameResponse.model_dump_json().
+
+orjson is the `orjson` extra; without it the json module is used.
+"""
+import json
+from datetime import datetime
+from enum import Enum
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, List, Tuple
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from .schemas import PlayerResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Built once; a TypeAdapter compiles its validator and serializer when created
+PLAYERS = TypeAdapter(List[PlayerResponse])
+
+# Keys of GameResponse and PlayerResponse, in their order
+GAME_KEYS = ("id", "code", "status", "current_player_index", "version", "winner_id", "pending_roll",
+             "players", "created_at")
+PLAYER_KEYS = ("id", "name", "color", "pieces", "order", "is_connected", "is_bot")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(document: Any) -> bytes:
+    """Compact UTF-8 JSON; UUIDs, datetimes and enums are encoded as in Pydantic's JSON mode"""
+    if orjson is not None:
+        return orjson.dumps(document)
+    return json.dumps(document, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def render(content: Any) -> bytes:
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    return dumps(content)
+
+
+def jsonable(content: Any) -> Any:
+    """content as plain JSON values, for encoders other than JSON"""
+    if isinstance(content, BaseModel):
+        return content.model_dump(mode="json")
+    return loads(dumps(content))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for a model or document, rendered without jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return render(content)
+
+
+def _reader(names: Tuple[str, ...]) -> Callable[[Any], tuple]:
+    """Read fields from an object's instance dict, or from its attributes.
+
+    ORM objects keep loaded column values and relationships in their instance
+    dict; reading them there skips the instrumented attributes. If one is not
+    loaded, the attributes are read instead, which loads it as usual.
+    Dataclasses with slots have no instance dict.
+    """
+    from_dict, from_attributes = itemgetter(*names), attrgetter(*names)
+
+    def read(obj: Any) -> tuple:
+        values = getattr(obj, "__dict__", None)
+        if values is not None:
+            try:
+                return from_dict(values)
+            except KeyError:
+                pass
+        return from_attributes(obj)
+
+    return read
+
+
+_read_game = _reader(GAME_KEYS)
+_read_player = _reader(PLAYER_KEYS)
+
+
+def player_document(player: Any) -> dict:
+    """PlayerResponse document of a Player or PlayerState"""
+    return dict(zip(PLAYER_KEYS, _read_player(player)))
+
+
+def game_document(game: Any) -> dict:
+    """GameResponse document of a Game or GameState"""
+    document = dict(zip(GAME_KEYS, _read_game(game)))
+    document["players"] = [dict(zip(PLAYER_KEYS, _read_player(p))) for p in document["players"]]
+    return document
+
+
+def serialize_game(game: Any) -> bytes:
+    """Snapshot body of a Game or GameState"""
+    return dumps(game_document(game))
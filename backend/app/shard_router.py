@@ -0,0 +1,523 @@
+"""Shard router: a reverse proxy sending each game's traffic to its owning shard.
+
+Clients talk to the router as they would to a single worker. For every HTTP
+request and WebSocket it finds the routing keys (see sharding.py), resolves
+a game code to its id with one indexed query (cached), and proxies the
+request to the owner of the id on the hash ring. A batch whose actions span
+several shards is split into one batch per shard and the results are merged
+in order; a part that fails as a whole fails each of its actions. A batch
+over BATCH_MAX_ACTIONS is rejected before it is split. A 421 from a shard
+means the ring is changing under the request; it is retried on the new
+owner once the change is done.
+
+Every SHARD_HEALTH_INTERVAL seconds the router probes its shards. A shard
+that fails SHARD_HEALTH_FAILURES probes in a row leaves the ring, and one
+that answers again rejoins it; shards can also be added or removed with
+PUT /_router/shards. On every change the new ring is pushed to the shards
+and only used once they have all adopted it and handed off the games they
+lost, so each game has one owner at a time. A shard that lost its ring (by
+restarting) gets it pushed again.
+
+Usage (from backend/):
+    python -m app.shard_router --workers 3          # 3 local shards on ports 8001-8003, the router on 8000
+    python -m app.shard_router --shards http://10.0.0.5:8000,http://10.0.0.6:8000
+    SHARD_URLS=... uvicorn app.shard_router:app
+
+Requires the `sharding` extra (httpx).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+import websockets
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from . import queries, sharding
+from .database import AsyncSessionLocal
+from .schemas import BATCH_LIMIT_DETAIL, BATCH_MAX_ACTIONS
+from .sharding import HashRing, RouteKeys, route_keys
+
+logger = logging.getLogger(__name__)
+
+SHARD_URLS = [url.strip().rstrip("/") for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()]
+SHARD_HEALTH_INTERVAL = float(os.getenv("SHARD_HEALTH_INTERVAL", "2"))
+SHARD_HEALTH_FAILURES = int(os.getenv("SHARD_HEALTH_FAILURES", "3"))
+SHARD_PROXY_TIMEOUT = float(os.getenv("SHARD_PROXY_TIMEOUT", "30"))
+
+ADMIN_PATH = "/_router/shards"
+# Tries of a request that keeps getting 421 while the ring changes
+MISDIRECTED_RETRIES = 5
+CODE_CACHE_SIZE = 100_000
+HOP_HEADERS = frozenset((
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailers",
+    "transfer-encoding", "upgrade", "host", "content-length", "content-encoding",
+))
+# Close codes a proxied socket may pass on to the client; others become 1013 (reconnect)
+PASSED_CLOSE_CODES = frozenset((1000, 1001, 1008, 1011, 1012, 1013))
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+class ShardRouter:
+    """ASGI application proxying to the shards of a hash ring"""
+
+    def __init__(self, shards: Iterable[str] = (), vnodes: int = sharding.SHARD_VNODES,
+                 token: Optional[str] = sharding.SHARD_TOKEN, health_interval: float = SHARD_HEALTH_INTERVAL,
+                 health_failures: int = SHARD_HEALTH_FAILURES, timeout: float = SHARD_PROXY_TIMEOUT):
+        self.configured: List[str] = list(dict.fromkeys(url.rstrip("/") for url in shards))
+        self.vnodes = vnodes
+        self.token = token
+        self.health_interval = health_interval
+        self.health_failures = health_failures
+        self.timeout = timeout
+        self.ring = HashRing((), vnodes)
+        # Cleared while a new ring is being pushed to the shards
+        self.settled = asyncio.Event()
+        self.settled.set()
+        self.live: Set[str] = set()
+        self.failures: Dict[str, int] = {}
+        self.client: Optional[httpx.AsyncClient] = None
+        self._codes: "OrderedDict[str, str]" = OrderedDict()
+        self._sync_lock = asyncio.Lock()
+        self._next_shard = itertools.count()
+        self._health: Optional[asyncio.Task] = None
+
+    # Membership
+
+    def _headers(self) -> Dict[str, str]:
+        return {sharding.TOKEN_HEADER: self.token} if self.token else {}
+
+    async def probe(self, shard: str) -> Tuple[bool, Optional[int]]:
+        """(answered, epoch of the shard's ring)"""
+        try:
+            response = await self.client.get(f"{shard}/internal/ring", headers=self._headers(),
+                                             timeout=min(self.timeout, 5))
+            response.raise_for_status()
+            return True, response.json().get("epoch")
+        except (httpx.HTTPError, ValueError):
+            return False, None
+
+    async def push(self, shard: str, ring: HashRing) -> bool:
+        """Make a shard adopt a ring, handing off the games it loses"""
+        try:
+            response = await self.client.put(f"{shard}/internal/ring", headers=self._headers(), json={
+                "epoch": ring.epoch, "shards": list(ring.shards), "vnodes": ring.vnodes,
+            })
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError as e:
+            logger.warning("Pushing ring %d to shard %s failed: %s", ring.epoch, shard, e)
+            return False
+
+    async def settle(self, shard: str, ring: HashRing) -> None:
+        """Tell a shard that the ring is in use, so it takes over its new games' bot turns"""
+        try:
+            response = await self.client.post(f"{shard}/internal/ring/{ring.epoch}/settled", headers=self._headers())
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning("Settling ring %d on shard %s failed: %s", ring.epoch, shard, e)
+
+    async def sync(self) -> None:
+        """Probe the shards and rebuild the ring if the live ones changed"""
+        async with self._sync_lock:
+            results = await asyncio.gather(*(self.probe(shard) for shard in self.configured))
+            stale = []
+            for shard, (answered, epoch) in zip(self.configured, results):
+                if answered:
+                    self.failures[shard] = 0
+                    if shard not in self.live:
+                        logger.info("Shard %s is up", shard)
+                    self.live.add(shard)
+                    if epoch != self.ring.epoch:
+                        stale.append(shard)
+                else:
+                    self.failures[shard] = self.failures.get(shard, 0) + 1
+                    if shard in self.live and self.failures[shard] >= self.health_failures:
+                        logger.warning("Shard %s failed %d health checks; removing it", shard, self.failures[shard])
+                        self.live.discard(shard)
+            self.live &= set(self.configured)
+            members = tuple(sorted(self.live))
+            if members != self.ring.shards:
+                await self.rebalance(members)
+            else:
+                # Restarted shards, or ones that missed a push
+                await asyncio.gather(*(self.push_settled(shard, self.ring) for shard in stale))
+
+    async def push_settled(self, shard: str, ring: HashRing) -> None:
+        if await self.push(shard, ring):
+            await self.settle(shard, ring)
+
+    async def rebalance(self, members: Tuple[str, ...]) -> None:
+        """Switch to a ring of members once they have all adopted it.
+
+        Callers hold _sync_lock. Shards leaving the ring get it too if they
+        still answer, so they hand off their games.
+        """
+        # Epochs must keep growing across router restarts
+        epoch = max(self.ring.epoch + 1, time.time_ns() // 1_000_000)
+        ring = HashRing(members, self.vnodes, epoch)
+        self.settled.clear()
+        try:
+            leaving = {shard for shard in self.ring.shards if not self.failures.get(shard)}
+            await asyncio.gather(*(self.push(shard, ring) for shard in set(members) | leaving))
+        finally:
+            self.ring = ring
+            self.settled.set()
+        logger.info("Ring %d: %s", epoch, ", ".join(members) or "no shards")
+        await asyncio.gather(*(self.settle(shard, ring) for shard in members))
+
+    async def run_health_checks(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Shard health check failed; will retry")
+
+    # Routing
+
+    async def game_id(self, code: str) -> Optional[str]:
+        game_id = self._codes.get(code)
+        if game_id is not None:
+            self._codes.move_to_end(code)
+            return game_id
+        async with AsyncSessionLocal() as db:
+            found = await queries.game_id_for_code(db, code)
+        if found is None:
+            return None
+        self._codes[code] = str(found)
+        while len(self._codes) > CODE_CACHE_SIZE:
+            self._codes.popitem(last=False)
+        return str(found)
+
+    async def owner(self, keys: RouteKeys, ring: HashRing) -> Optional[str]:
+        if not ring.shards:
+            return None
+        if keys.code is not None:
+            # An unknown code still goes to a fixed shard, which answers 404
+            return ring.owner(await self.game_id(keys.code) or keys.code)
+        if keys.keys:
+            return ring.owner(keys.keys[0])
+        return ring.shards[next(self._next_shard) % len(ring.shards)]
+
+    async def misdirected(self, keys: RouteKeys, attempt: int) -> None:
+        """Wait before retrying a request a shard turned away"""
+        if keys.code is not None:
+            # Codes of archived games are reused
+            self._codes.pop(keys.code, None)
+        if self.settled.is_set():
+            await asyncio.sleep(0.05 * (attempt + 1))
+        else:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.settled.wait(), self.timeout)
+
+    # ASGI
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.handle_http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self.handle_websocket(scope, receive, send)
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.client = httpx.AsyncClient(timeout=self.timeout)
+                await self.sync()
+                self._health = asyncio.create_task(self.run_health_checks())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._health:
+                    self._health.cancel()
+                await self.client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def respond(self, send, status: int, body: bytes, headers: Iterable[Tuple[str, str]] = (),
+                      media_type: Optional[str] = "application/json") -> None:
+        raw = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        if media_type:
+            raw.append((b"content-type", media_type.encode()))
+        raw.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": raw})
+        await send({"type": "http.response.body", "body": body})
+
+    async def respond_json(self, send, status: int, document) -> None:
+        await self.respond(send, status, json.dumps(document).encode())
+
+    async def handle_http(self, scope, receive, send) -> None:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        path = scope["path"]
+        if path == ADMIN_PATH:
+            await self.admin(scope, body, send)
+            return
+        if path.startswith("/internal/"):
+            await self.respond_json(send, 404, {"detail": "Not Found"})
+            return
+        headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]
+                   if k.decode("latin-1").lower() not in HOP_HEADERS]
+        client = scope.get("client")
+        if client:
+            headers.append(("x-forwarded-for", client[0]))
+        keys = route_keys(path, body if path in sharding.BODY_GAME_PATHS else None)
+        try:
+            if path == "/api/games/batch" and len(keys.keys) > 1:
+                response = await self.forward_batch(scope, headers, body)
+            else:
+                response = await self.forward(scope, headers, body, keys)
+        except httpx.HTTPError as e:
+            logger.warning("Proxying %s %s failed: %s", scope["method"], path, e)
+            await self.respond_json(send, 502, {"detail": "Shard unavailable"})
+            return
+        if response is None:
+            await self.respond_json(send, 503, {"detail": "No shard available"})
+            return
+        await self.respond(send, response.status_code, response.content,
+                           [(k, v) for k, v in response.headers.multi_items() if k.lower() not in HOP_HEADERS],
+                           media_type=None)
+
+    def _url(self, shard: str, scope) -> str:
+        query = scope.get("query_string", b"").decode("latin-1")
+        return f"{shard}{scope['path']}" + (f"?{query}" if query else "")
+
+    async def forward(self, scope, headers, body: bytes, keys: RouteKeys) -> Optional[httpx.Response]:
+        """Proxy a request to the owner of its keys, following ring changes"""
+        response = None
+        for attempt in range(MISDIRECTED_RETRIES):
+            shard = await self.owner(keys, self.ring)
+            if shard is None:
+                return None
+            response = await self.client.request(scope["method"], self._url(shard, scope),
+                                                 headers=headers, content=body)
+            if response.status_code != sharding.MISDIRECTED:
+                return response
+            await self.misdirected(keys, attempt)
+        return response
+
+    async def forward_batch(self, scope, headers, body: bytes) -> Optional[httpx.Response]:
+        """Split a batch spanning shards into one per shard; results keep the action order.
+
+        The parts commit independently, so a part that fails as a whole (an
+        error status, no shard, a proxy error) becomes failed results for
+        its actions rather than an error for the entire batch.
+        """
+        actions = json.loads(body)["actions"]
+        if len(actions) > BATCH_MAX_ACTIONS:
+            return httpx.Response(400, json={"detail": BATCH_LIMIT_DETAIL})
+        game_ids = [sharding.game_key(action.get("game_id")) if isinstance(action, dict) else None
+                    for action in actions]
+        if None in game_ids:
+            # Invalid; let a shard answer it
+            return await self.forward(scope, headers, body, RouteKeys())
+        ring = self.ring
+        groups: Dict[str, List[int]] = {}
+        for i, game_id in enumerate(game_ids):
+            groups.setdefault(ring.owner(game_id), []).append(i)
+        if len(groups) == 1:
+            return await self.forward(scope, headers, body, RouteKeys([game_ids[0]]))
+        # Merged results are always JSON
+        headers = [(k, v) for k, v in headers if k.lower() != "accept"] + [("accept", "application/json")]
+
+        async def forward_part(indexes: List[int]) -> Tuple[int, Optional[str], Optional[list]]:
+            """(status, detail, results) of one shard's part"""
+            part_body = json.dumps({"actions": [actions[i] for i in indexes]}).encode()
+            try:
+                part = await self.forward(scope, headers, part_body, RouteKeys([game_ids[indexes[0]]]))
+            except httpx.HTTPError as e:
+                logger.warning("Proxying part of a batch failed: %s", e)
+                return 502, "Shard unavailable", None
+            if part is None:
+                return 503, "No shard available", None
+            try:
+                document = part.json()
+            except ValueError:
+                document = {}
+            if part.status_code != 200:
+                return part.status_code, document.get("detail") if isinstance(document, dict) else None, None
+            return 200, None, document["results"]
+
+        parts = await asyncio.gather(*(forward_part(indexes) for indexes in groups.values()))
+        results = [None] * len(actions)
+        for indexes, (status, detail, part_results) in zip(groups.values(), parts):
+            if part_results is None:
+                part_results = [
+                    {"action": actions[i].get("action"), "game_id": game_ids[i], "ok": False,
+                     "status": status, "detail": detail if isinstance(detail, str) else "Batch part failed"}
+                    for i in indexes
+                ]
+            for i, result in zip(indexes, part_results):
+                results[i] = result
+        return httpx.Response(200, json={"results": results})
+
+    async def admin(self, scope, body: bytes, send) -> None:
+        """GET the ring and shard health; PUT {"shards": [...]} to change the configured shards"""
+        if self.token and dict(scope["headers"]).get(sharding.TOKEN_HEADER.encode(), b"").decode() != self.token:
+            await self.respond_json(send, 403, {"detail": "Invalid shard token"})
+            return
+        if scope["method"] == "PUT":
+            try:
+                shards = json.loads(body)["shards"]
+                assert isinstance(shards, list) and all(isinstance(s, str) for s in shards)
+            except (ValueError, KeyError, TypeError, AssertionError):
+                await self.respond_json(send, 422, {"detail": 'Expected {"shards": [url, ...]}'})
+                return
+            async with self._sync_lock:
+                self.configured = list(dict.fromkeys(url.rstrip("/") for url in shards))
+                for shard in self.configured:
+                    # New shards join on their first answered probe
+                    self.failures.setdefault(shard, 0)
+            await self.sync()
+        elif scope["method"] != "GET":
+            await self.respond_json(send, 405, {"detail": "Method Not Allowed"})
+            return
+        await self.respond_json(send, 200, {
+            "epoch": self.ring.epoch,
+            "ring": list(self.ring.shards),
+            "configured": self.configured,
+            "failures": self.failures,
+        })
+
+    async def handle_websocket(self, scope, receive, send) -> None:
+        if (await receive())["type"] != "websocket.connect":
+            return
+        keys = route_keys(scope["path"])
+        upstream = None
+        for attempt in range(MISDIRECTED_RETRIES):
+            shard = await self.owner(keys, self.ring)
+            if shard is None:
+                break
+            url = "ws" + self._url(shard, scope)[len("http"):]
+            try:
+                upstream = await websockets.connect(url, subprotocols=scope.get("subprotocols") or None,
+                                                    max_size=None, ping_interval=None, open_timeout=self.timeout)
+                break
+            except InvalidHandshake:
+                # Turned away by a shard that no longer owns the game
+                await self.misdirected(keys, attempt)
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.warning("Proxying WebSocket %s to %s failed: %s", scope["path"], shard, e)
+                break
+        if upstream is None:
+            await send({"type": "websocket.close", "code": sharding.CLOSE_MOVED})
+            return
+        await send({"type": "websocket.accept", "subprotocol": upstream.subprotocol})
+
+        async def from_client():
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                text = message.get("text")
+                await upstream.send(text if text is not None else message.get("bytes", b""))
+
+        async def from_shard():
+            try:
+                async for data in upstream:
+                    if isinstance(data, str):
+                        await send({"type": "websocket.send", "text": data})
+                    else:
+                        await send({"type": "websocket.send", "bytes": data})
+            except ConnectionClosed:
+                pass
+
+        client_task, shard_task = asyncio.create_task(from_client()), asyncio.create_task(from_shard())
+        try:
+            done, _ = await asyncio.wait((client_task, shard_task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            client_task.cancel()
+            shard_task.cancel()
+        if shard_task in done:
+            code = upstream.close_code
+            # Pass on why the shard closed (4410: game gone); anything else means reconnect
+            if code not in PASSED_CLOSE_CODES and not (code is not None and 3000 <= code <= 4999):
+                code = sharding.CLOSE_MOVED
+            try:
+                await send({"type": "websocket.close", "code": code})
+            except Exception:
+                pass
+        await upstream.close()
+
+
+app = ShardRouter(SHARD_URLS)
+
+
+def start_worker(port: int, host: str = "127.0.0.1", env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """Launch a local shard: uvicorn serving app.main with SHARD_ID set to its URL"""
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {}), "SHARD_ID": f"http://{host}:{port}"},
+    )
+
+
+def wait_for(url: str, timeout: float = 30) -> None:
+    """Wait until a server answers at url"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not start within {timeout} s")
+            time.sleep(0.1)
+
+
+def main(argv: Optional[list] = None) -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Route game traffic to the shards owning each game")
+    parser.add_argument("--workers", type=int, default=0, help="local shards to launch")
+    parser.add_argument("--shards", default=",".join(SHARD_URLS), help="comma-separated URLs of running shards")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-port", type=int, default=8001, help="port of the first local shard")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    # Not every proxied request and health check
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    shards = [url.strip() for url in args.shards.split(",") if url.strip()]
+    workers = [start_worker(args.worker_port + i) for i in range(args.workers)]
+    try:
+        for i in range(args.workers):
+            url = f"http://127.0.0.1:{args.worker_port + i}"
+            wait_for(url)
+            shards.append(url)
+        if not shards:
+            parser.error("no shards: pass --workers or --shards")
+        # uvicorn raises the signal that stopped it again on exit; stop the workers first
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        uvicorn.run(ShardRouter(shards), host=args.host, port=args.port)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
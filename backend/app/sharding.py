@@ -0,0 +1,233 @@
+"""Game-affinity sharding: every game is owned by one worker process.
+
+A consistent-hash ring maps each game id to one of the live shards (worker
+processes), with SHARD_VNODES points per shard, so adding or removing a
+shard only moves the games of its share of the ring. The shard router
+(shard_router.py) sends all HTTP and WebSocket traffic of a game to its
+owner, which can then keep the game's hot state to itself: the in-memory
+store, the snapshot cache, the WebSocket room and the bot turns. Broadcasts
+stay in-process and need no pub/sub backend.
+
+Requests are routed by:
+
+    game id     in the path (/api/games/{id}/...) or body ("game_id", or
+                those of a batch's actions; batches spanning shards are split)
+    game code   /api/games/code/{code}, the join body, /ws/{code}; the router
+                resolves codes to ids
+    "matchmaking"  the whole matchmaking queue lives on one shard
+
+Other requests, like creating a game, go to any shard.
+
+When membership changes the router pushes the new ring to every live shard
+(PUT /internal/ring) and keeps routing by the old one until all have
+adopted it. A shard then answers requests for games it no longer owns with
+421 Misdirected Request, which the router retries on the new owner once it
+switched, and hands those games off: it waits for their running turns,
+flushes the store, drops their cached state, stops their bot turns and
+closes their sockets with 1013 so clients reconnect through the router.
+When the router has switched, it tells the shards (POST
+/internal/ring/{epoch}/settled) and the new owners resume the bot turns;
+they load each game from the database on first use.
+
+A worker is a shard when SHARD_ID is set to the URL the router reaches it
+by. Without a ring (before the first push) it owns every game.
+"""
+import bisect
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+SHARD_ID = os.getenv("SHARD_ID")
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+# Shared secret of the router and its shards for PUT /internal/ring
+SHARD_TOKEN = os.getenv("SHARD_TOKEN")
+TOKEN_HEADER = "x-shard-token"
+
+MATCHMAKING_KEY = "matchmaking"
+MISDIRECTED = 421
+MISDIRECTED_DETAIL = "Game is owned by another shard"
+# 1013 "Try Again Later", as for evicted sockets: the client reconnects
+CLOSE_MOVED = 1013
+
+
+def point(key: str) -> int:
+    """Position of a key on the ring"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring of shards, each placed at vnodes points"""
+
+    def __init__(self, shards: Iterable[str], vnodes: int = SHARD_VNODES, epoch: int = 0):
+        self.shards: Tuple[str, ...] = tuple(sorted(set(shards)))
+        self.vnodes = vnodes
+        # Orders rings pushed by the router; stale pushes are ignored
+        self.epoch = epoch
+        points = sorted((point(f"{shard}#{i}"), shard) for shard in self.shards for i in range(vnodes))
+        self._points = [p for p, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def owner(self, key: Any) -> Optional[str]:
+        """Shard owning a key (a game id or MATCHMAKING_KEY); None for an empty ring"""
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, point(str(key)))
+        return self._owners[i % len(self._owners)]
+
+
+@dataclass
+class RouteKeys:
+    """What a request is routed by: ring keys, or else a game code to resolve"""
+    keys: List[str] = field(default_factory=list)
+    code: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.keys) or self.code is not None
+
+
+def game_key(value: Any) -> Optional[str]:
+    """Ring key of a game id; None if it is not one"""
+    try:
+        return str(UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def _body(body: Optional[bytes]) -> Any:
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+# POST endpoints whose body names the game
+BODY_GAME_PATHS = frozenset(("/api/games/join", "/api/games/roll-dice", "/api/games/move", "/api/games/batch"))
+
+
+def route_keys(path: str, body: Optional[bytes] = None) -> RouteKeys:
+    """Routing keys of an HTTP or WebSocket request path, and the body of BODY_GAME_PATHS.
+
+    Unparseable requests get no keys; any shard then rejects them as usual.
+    """
+    parts = path.strip("/").split("/")
+    if parts[0] == "ws" and len(parts) >= 2:
+        if parts[1] == "matchmaking":
+            return RouteKeys([MATCHMAKING_KEY])
+        return RouteKeys(code=parts[1]) if len(parts) == 2 else RouteKeys()
+    if parts[0] != "api" or len(parts) < 2:
+        return RouteKeys()
+    if parts[1] == "matchmaking":
+        return RouteKeys([MATCHMAKING_KEY])
+    if parts[1] != "games" or len(parts) < 3:
+        return RouteKeys()
+    if path in BODY_GAME_PATHS:
+        data = _body(body)
+        if not isinstance(data, dict):
+            return RouteKeys()
+        if parts[2] == "join":
+            code = data.get("code")
+            return RouteKeys(code=code.upper()) if isinstance(code, str) else RouteKeys()
+        if parts[2] == "batch":
+            actions = data.get("actions")
+            ids = [game_key(a.get("game_id")) for a in actions if isinstance(a, dict)] \
+                if isinstance(actions, list) else []
+            return RouteKeys(list(dict.fromkeys(i for i in ids if i)))
+        game_id = game_key(data.get("game_id"))
+        return RouteKeys([game_id]) if game_id else RouteKeys()
+    if parts[2] == "code" and len(parts) == 4:
+        return RouteKeys(code=parts[3].upper())
+    game_id = game_key(parts[2])
+    return RouteKeys([game_id]) if game_id else RouteKeys()
+
+
+class Shard:
+    """This worker's place in the ring"""
+
+    def __init__(self, shard_id: Optional[str] = SHARD_ID):
+        self.id = shard_id
+        self.ring: Optional[HashRing] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.id is not None
+
+    def owns(self, key: Any) -> bool:
+        """Whether this shard owns a game id or MATCHMAKING_KEY"""
+        return self.ring is None or self.ring.owner(key) == self.id
+
+    def set_ring(self, ring: HashRing) -> bool:
+        """Adopt a newer ring; False if it is older than the current one"""
+        if self.ring is not None and ring.epoch < self.ring.epoch:
+            return False
+        self.ring = ring
+        return True
+
+
+shard = Shard()
+
+ResolveCode = Callable[[str], Awaitable[Optional[Any]]]
+
+
+class ShardMiddleware:
+    """ASGI middleware turning away requests for games this shard does not own.
+
+    HTTP requests get 421 Misdirected Request; WebSockets are closed with
+    CLOSE_MOVED before the handshake completes. resolve_code maps a game
+    code to its id, or None for an unknown code (let through: the endpoint
+    answers it as usual).
+    """
+
+    def __init__(self, app, resolve_code: ResolveCode, shard: Shard = shard):
+        self.app = app
+        self.resolve_code = resolve_code
+        self.shard = shard
+
+    async def owned(self, keys: RouteKeys) -> bool:
+        if keys.code is not None:
+            game_id = await self.resolve_code(keys.code)
+            return game_id is None or self.shard.owns(game_id)
+        return all(self.shard.owns(key) for key in keys.keys)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or self.shard.ring is None:
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if scope["type"] == "http" and path in BODY_GAME_PATHS:
+            # Read the body to route by, then replay it to the endpoint
+            chunks = []
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    break
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body = b"".join(chunks)
+            receive_rest = receive
+            replayed = False
+
+            async def receive():
+                nonlocal replayed
+                if replayed:
+                    return await receive_rest()
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+        else:
+            body = None
+        if await self.owned(route_keys(path, body)):
+            await self.app(scope, receive, send)
+        elif scope["type"] == "http":
+            content = json.dumps({"detail": MISDIRECTED_DETAIL}).encode()
+            await send({"type": "http.response.start", "status": MISDIRECTED,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(content)).encode())]})
+            await send({"type": "http.response.body", "body": content})
+        else:
+            await send({"type": "websocket.close", "code": CLOSE_MOVED})
@@ -0,0 +1,97 @@
+"""Pre-serialized game snapshots for polling clients.
+
+GET /api/games/{id} and /api/games/code/{code} serve the JSON body cached
+for the game's current version, with an ETag naming that version, and answer
+a matching If-None-Match with 304 Not Modified. The MessagePack body (see
+wire.py) is added to the entry the first time a client asks for it.
+
+Every state change in this process invalidates the game's entry, but
+another process (a second worker, a migration, a script) may have changed
+the game, so a cached entry is only served after a one-column version check
+against the database. Set SNAPSHOT_CACHE_TRUSTED when this process is the
+only writer of the database to skip the check: a repeated poll then costs
+a dict lookup.
+"""
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "1024"))
+SNAPSHOT_CACHE_TRUSTED = os.getenv("SNAPSHOT_CACHE_TRUSTED", "false").lower() in ("1", "true", "yes")
+
+
+class Snapshot(NamedTuple):
+    game_id: Any
+    code: str
+    version: int
+    etag: str
+    body: bytes
+    packed: Optional[bytes] = None
+
+
+def make_etag(game_id: Any, version: int) -> str:
+    return f'"{game_id}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class SnapshotCache:
+    """LRU of the latest serialized snapshot per game"""
+
+    def __init__(self, max_games: int = SNAPSHOT_CACHE_SIZE, trusted: bool = SNAPSHOT_CACHE_TRUSTED):
+        self.max_games = max_games
+        # Entries are served without a version check
+        self.trusted = trusted
+        self._entries: "OrderedDict[Any, Snapshot]" = OrderedDict()
+        self._codes: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, game_id: Any) -> Optional[Snapshot]:
+        snapshot = self._entries.get(game_id)
+        if snapshot is not None:
+            self._entries.move_to_end(game_id)
+        return snapshot
+
+    def game_ids(self) -> List[Any]:
+        return list(self._entries)
+
+    def get_by_code(self, code: str) -> Optional[Snapshot]:
+        game_id = self._codes.get(code)
+        return self.get(game_id) if game_id is not None else None
+
+    def put(self, game_id: Any, code: str, version: int, body: bytes) -> Snapshot:
+        snapshot = Snapshot(game_id, code, version, make_etag(game_id, version), body)
+        self._entries[game_id] = snapshot
+        self._entries.move_to_end(game_id)
+        self._codes[code] = game_id
+        while len(self._entries) > self.max_games:
+            _, evicted = self._entries.popitem(last=False)
+            self._codes.pop(evicted.code, None)
+        return snapshot
+
+    def add_packed(self, snapshot: Snapshot, packed: bytes) -> Snapshot:
+        """Attach the MessagePack body, if the snapshot is still the cached version"""
+        snapshot = snapshot._replace(packed=packed)
+        current = self._entries.get(snapshot.game_id)
+        if current is not None and current.version == snapshot.version:
+            self._entries[snapshot.game_id] = snapshot
+        return snapshot
+
+    def invalidate(self, game_id: Any) -> None:
+        snapshot = self._entries.pop(game_id, None)
+        if snapshot is not None:
+            self._codes.pop(snapshot.code, None)
+
+
+snapshot_cache = SnapshotCache()
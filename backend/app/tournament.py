@@ -0,0 +1,177 @@
+"""Headless self-play and round-robin tournaments for bot strategies.
+
+Games are played directly against the game_state rules, without the HTTP
+API or a database. Every game gets its own RNG seeded from the tournament
+seed and the game's index, so results are reproducible regardless of how
+games are spread over worker processes.
+
+Usage:
+    python -m app.tournament --strategies random,greedy,safe --games-per-lineup 200
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .bots import get_strategy
+from .game_state import GameState, PlayerState, serve_penalty, skip_turn, valid_moves, move_piece
+from .models import GameStatus, PlayerColor
+
+COLOR_ORDER = [PlayerColor.RED, PlayerColor.BLUE, PlayerColor.GREEN, PlayerColor.YELLOW]
+
+
+@dataclass(slots=True)
+class GameResult:
+    lineup: Tuple[str, ...]
+    winner_seat: int  # -1 if abandoned after max_turns
+    turns: int
+    moves: int
+
+
+def new_game(seats: int) -> GameState:
+    return GameState(
+        id=None,
+        code="",
+        status=GameStatus.IN_PROGRESS,
+        current_player_index=0,
+        players=[
+            PlayerState(id=seat, name=f"seat-{seat}", color=COLOR_ORDER[seat], pieces=[-1, -1, -1, -1], order=seat)
+            for seat in range(seats)
+        ],
+    )
+
+
+def play_game(lineup: Sequence[str], seed: str, max_turns: int = 5000) -> GameResult:
+    """Play one game between the strategies in lineup (one per seat)"""
+    rng = random.Random(seed)
+    strategies = [get_strategy(name) for name in lineup]
+    state = new_game(len(lineup))
+    turns = moves = 0
+    while state.status == GameStatus.IN_PROGRESS and turns < max_turns:
+        turns += 1
+        player = state.current_player
+        if serve_penalty(state, player):
+            continue
+        dice_value = rng.randint(1, 6)
+        options = valid_moves(state, player, dice_value)
+        if not options:
+            skip_turn(state, player)
+            continue
+        move = strategies[player.order].choose_move(state, player, dice_value, options, rng)
+        move_piece(state, player, move["piece_index"], dice_value)
+        state.unsaved_moves.clear()
+        moves += 1
+    winner = state.winner_id if state.status == GameStatus.FINISHED else -1
+    return GameResult(tuple(lineup), winner, turns, moves)
+
+
+def _play_chunk(matches: List[Tuple[int, Tuple[str, ...]]], seed: int, max_turns: int) -> List[GameResult]:
+    return [play_game(lineup, f"{seed}:{index}", max_turns) for index, lineup in matches]
+
+
+def round_robin(strategies: Sequence[str], seats: int, games_per_lineup: int) -> List[Tuple[int, Tuple[str, ...]]]:
+    """Every seat assignment of the strategies that has at least two different ones"""
+    lineups = [
+        lineup for lineup in itertools.product(strategies, repeat=seats)
+        if len(set(lineup)) > 1 or len(strategies) == 1
+    ]
+    matches = [lineup for lineup in lineups for _ in range(games_per_lineup)]
+    return list(enumerate(matches))
+
+
+def run_tournament(
+    strategies: Sequence[str],
+    seats: int = 4,
+    games_per_lineup: int = 10,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    max_turns: int = 5000,
+) -> Dict:
+    for name in strategies:
+        get_strategy(name)  # Fail fast on unknown names
+    matches = round_robin(strategies, seats, games_per_lineup)
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker keeps IPC overhead low while balancing load
+    chunk_size = max(1, len(matches) // (workers * 4))
+    chunks = [matches[i:i + chunk_size] for i in range(0, len(matches), chunk_size)]
+
+    started = time.perf_counter()
+    results: List[GameResult] = []
+    if workers == 1:
+        for chunk in chunks:
+            results.extend(_play_chunk(chunk, seed, max_turns))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_play_chunk, chunk, seed, max_turns) for chunk in chunks]
+            for future in futures:
+                results.extend(future.result())
+    elapsed = time.perf_counter() - started
+
+    standings = {name: {"games": 0, "wins": 0} for name in strategies}
+    seat_wins = [0] * seats
+    for result in results:
+        for name in set(result.lineup):
+            standings[name]["games"] += result.lineup.count(name)
+        if result.winner_seat >= 0:
+            standings[result.lineup[result.winner_seat]]["wins"] += 1
+            seat_wins[result.winner_seat] += 1
+    for row in standings.values():
+        # Per-seat win rate, comparable to the 1/seats baseline
+        row["win_rate"] = row["wins"] / row["games"] if row["games"] else 0.0
+    finished = sum(seat_wins)
+
+    return {
+        "strategies": list(strategies),
+        "seats": seats,
+        "seed": seed,
+        "games": len(results),
+        "unfinished": len(results) - finished,
+        "standings": dict(sorted(standings.items(), key=lambda item: -item[1]["win_rate"])),
+        "win_rate_by_seat": [wins / finished if finished else 0.0 for wins in seat_wins],
+        "mean_turns": sum(r.turns for r in results) / len(results) if results else 0.0,
+        "workers": workers,
+        "elapsed_seconds": elapsed,
+        "games_per_second": len(results) / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Round-robin tournament between bot strategies")
+    parser.add_argument("--strategies", type=str, default="random,greedy,safe",
+                        help="Comma-separated strategy names")
+    parser.add_argument("--seats", type=int, default=4, choices=[2, 3, 4])
+    parser.add_argument("--games-per-lineup", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=5000)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_tournament(
+        [s.strip() for s in args.strategies.split(",") if s.strip()],
+        args.seats, args.games_per_lineup, args.workers, args.seed, args.max_turns,
+    )
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return 0
+
+    print(f"Games: {report['games']} ({report['seats']} seats), unfinished: {report['unfinished']}")
+    print("\nStandings (wins per seat played):")
+    for name, row in report["standings"].items():
+        print(f"  {name:<10} {row['win_rate']:7.2%}  ({row['wins']}/{row['games']})")
+    print("\nWin rate by seat: " + ", ".join(f"{rate:.2%}" for rate in report["win_rate_by_seat"]))
+    print(f"Mean turns per game: {report['mean_turns']:.1f}")
+    print(f"\nThroughput: {report['games_per_second']:,.1f} games/s "
+          f"on {report['workers']} workers ({report['elapsed_seconds']:.2f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Negotiated wire formats for REST responses and WebSocket messages.
+
+JSON is the default. Clients that send `Accept: application/msgpack` on REST
+requests, or connect to /ws/{code}?format=msgpack (binary frames), get
+MessagePack instead, in a compact form of the same documents:
+
+    player UUIDs   player_id, winner_id, captured_player_id and the "id" of
+                   partial players in deltas become the player's seat (its
+                   "order"); complete player objects keep their UUID, so a
+                   client learns its own seat once
+    other UUIDs    16 raw bytes (bin) instead of 36-character strings
+    status, color  index into STATUSES / COLORS
+
+Keys, nesting and all other values are the same as in JSON. Error responses
+stay JSON. Requires the `msgpack` extra; without it every client gets JSON.
+"""
+import json
+from typing import Any, Dict, Iterable, Optional, Union
+from uuid import UUID
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = frozenset((MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"))
+WS_FORMAT = "msgpack"
+
+STATUSES = ("waiting", "in_progress", "finished", "expired")
+COLORS = ("red", "blue", "green", "yellow")
+_STATUS_CODES = {value: i for i, value in enumerate(STATUSES)}
+_COLOR_CODES = {value: i for i, value in enumerate(COLORS)}
+
+PLAYER_KEYS = frozenset(("player_id", "winner_id", "captured_player_id"))
+UUID_KEYS = frozenset(("id", "game_id"))
+
+# Player UUID (as a string) -> seat
+Seats = Dict[str, int]
+
+
+def available() -> bool:
+    return msgpack is not None
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    """Whether an Accept header prefers MessagePack to JSON"""
+    if not accept or "msgpack" not in accept:
+        return False
+    best_msgpack = best_json = 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            best_msgpack = max(best_msgpack, q)
+        elif media_type in ("application/json", "application/*", "*/*"):
+            best_json = max(best_json, q)
+    return best_msgpack > 0 and best_msgpack >= best_json
+
+
+def seat_map(players: Iterable[Any]) -> Seats:
+    """Seats of ORM players or PlayerStates"""
+    return {str(p.id): p.order for p in players}
+
+
+def learn_seats(document: Any, seats: Seats) -> None:
+    """Add the seats of the complete player objects in a document.
+
+    These are listed in "players" of snapshots and history positions, and of
+    the changes of a player_joined delta.
+    """
+    if not isinstance(document, dict):
+        return
+    changes = document.get("changes")
+    for players in (document.get("players"), changes.get("players") if isinstance(changes, dict) else None):
+        if isinstance(players, list):
+            for player in players:
+                if isinstance(player, dict) and "id" in player and "order" in player:
+                    seats[player["id"]] = player["order"]
+
+
+def _uuid_bytes(value: Any) -> Any:
+    # Several times faster than UUID(value).bytes
+    if isinstance(value, str) and len(value) == 36 and value[8] == value[23] == "-":
+        try:
+            return bytes.fromhex(value.replace("-", ""))
+        except ValueError:
+            pass
+    return value
+
+
+def _player_ref(value: Any, seats: Seats) -> Any:
+    seat = seats.get(value) if isinstance(value, str) else None
+    return seat if seat is not None else _uuid_bytes(value)
+
+
+def compact(document: Any, seats: Seats) -> Any:
+    """The compact form of a JSON-ready document"""
+    if isinstance(document, dict):
+        out = {}
+        for key, value in document.items():
+            if key in PLAYER_KEYS:
+                out[key] = _player_ref(value, seats)
+            elif key in UUID_KEYS:
+                out[key] = _uuid_bytes(value)
+            elif key == "status" and isinstance(value, str):
+                out[key] = _STATUS_CODES.get(value, value)
+            elif key == "color" and isinstance(value, str):
+                out[key] = _COLOR_CODES.get(value, value)
+            elif key == "players" and isinstance(value, list):
+                out[key] = [_compact_player(player, seats) for player in value]
+            elif isinstance(value, (dict, list)):
+                out[key] = compact(value, seats)
+            else:
+                out[key] = value
+        return out
+    if isinstance(document, list):
+        return [compact(value, seats) if isinstance(value, (dict, list)) else value for value in document]
+    return document
+
+
+def _compact_player(player: Any, seats: Seats) -> Any:
+    out = compact(player, seats)
+    # Partial players in deltas are named by seat; complete ones keep their UUID
+    if isinstance(player, dict) and "name" not in player and "id" in player:
+        out["id"] = _player_ref(player["id"], seats)
+    return out
+
+
+def pack(document: Any, seats: Optional[Seats] = None) -> bytes:
+    """MessagePack encoding of the compact form of a JSON-ready document"""
+    seats = dict(seats) if seats else {}
+    learn_seats(document, seats)
+    return msgpack.packb(compact(document, seats), use_bin_type=True)
+
+
+def _expand(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_expand(item) for item in value]
+    if isinstance(value, bytes) and len(value) == 16:
+        return str(UUID(bytes=value))
+    return value
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """A message from a client: JSON text, or a MessagePack frame with UUIDs as 16 raw bytes.
+
+    Raises ValueError if it cannot be decoded.
+    """
+    if isinstance(data, str):
+        return json.loads(data)
+    if msgpack is None:
+        raise ValueError("MessagePack frames need the msgpack extra")
+    try:
+        return _expand(msgpack.unpackb(data, raw=False))
+    except (ValueError, TypeError, msgpack.UnpackException) as e:
+        raise ValueError(str(e))
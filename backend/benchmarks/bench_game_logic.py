@@ -0,0 +1,106 @@
+"""pytest-benchmark suite for the hot game_logic functions.
+
+Each benchmark runs one rule function over a batch of generated positions
+(see positions.py) for both the frozen reference implementation and the
+current app.game_logic, grouped so the two appear side by side.
+
+Usage (from backend/):
+    pytest benchmarks/bench_game_logic.py
+    pytest benchmarks/bench_game_logic.py -k crowded --benchmark-autosave
+    pytest benchmarks/bench_game_logic.py --benchmark-compare
+
+The file is deliberately not named test_*.py so that a plain `pytest` run
+does not pick it up.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+import reference_game_logic  # noqa: E402
+from app import game_logic  # noqa: E402
+from positions import SCENARIOS, generate  # noqa: E402
+
+BATCH = 1000
+
+ENGINES = {"reference": reference_game_logic, "current": game_logic}
+POSITIONS = {scenario: generate(scenario, BATCH) for scenario in SCENARIOS}
+PLAYERS = {scenario: [p.players() for p in positions] for scenario, positions in POSITIONS.items()}
+
+engines = pytest.mark.parametrize("engine", list(ENGINES))
+scenarios = pytest.mark.parametrize("scenario", list(SCENARIOS))
+
+
+@engines
+@scenarios
+def test_can_move_piece(benchmark, engine, scenario):
+    benchmark.group = f"can_move_piece[{scenario}]"
+    can_move_piece = ENGINES[engine].can_move_piece
+    positions = POSITIONS[scenario]
+
+    def run():
+        for p in positions:
+            for piece in p.pieces:
+                can_move_piece(piece, p.dice, p.color, p.pieces, p.opponents)
+
+    benchmark(run)
+
+
+@engines
+@scenarios
+def test_check_capture(benchmark, engine, scenario):
+    benchmark.group = f"check_capture[{scenario}]"
+    check_capture = ENGINES[engine].check_capture
+    cases = list(zip(POSITIONS[scenario], PLAYERS[scenario]))
+
+    def run():
+        for p, players in cases:
+            check_capture(p.target, p.color, players)
+
+    benchmark(run)
+
+
+@engines
+@scenarios
+def test_get_valid_moves(benchmark, engine, scenario):
+    benchmark.group = f"get_valid_moves[{scenario}]"
+    get_valid_moves = ENGINES[engine].get_valid_moves
+    positions = POSITIONS[scenario]
+
+    def run():
+        for p in positions:
+            get_valid_moves(p.pieces, p.dice, p.color, p.opponents)
+
+    benchmark(run)
+
+
+@engines
+@scenarios
+def test_check_winner(benchmark, engine, scenario):
+    benchmark.group = f"check_winner[{scenario}]"
+    check_winner = ENGINES[engine].check_winner
+    positions = POSITIONS[scenario]
+
+    def run():
+        for p in positions:
+            check_winner(p.pieces)
+
+    benchmark(run)
+
+
+@scenarios
+def test_board_valid_moves(benchmark, scenario):
+    """Move generation against a Board built once per turn, as game_state does"""
+    benchmark.group = f"get_valid_moves[{scenario}]"
+    positions = POSITIONS[scenario]
+
+    def run():
+        for p in positions:
+            board = game_logic.opponents_board(p.color, p.opponents)
+            game_logic.board_valid_moves(board, p.pieces, p.dice, p.color)
+
+    benchmark(run)
@@ -0,0 +1,110 @@
+"""Check the AI search's rule engine and time its move decisions.
+
+Plays seeded random games through the game_state rules and checks at every
+turn that ai.Search generates the same moves and reaches the same position
+(pieces, seat to move, 6s and penalty counters, winner, Zobrist hash) as
+game_state. Then times search_move on positions sampled from those games
+under the time budget, and reports the depth reached and the latency
+distribution against the budget.
+
+Usage (from backend/):
+    python benchmarks/check_ai.py
+    python benchmarks/check_ai.py --games 100 --budget 0.02 --decisions 300
+
+Exits with status 1 on the first disagreement.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import ai, game_state  # noqa: E402
+from app.models import GameStatus  # noqa: E402
+from app.tournament import new_game  # noqa: E402
+
+
+def to_position(state: game_state.GameState) -> ai.Position:
+    colors, pieces, seat, sixes, skips, _ = ai.search_args(state, 1)
+    winner = state.current_player_index if state.status == GameStatus.FINISHED else -1
+    return ai.Position(tuple(pieces), seat, tuple(sixes), tuple(skips), winner,
+                       ai.position_key(pieces, seat, sixes, skips))
+
+
+def play(rng: random.Random, seats: int, samples: list, max_turns: int = 5000) -> int:
+    """Play one random game, checking every turn; returns the turns played"""
+    state = new_game(seats)
+    search = ai.Search([p.color for p in state.players], deadline=float("inf"))
+    turns = 0
+    while state.status == GameStatus.IN_PROGRESS and turns < max_turns:
+        turns += 1
+        before = to_position(state)
+        player = state.current_player
+        if game_state.serve_penalty(state, player):
+            expected, actual = to_position(state), search.serve_penalty(before)
+        else:
+            dice = rng.randint(1, 6)
+            options = game_state.valid_moves(state, player, dice)
+            board = search.board(before.pieces)
+            generated = search.moves(before, dice, board)
+            # Search keeps one move per distinct starting position
+            if {m["to_position"] for m in options} != {new for _, new in generated}:
+                raise SystemExit(f"Moves differ for {before} rolling {dice}:\n  game_state: {options}\n  ai: {generated}")
+            if not options:
+                game_state.skip_turn(state, player)
+                expected, actual = to_position(state), search.skip(before)
+            else:
+                move = rng.choice(options)
+                samples.append((ai.search_args(state, dice), len(generated)))
+                game_state.move_piece(state, player, move["piece_index"], dice)
+                state.unsaved_moves.clear()
+                expected, actual = to_position(state), search.play(before, move["piece_index"], move["to_position"], dice, board)
+        if state.status == GameStatus.FINISHED:
+            expected = expected._replace(seat=actual.seat, key=actual.key)
+        if expected != actual:
+            raise SystemExit(f"Positions differ after {before}:\n  game_state: {expected}\n  ai:         {actual}")
+    return turns
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check and time the AI search")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--decisions", type=int, default=200, help="Timed search_move calls")
+    parser.add_argument("--budget", type=float, default=ai.AI_TIME_BUDGET, help="Seconds per decision")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    samples = []
+    turns = sum(play(rng, rng.randint(2, 4), samples) for _ in range(args.games))
+    print(f"{args.games} games, {turns} turns: search rules match game_state")
+
+    # Decisions with a real choice, as a bot would face them
+    choices = [s for s, n in samples if n > 1]
+    picked = rng.sample(choices, min(args.decisions, len(choices)))
+    ai.table.clear()
+    elapsed, depths, nodes = [], Counter(), 0
+    for search_args in picked:
+        started = time.perf_counter()
+        suggestion = ai.search_move(*search_args, budget=args.budget)
+        elapsed.append(time.perf_counter() - started)
+        depths[suggestion.depth] += 1
+        nodes += suggestion.nodes
+    elapsed.sort()
+    p95 = elapsed[int(len(elapsed) * 0.95) - 1]
+    print(f"\n{len(picked)} decisions at a {args.budget * 1000:.0f} ms budget:")
+    print(f"  latency p50 {statistics.median(elapsed) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+          f"max {elapsed[-1] * 1000:.1f} ms")
+    print(f"  depth reached: " + ", ".join(f"{d}: {n}" for d, n in sorted(depths.items())))
+    print(f"  {nodes / sum(elapsed):,.0f} chance nodes/s, transposition table "
+          f"{len(ai.table):,} entries, hit rate {ai.table.hits / max(1, ai.table.hits + ai.table.misses):.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Randomized equivalence check of a rule engine against the reference.
+
+Three passes, all seeded and reproducible:
+
+  positions  every rule function on generated positions from all scenarios
+  games      random games played move for move, comparing the valid moves,
+             captures and winner checks of both engines at every turn
+  batch      random games played in lockstep, comparing the bulk rules of
+             the NumPy batch simulator (move_options, resolve_captures,
+             finished) with app.game_logic for every game at every turn;
+             skipped without numpy (poetry install -E sim)
+
+The engine under test is any module exposing can_move_piece, check_capture,
+get_valid_moves and check_winner with the game_logic signatures.
+
+Usage (from backend/):
+    python benchmarks/check_equivalence.py
+    python benchmarks/check_equivalence.py --engine my_fast_logic --positions 200000 --games 2000
+    python benchmarks/check_equivalence.py --batch-games 2000
+
+Exits with status 1 and prints a reproducer on the first mismatch.
+"""
+import argparse
+import importlib
+import random
+import sys
+from pathlib import Path
+from typing import Optional
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+import reference_game_logic as reference  # noqa: E402
+from positions import COLORS, SCENARIOS, generate  # noqa: E402
+from app import game_logic  # noqa: E402
+from app.game_logic import START_POSITIONS  # noqa: E402
+
+try:
+    import numpy as np
+    from app import batch_sim
+except ImportError:
+    batch_sim = None
+
+
+class Mismatch(Exception):
+    pass
+
+
+def compare(name: str, args: tuple, expected, actual) -> None:
+    if expected != actual:
+        raise Mismatch(f"{name}{args!r}\n  reference: {expected!r}\n  engine:    {actual!r}")
+
+
+def check_positions(engine, count: int, seed: int) -> int:
+    checked = 0
+    for scenario in SCENARIOS:
+        for p in generate(scenario, count // len(SCENARIOS), seed):
+            for opponents in (p.opponents, None):
+                for piece in p.pieces:
+                    args = (piece, p.dice, p.color, p.pieces, opponents)
+                    compare("can_move_piece", args, reference.can_move_piece(*args), engine.can_move_piece(*args))
+                args = (p.pieces, p.dice, p.color, opponents)
+                compare("get_valid_moves", args, reference.get_valid_moves(*args), engine.get_valid_moves(*args))
+            args = (p.target, p.color, p.players())
+            compare("check_capture", args, reference.check_capture(*args), engine.check_capture(*args))
+            compare("check_winner", (p.pieces,), reference.check_winner(p.pieces), engine.check_winner(p.pieces))
+            checked += 1
+    return checked
+
+
+def play_game(engine, rng: random.Random, seats: int, max_turns: int = 2000) -> int:
+    """Play one random game with the reference rules, checking the engine at every turn"""
+    colors = COLORS[:seats]
+    pieces = {color: [-1, -1, -1, -1] for color in colors}
+    turn = 0
+    for turn in range(max_turns):
+        color = colors[turn % seats]
+        dice = rng.randint(1, 6)
+        opponents = {c: p for c, p in pieces.items() if c != color}
+        args = (pieces[color], dice, color, opponents)
+        moves = reference.get_valid_moves(*args)
+        compare("get_valid_moves", args, moves, engine.get_valid_moves(*args))
+        if not moves:
+            continue
+        move = rng.choice(moves)
+        players = {f"player-{c.value}": (c, p) for c, p in pieces.items()}
+        args = (move["to_position"], color, players)
+        captured = reference.check_capture(*args)
+        compare("check_capture", args, captured, engine.check_capture(*args))
+
+        pieces[color][move["piece_index"]] = move["to_position"]
+        if captured:
+            captured_color = players[captured[0]][0]
+            pieces[captured_color][captured[1]] = -1
+        compare("check_winner", (pieces[color],), reference.check_winner(pieces[color]),
+                engine.check_winner(pieces[color]))
+        if reference.check_winner(pieces[color]):
+            break
+    return turn + 1
+
+
+def check_batch_sim(count: int, seed: int, max_turns: int = 2000) -> int:
+    """Play count random games in lockstep with the batch simulator's bulk rules; returns turns checked"""
+    rng = random.Random(seed)
+    colors = [rng.sample(COLORS, rng.randint(2, 4)) for _ in range(count)]
+    pieces = np.full((count, batch_sim.SEATS, batch_sim.PIECES), -1, dtype=np.int8)
+    start = np.zeros((count, batch_sim.SEATS), dtype=np.int16)
+    for game, seat_colors in enumerate(colors):
+        start[game, :len(seat_colors)] = [START_POSITIONS[c] for c in seat_colors]
+    current = np.zeros(count, dtype=np.intp)
+    live = np.ones(count, dtype=bool)
+    checked = 0
+    for _ in range(max_turns):
+        games = np.nonzero(live)[0]
+        if len(games) == 0:
+            break
+        seat = current[games]
+        dice = np.array([rng.randint(1, 6) for _ in games], dtype=np.int8)
+        valid, new, target, counts, absolute = batch_sim.move_options(pieces[games], start[games], seat, dice)
+
+        rows, choices, expected_captures = [], [], []
+        for row, game in enumerate(games):
+            color = colors[game][seat[row]]
+            own = pieces[game, seat[row]].tolist()
+            opponents = {c: pieces[game, s].tolist() for s, c in enumerate(colors[game]) if s != seat[row]}
+            args = (own, int(dice[row]), color, opponents)
+            moves = game_logic.get_valid_moves(*args)
+            actual = [(k, int(new[row, k])) for k in range(batch_sim.PIECES) if valid[row, k]]
+            compare("batch_sim.move_options", args, [(m["piece_index"], m["to_position"]) for m in moves], actual)
+            checked += 1
+            if not moves:
+                continue
+            move = rng.choice(moves)
+            # Seat order, as in a game and as resolve_captures checks them
+            players = {f"seat-{s}": (c, pieces[game, s].tolist()) for s, c in enumerate(colors[game])}
+            rows.append(row)
+            choices.append(move["piece_index"])
+            expected_captures.append(game_logic.check_capture(move["to_position"], color, players))
+
+        current[games] = (seat + 1) % [len(colors[g]) for g in games]
+        if not rows:
+            continue
+        rows, choices = np.array(rows), np.array(choices)
+        to = new[rows, choices]
+        captured, captured_seat, captured_piece = batch_sim.resolve_captures(
+            counts[rows, :, choices], absolute[rows], target[rows, choices], to
+        )
+        moved, seat = games[rows], seat[rows]
+        for i, game in enumerate(moved):
+            actual = (f"seat-{captured_seat[i]}", int(captured_piece[i])) if captured[i] else None
+            compare("batch_sim.resolve_captures", (int(to[i]), colors[game][seat[i]], pieces[game].tolist()),
+                    expected_captures[i], actual)
+        pieces[moved[captured], captured_seat[captured], captured_piece[captured]] = -1
+        pieces[moved, seat, choices] = to
+
+        won = batch_sim.finished(pieces[moved, seat])
+        for i, game in enumerate(moved):
+            own = pieces[game, seat[i]].tolist()
+            compare("batch_sim.finished", (own,), game_logic.check_winner(own), bool(won[i]))
+        live[moved[won]] = False
+    return checked
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check a rule engine against the reference game_logic")
+    parser.add_argument("--engine", type=str, default="app.game_logic", help="Module path of the engine")
+    parser.add_argument("--positions", type=int, default=100000, help="Generated positions to check")
+    parser.add_argument("--games", type=int, default=1000, help="Random games to play move for move")
+    parser.add_argument("--batch-games", type=int, default=500,
+                        help="Random games for the batch simulator check (needs numpy)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    engine = importlib.import_module(args.engine)
+    try:
+        positions = check_positions(engine, args.positions, args.seed)
+        rng = random.Random(args.seed)
+        turns = sum(play_game(engine, rng, rng.randint(2, 4)) for _ in range(args.games))
+    except Mismatch as exc:
+        print(f"MISMATCH in {args.engine} (seed {args.seed}):\n{exc}")
+        return 1
+    print(f"{args.engine} matches the reference: {positions} positions, {args.games} games, {turns} turns")
+
+    if not args.batch_games:
+        return 0
+    if batch_sim is None:
+        print("app.batch_sim not checked: numpy is not installed (poetry install -E sim)")
+        return 0
+    try:
+        batch_turns = check_batch_sim(args.batch_games, args.seed)
+    except Mismatch as exc:
+        print(f"MISMATCH in app.batch_sim (seed {args.seed}):\n{exc}")
+        return 1
+    print(f"app.batch_sim matches app.game_logic: {args.batch_games} games, {batch_turns} turns")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
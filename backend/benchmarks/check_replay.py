@@ -0,0 +1,97 @@
+"""Check and time the binary move log replay engine.
+
+Plays seeded random games through the game_state rules, remembering the
+position after every logged event, then checks that replay.replay() rebuilds
+each of them, both from scratch and seeking from the stored snapshots.
+Finally times a full replay against seeking to the last event.
+
+Usage (from backend/):
+    python benchmarks/check_replay.py
+    python benchmarks/check_replay.py --games 500 --seed 3
+
+Exits with status 1 on the first position that does not match.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import game_state, replay  # noqa: E402
+from app.models import GameStatus  # noqa: E402
+from app.tournament import new_game  # noqa: E402
+
+
+def position(state: game_state.GameState) -> tuple:
+    return (
+        state.status,
+        state.current_player_index,
+        state.winner_id,
+        tuple((tuple(p.pieces), p.consecutive_sixes, p.turns_to_skip) for p in state.players),
+    )
+
+
+def play(rng: random.Random, seats: int, max_turns: int = 5000):
+    """A finished random game and its position after every event"""
+    state = new_game(seats)
+    positions = [position(state)]
+    for _ in range(max_turns):
+        if state.status != GameStatus.IN_PROGRESS:
+            break
+        player = state.current_player
+        if not game_state.serve_penalty(state, player):
+            dice = rng.randint(1, 6)
+            options = game_state.valid_moves(state, player, dice)
+            if options:
+                game_state.move_piece(state, player, rng.choice(options)["piece_index"], dice)
+                state.unsaved_moves.clear()
+            else:
+                game_state.skip_turn(state, player)
+        positions.append(position(state))
+    return state, positions
+
+
+def check(state: game_state.GameState, positions: List[tuple]) -> None:
+    without_snapshots = replay.initial_state(state)
+    without_snapshots.move_log = state.move_log
+    for k, expected in enumerate(positions):
+        for source in (state, without_snapshots):
+            actual = position(replay.replay(source, k))
+            if actual != expected:
+                raise SystemExit(f"Replay to event {k} does not match:\n  live:   {expected}\n  replay: {actual}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check and time move log replay")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    games = [play(rng, rng.randint(2, 4)) for _ in range(args.games)]
+    for state, positions in games:
+        check(state, positions)
+    events = sum(len(s.move_log) for s, _ in games)
+    snapshot_bytes = sum(len(s.move_snapshots) for s, _ in games)
+    print(f"{args.games} games replayed at every event: {events} events, "
+          f"{events / args.games:.0f} bytes of log + {snapshot_bytes / args.games:.0f} bytes of snapshots per game")
+
+    for label, seek in (("full replay", False), ("seek to end", True)):
+        started = time.perf_counter()
+        for state, _ in games:
+            if seek:
+                replay.replay(state)
+            else:
+                source = replay.initial_state(state)
+                source.move_log = state.move_log
+                replay.replay(source)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<12} {elapsed / args.games * 1e6:8.0f} us/game")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""Local multi-process check of game-affinity sharding (see app/sharding.py).
+
+Launches --workers shards and one spare as uvicorn processes, and the shard
+router in front of them, all against one database. Games of one human and
+three bots are played through the router for --duration seconds while the
+membership changes:
+
+    at 1/4  the spare shard is added (PUT /_router/shards)
+    at 1/2  the first shard is drained (removed from the ring), then stopped
+    at 3/4  the second shard is stopped without warning; the router's health
+            checks take it out of the ring
+
+The human seat plays over HTTP and a watcher per game follows its room over
+a WebSocket, reconnecting when the socket is closed because the game moved.
+At the end the processes are stopped and the check passes if no request
+failed (other than 502/503 while a stopped shard was still in the ring),
+every watcher saw its game's last version, the games' bot turns kept going
+after every move, and the database holds every acknowledged turn.
+
+Usage (from backend/):
+    python benchmarks/check_sharding.py
+    python benchmarks/check_sharding.py --workers 4 --games 24 --duration 20 --no-store
+    python benchmarks/check_sharding.py --database-url postgresql://...
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 502/503 answers a client retries while a stopped shard is still in the ring
+RETRIES = 50
+TOKEN_HEADER = "x-shard-token"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Stats:
+    def __init__(self):
+        self.errors: List[str] = []
+        self.games = 0
+        self.finished_games = 0
+        self.human_turns = 0
+        self.unavailable = 0
+        self.conflicts = 0
+        self.moved_sockets = 0
+        # Game id -> last version acknowledged by the API
+        self.versions: Dict[str, int] = {}
+
+
+class Watcher:
+    """Follows a game room, reconnecting when the socket is closed with 1013"""
+
+    def __init__(self, ws_url: str, stats: Stats):
+        self.ws_url = ws_url
+        self.stats = stats
+        self.version = 0
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, max_queue=None) as ws:
+                    async for raw in ws:
+                        message = json.loads(raw)
+                        if message.get("type") == "ping":
+                            await ws.send('{"type":"pong"}')
+                        elif message.get("type") == "game_delta":
+                            self.version = max(self.version, message["version"])
+                code = ws.close_code
+            except websockets.ConnectionClosed as e:
+                code = e.rcvd.code if e.rcvd else None
+            except (OSError, websockets.InvalidHandshake):
+                code = None
+            if code == 4410:
+                return
+            if code == 1013:
+                self.stats.moved_sockets += 1
+            await asyncio.sleep(0.05)
+
+
+class Player:
+    """The human seat of one game after another, until the deadline"""
+
+    def __init__(self, client: httpx.AsyncClient, base_url: str, stats: Stats, rng: random.Random):
+        self.client = client
+        self.ws_base = base_url.replace("http", "ws", 1)
+        self.stats = stats
+        self.rng = rng
+
+    async def call(self, method: str, path: str, **kwargs) -> Optional[dict]:
+        for _ in range(RETRIES):
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                self.stats.unavailable += 1
+                await asyncio.sleep(0.1)
+                continue
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code in (502, 503):
+                self.stats.unavailable += 1
+                await asyncio.sleep(0.1)
+                continue
+            if response.status_code == 409:
+                self.stats.conflicts += 1
+                return None
+            self.stats.errors.append(f"{method} {path}: {response.status_code} {response.text[:200]}")
+            return None
+        self.stats.errors.append(f"{method} {path}: still unavailable after {RETRIES} tries")
+        return None
+
+    def acknowledge(self, game_id: str, version: int) -> None:
+        self.stats.versions[game_id] = max(self.stats.versions.get(game_id, 0), version)
+
+    async def play(self, index: int, deadline: float) -> None:
+        while time.monotonic() < deadline and not self.stats.errors:
+            await self.play_game(f"h{index}", deadline)
+
+    async def play_game(self, name: str, deadline: float) -> None:
+        game = await self.call("POST", "/api/games", json={"player_name": name})
+        if game is None:
+            return
+        game_id, me = game["id"], game["players"][0]["id"]
+        self.stats.games += 1
+        watcher = Watcher(f"{self.ws_base}/ws/{game['code']}", self.stats)
+        try:
+            for _ in range(3):
+                if await self.call("POST", f"/api/games/{game_id}/bots", json={}) is None:
+                    return
+            game = await self.call("POST", f"/api/games/{game_id}/start")
+            if game is None:
+                return
+            self.acknowledge(game_id, game["version"])
+            stalled_since = time.monotonic()
+            while time.monotonic() < deadline:
+                game = await self.call("GET", f"/api/games/{game_id}")
+                if game is None:
+                    return
+                if game["version"] > self.stats.versions[game_id]:
+                    stalled_since = time.monotonic()
+                self.acknowledge(game_id, game["version"])
+                if game["status"] != "in_progress":
+                    self.stats.finished_games += 1
+                    return
+                if game["players"][game["current_player_index"]]["id"] != me:
+                    if time.monotonic() - stalled_since > 5:
+                        self.stats.errors.append(f"bot turns of game {game_id} stopped at version {game['version']}")
+                        return
+                    await asyncio.sleep(0.02)
+                    continue
+                await self.turn(game_id, me, game["version"])
+                stalled_since = time.monotonic()
+        finally:
+            await self.settle(game_id, watcher)
+
+    async def turn(self, game_id: str, me: str, version: int) -> None:
+        roll = await self.call("POST", "/api/games/roll-dice", json={
+            "game_id": game_id, "player_id": me, "expected_version": version, "auto_apply": True,
+        })
+        if roll is None:
+            return
+        self.stats.human_turns += 1
+        self.acknowledge(game_id, roll["version"])
+        if roll["value"] == 0 or roll["applied"] or not roll["valid_moves"]:
+            if not roll["valid_moves"] and roll["value"] and not roll["applied"]:
+                await self.call("POST", f"/api/games/{game_id}/skip-turn",
+                                json={"player_id": me, "expected_version": roll["version"]})
+            return
+        move = await self.call("POST", "/api/games/move", json={
+            "game_id": game_id, "player_id": me, "piece_index": self.rng.choice(roll["valid_moves"])["piece_index"],
+            "expected_version": roll["version"],
+        })
+        if move is not None:
+            self.acknowledge(game_id, roll["version"] + 1)
+
+    async def settle(self, game_id: str, watcher: Watcher) -> None:
+        """Check that the watcher caught up with the game, then stop it"""
+        final = await self.call("GET", f"/api/games/{game_id}")
+        if final is not None:
+            self.acknowledge(game_id, final["version"])
+            for _ in range(100):
+                if watcher.version >= final["version"] or watcher.task.done():
+                    break
+                await asyncio.sleep(0.05)
+            # A watcher that connected after the last change has seen no delta
+            if 0 < watcher.version < final["version"]:
+                self.stats.errors.append(f"watcher of game {game_id} stuck at version {watcher.version}"
+                                         f" of {final['version']}")
+        watcher.task.cancel()
+        await asyncio.gather(watcher.task, return_exceptions=True)
+
+
+async def change_membership(router_url: str, token: str, shards: List[str], workers: List[subprocess.Popen],
+                            duration: float, log: List[str]) -> None:
+    headers = {TOKEN_HEADER: token}
+    spare, first, second = shards[-1], shards[0], shards[1]
+    async with httpx.AsyncClient(base_url=router_url, headers=headers, timeout=30) as admin:
+        async def set_shards(members: List[str], what: str) -> None:
+            started = time.perf_counter()
+            response = await admin.put("/_router/shards", json={"shards": members})
+            response.raise_for_status()
+            log.append(f"{what}: ring of {len(response.json()['ring'])} in {time.perf_counter() - started:.2f} s")
+
+        await asyncio.sleep(duration / 4)
+        members = shards[:]
+        await set_shards(members, f"added {spare}")
+        await asyncio.sleep(duration / 4)
+        members.remove(first)
+        await set_shards(members, f"drained {first}")
+        workers[0].terminate()
+        await asyncio.sleep(duration / 4)
+        workers[1].terminate()
+        started = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.1)
+            ring = (await admin.get("/_router/shards")).json()["ring"]
+            if second not in ring:
+                break
+        log.append(f"stopped {second}: out of the ring after {time.perf_counter() - started:.2f} s")
+
+
+async def run(router_url: str, token: str, shards: List[str], workers: List[subprocess.Popen], args) -> Stats:
+    stats = Stats()
+    log: List[str] = []
+    deadline = time.monotonic() + args.duration
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(base_url=router_url, timeout=30) as client:
+        players = [Player(client, router_url, stats, random.Random(rng.random())) for _ in range(args.games)]
+        chaos = asyncio.create_task(change_membership(router_url, token, shards, workers, args.duration, log))
+        await asyncio.gather(*(player.play(i, deadline) for i, player in enumerate(players)))
+        await chaos
+        response = await client.get("/_router/shards", headers={TOKEN_HEADER: token})
+        ring = response.json()["ring"]
+        expected = sorted(shards[2:])
+        if ring != expected:
+            stats.errors.append(f"ring is {ring}, expected {expected}")
+        for shard in ring:
+            state = (await client.get(f"{shard}/internal/ring", headers={TOKEN_HEADER: token})).json()
+            if state["epoch"] != response.json()["epoch"]:
+                stats.errors.append(f"{shard} is on ring {state['epoch']}, the router on {response.json()['epoch']}")
+    for line in log:
+        print(f"  {line}")
+    return stats
+
+
+async def stored_versions(game_ids: List[str]) -> Dict[str, int]:
+    from sqlalchemy import select
+
+    from app.database import AsyncSessionLocal
+    from app.models import Game
+
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(Game.id, Game.version))
+        return {str(game_id): version for game_id, version in rows.all() if str(game_id) in game_ids}
+
+
+async def create_tables() -> None:
+    from app.database import Base, async_engine
+    from app import models  # noqa: F401
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check sharded play while shards join, drain and fail")
+    parser.add_argument("--workers", type=int, default=3, help="Shards at the start; one more is added")
+    parser.add_argument("--games", type=int, default=12, help="Games played at once")
+    parser.add_argument("--duration", type=float, default=12.0, help="Seconds of play")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", type=str, default=None, help="Default: temporary SQLite")
+    parser.add_argument("--no-store", dest="store", action="store_false", help="Disable the in-memory game store")
+    args = parser.parse_args(argv)
+    if args.workers < 2:
+        parser.error("--workers must be at least 2")
+
+    workdir = Path(tempfile.mkdtemp())
+    token = secrets.token_hex(8)
+    os.environ.update({
+        "DATABASE_URL": args.database_url or f"sqlite:///{workdir}/sharding.db",
+        "GAME_STORE_ENABLED": "true" if args.store else "false",
+        "DB_CREATE_ALL": "false",
+        "REAPER_ENABLED": "false",
+        "BOT_TURN_DELAY": "0.01",
+        "SHARD_TOKEN": token,
+        "SHARD_HEALTH_INTERVAL": "0.25",
+        "SHARD_HEALTH_FAILURES": "2",
+    })
+    asyncio.run(create_tables())
+    from app.shard_router import start_worker, wait_for
+
+    ports = [free_port() for _ in range(args.workers + 1)]
+    shards = [f"http://127.0.0.1:{port}" for port in ports]
+    workers = [start_worker(port) for port in ports]
+    router_port = free_port()
+    router_url = f"http://127.0.0.1:{router_port}"
+    router_log = workdir / "router.log"
+    router = None
+    try:
+        for url in shards:
+            wait_for(url)
+        with open(router_log, "w") as log:
+            router = subprocess.Popen(
+                [sys.executable, "-m", "app.shard_router", "--shards", ",".join(shards[:-1]),
+                 "--port", str(router_port)],
+                cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT,
+            )
+        wait_for(router_url)
+        print(f"{args.workers} shards + 1 spare behind the router, {args.games} games for {args.duration:.0f} s"
+              f" ({'game store' if args.store else 'no game store'})")
+        started = time.perf_counter()
+        stats = asyncio.run(run(router_url, token, shards, workers, args))
+        elapsed = time.perf_counter() - started
+    finally:
+        for process in [router, *workers]:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for process in [router, *workers]:
+            if process is not None:
+                process.wait()
+
+    stored = asyncio.run(stored_versions(list(stats.versions)))
+    for game_id, version in stats.versions.items():
+        if stored.get(game_id, -1) < version:
+            stats.errors.append(f"game {game_id} stored at version {stored.get(game_id)}, acknowledged {version}")
+
+    print(f"  {stats.games} games ({stats.finished_games} finished), {stats.human_turns} human turns"
+          f" in {elapsed:.1f} s")
+    print(f"  {stats.moved_sockets} sockets closed for a moved game and reconnected,"
+          f" {stats.unavailable} requests retried on 502/503, {stats.conflicts} version conflicts")
+    for error in stats.errors[:20]:
+        print(f"  ERROR {error}")
+    if stats.errors:
+        print(f"  {len(stats.errors)} errors; router log: {router_log}")
+        return 1
+    print("  OK: every acknowledged turn is stored and every watcher caught up")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
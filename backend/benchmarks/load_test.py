@@ -0,0 +1,431 @@
+"""End-to-end load test for the game loop.
+
+Simulates N concurrent games over real HTTP and WebSocket connections:
+every game is created, joined and started, then played for a number of
+turns (roll-dice, then move or skip-turn; with --auto-apply forced turns
+finish in the roll request). With --commands the turn actions are sent as
+commands over the first player's WebSocket instead of HTTP requests, as bots
+do. With --matchmaking the games*players players queue on the matchmaker
+instead and wait for their game on /ws/matchmaking/{ticket}; it forms
+4-seat games at once and smaller ones from the remainder after its wait
+windows, so --players is not used. Every player holds a WebSocket
+listener, and the driver waits for each state change to arrive as a delta
+before acting on it, so delta delivery is measured alongside HTTP latency.
+
+By default the app is served by uvicorn in a background thread against a
+throwaway SQLite database, which also lets the harness count the SQL
+statements issued per turn. Point --database-url at a local Postgres for
+realistic numbers, or --url at an already running server (statement counts
+are then unavailable).
+
+Usage (from backend/):
+    python benchmarks/load_test.py --games 50 --players 4 --turns 100 --output results.json
+    python benchmarks/load_test.py --database-url postgresql://... --store
+    python benchmarks/load_test.py --compare baseline.json --output results.json
+    python benchmarks/load_test.py --commands --auto-apply
+    python benchmarks/load_test.py --matchmaking --games 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.requests = 0
+        self.turns = 0
+        self.deltas_received = 0
+        self.finished_games = 0
+
+    def record(self, name: str, seconds: float) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+
+    def error(self, name: str) -> None:
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            out[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "mean_ms": 1000 * sum(values) / len(values),
+                "p50_ms": 1000 * percentile(values, 50),
+                "p95_ms": 1000 * percentile(values, 95),
+                "p99_ms": 1000 * percentile(values, 99),
+                "max_ms": 1000 * values[-1],
+            }
+        for name, count in self.errors.items():
+            out.setdefault(name, {"count": 0, "errors": count})
+        return out
+
+
+class Listener:
+    """WebSocket client tracking the game's version and current player from deltas"""
+
+    def __init__(self, ws_url: str, stats: Stats, track: bool):
+        self.ws_url = ws_url
+        self.stats = stats
+        self.track = track
+        self.version = 0
+        self.current_player_index = 0
+        self.status = "waiting"
+        self.changed = asyncio.Event()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.ws = None
+        # Command id -> future of its command_result
+        self.commands: Dict[int, asyncio.Future] = {}
+        self.next_command = 0
+
+    async def run(self) -> None:
+        async with websockets.connect(self.ws_url, max_queue=None) as ws:
+            self.ws = ws
+            self.ready.set()
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "ping":
+                    await ws.send('{"type":"pong"}')
+                    continue
+                if message.get("type") == "command_result":
+                    future = self.commands.pop(message["id"], None)
+                    if future is not None and not future.done():
+                        future.set_result(message)
+                    continue
+                self.stats.deltas_received += 1
+                if not self.track or message.get("type") != "game_delta":
+                    continue
+                if message["version"] > self.version:
+                    self.version = message["version"]
+                    changes = message["changes"]
+                    self.current_player_index = changes.get("current_player_index", self.current_player_index)
+                    self.status = changes.get("status", self.status)
+                    self.changed.set()
+
+    async def command(self, action: str, body: dict, timeout: float) -> dict:
+        """Send a turn command over the socket and wait for its result"""
+        self.next_command += 1
+        future = self.commands[self.next_command] = asyncio.get_running_loop().create_future()
+        await self.ws.send(json.dumps({"type": "command", "id": self.next_command, "action": action, **body}))
+        return await asyncio.wait_for(future, timeout)
+
+    async def wait_for(self, version: int, timeout: float) -> None:
+        deadline = time.perf_counter() + timeout
+        while self.version < version:
+            self.changed.clear()
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"delta for version {version} not received")
+            await asyncio.wait_for(self.changed.wait(), remaining)
+
+
+class GameDriver:
+    def __init__(self, client: httpx.AsyncClient, base_url: str, stats: Stats, args, rng: random.Random):
+        self.client = client
+        self.ws_base = base_url.replace("http", "ws", 1)
+        self.stats = stats
+        self.args = args
+        self.rng = rng
+
+    async def call(self, name: str, method: str, path: str, **kwargs) -> Optional[dict]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.stats.error(name)
+            return None
+        self.stats.requests += 1
+        if response.status_code != 200:
+            self.stats.error(name)
+            return None
+        self.stats.record(name, time.perf_counter() - started)
+        return response.json()
+
+    async def act(self, name: str, tracker: Listener, action: str, path: str, body: dict) -> Optional[dict]:
+        """A turn action, as an HTTP request or (--commands) a WebSocket command"""
+        if not self.args.commands:
+            return await self.call(name, "POST", path, json=body)
+        started = time.perf_counter()
+        try:
+            result = await tracker.command(action, body, self.args.timeout)
+        except (asyncio.TimeoutError, websockets.WebSocketException):
+            self.stats.error(name)
+            return None
+        self.stats.requests += 1
+        if not result["ok"]:
+            self.stats.error(name)
+            return None
+        self.stats.record(name, time.perf_counter() - started)
+        return result.get(action) or result
+
+    async def play(self, index: int) -> None:
+        args = self.args
+        game = await self.call("create_game", "POST", "/api/games", json={"player_name": f"g{index}-p0"})
+        if game is None:
+            return
+        code = game["code"]
+        for seat in range(1, args.players):
+            game = await self.call("join_game", "POST", "/api/games/join",
+                                   json={"code": code, "player_name": f"g{index}-p{seat}"})
+            if game is None:
+                return
+        await self.play_game(game, start=True)
+
+    async def play_matched(self, index: int) -> None:
+        """One matchmaking player; the player seated first plays the game for everyone"""
+        started = time.perf_counter()
+        ticket = await self.call("matchmaking", "POST", "/api/matchmaking", json={"player_name": f"m{index}"})
+        if ticket is None:
+            return
+        try:
+            async with websockets.connect(f"{self.ws_base}/ws/matchmaking/{ticket['ticket_id']}") as ws:
+                message = json.loads(await asyncio.wait_for(ws.recv(), self.args.timeout))
+        except (asyncio.TimeoutError, websockets.WebSocketException):
+            self.stats.error("match_found")
+            return
+        if message["type"] != "match_found":
+            self.stats.error("match_found")
+            return
+        self.stats.record("match_found", time.perf_counter() - started)
+        game = message["game"]
+        if message["player_id"] == game["players"][0]["id"]:
+            await self.play_game(game, start=False)
+
+    async def play_game(self, game: dict, start: bool) -> None:
+        args = self.args
+        players = [p["id"] for p in game["players"]]
+        listeners = [Listener(f"{self.ws_base}/ws/{game['code']}", self.stats, track=seat == 0)
+                     for seat in range(len(players))]
+        for listener in listeners:
+            listener.task = asyncio.create_task(listener.run())
+        try:
+            await asyncio.wait_for(asyncio.gather(*(l.ready.wait() for l in listeners)), args.timeout)
+            tracker = listeners[0]
+            tracker.version = game["version"]
+            tracker.status = game["status"]
+
+            if start:
+                started = time.perf_counter()
+                if await self.call("start_game", "POST", f"/api/games/{game['id']}/start") is None:
+                    return
+                await self.timed_wait(tracker, game["version"] + 1, started)
+
+            for _ in range(args.turns):
+                if tracker.status == "finished":
+                    self.stats.finished_games += 1
+                    break
+                await self.turn(game["id"], players, tracker)
+                self.stats.turns += 1
+        except (TimeoutError, asyncio.TimeoutError):
+            self.stats.error("ws_delta")
+        finally:
+            for listener in listeners:
+                listener.task.cancel()
+            await asyncio.gather(*(l.task for l in listeners), return_exceptions=True)
+
+    async def turn(self, game_id: str, players: List[str], tracker: Listener) -> None:
+        player_id = players[tracker.current_player_index]
+        version = tracker.version
+        started = time.perf_counter()
+        roll = await self.act("roll_dice", tracker, "roll", "/api/games/roll-dice", {
+            "game_id": game_id, "player_id": player_id, "expected_version": version,
+            "auto_apply": self.args.auto_apply,
+        })
+        if roll is None:
+            return
+        if roll["value"] == 0 or roll["applied"]:
+            # Penalty or forced turn: the server finished the turn itself
+            await self.timed_wait(tracker, roll["version"], started)
+            return
+        # The roll itself is a state change
+        version = roll["version"]
+        if roll["valid_moves"]:
+            move = self.rng.choice(roll["valid_moves"])
+            started = time.perf_counter()
+            result = await self.act("make_move", tracker, "move", "/api/games/move", {
+                "game_id": game_id, "player_id": player_id, "piece_index": move["piece_index"],
+                "expected_version": version,
+            })
+        else:
+            started = time.perf_counter()
+            result = await self.act("skip_turn", tracker, "skip", f"/api/games/{game_id}/skip-turn",
+                                    {"player_id": player_id, "expected_version": version})
+        if result is not None:
+            await self.timed_wait(tracker, version + 1, started)
+
+    async def timed_wait(self, tracker: Listener, version: int, started: float) -> None:
+        """Wait for the delta of a state change; records request start to delta arrival"""
+        await tracker.wait_for(version, self.args.timeout)
+        self.stats.record("ws_delta", time.perf_counter() - started)
+
+
+async def run_load(base_url: str, args) -> Stats:
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        rng = random.Random(args.seed)
+        if args.matchmaking:
+            drivers = [GameDriver(client, base_url, stats, args, random.Random(rng.random()))
+                       for _ in range(args.games * args.players)]
+            await asyncio.gather(*(driver.play_matched(i) for i, driver in enumerate(drivers)))
+        else:
+            drivers = [GameDriver(client, base_url, stats, args, random.Random(rng.random())) for _ in range(args.games)]
+            await asyncio.gather(*(driver.play(i) for i, driver in enumerate(drivers)))
+    return stats
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """Runs the app with uvicorn in a background thread with its own event loop"""
+
+    def __init__(self):
+        import uvicorn
+        from app.main import app
+
+        self.port = free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("uvicorn failed to start")
+            time.sleep(0.05)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, baseline: Optional[dict]) -> None:
+    params = report["params"]
+    print(f"{params['games']} games x {params['players']} players x {params['turns']} turns "
+          f"in {report['elapsed_seconds']:.2f} s ({report['database']})")
+    print(f"\n{'endpoint':<14} {'count':>7} {'err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, row in report["endpoints"].items():
+        line = (f"{name:<14} {row['count']:>7} {row['errors']:>5} "
+                f"{row.get('p50_ms', 0):>8.2f} {row.get('p95_ms', 0):>8.2f} {row.get('p99_ms', 0):>8.2f}")
+        base = (baseline or {}).get("endpoints", {}).get(name)
+        if base and base.get("p95_ms"):
+            line += f"   p95 {100 * (row.get('p95_ms', 0) / base['p95_ms'] - 1):+.1f}%"
+        print(line)
+    print(f"\nRequests/s: {report['requests_per_second']:,.1f}   Turns/s: {report['turns_per_second']:,.1f}")
+    if report["db_statements_per_turn"] is not None:
+        print(f"DB statements per turn: {report['db_statements_per_turn']:.2f}")
+    print(f"WebSocket messages received: {report['ws_messages_received']}")
+    if baseline:
+        print(f"\nBaseline {baseline.get('commit')}: {baseline['requests_per_second']:,.1f} requests/s "
+              f"({100 * (report['requests_per_second'] / baseline['requests_per_second'] - 1):+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent end-to-end game load test")
+    parser.add_argument("--games", type=int, default=20, help="Concurrent games")
+    parser.add_argument("--players", type=int, default=4, choices=[2, 3, 4])
+    parser.add_argument("--turns", type=int, default=50, help="Turns played per game")
+    parser.add_argument("--connections", type=int, default=100, help="HTTP connection pool size")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds per request or awaited delta")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", type=str, default=None, help="Target an already running server")
+    parser.add_argument("--database-url", type=str, default=None,
+                        help="Database for the in-process server (default: temporary SQLite)")
+    parser.add_argument("--store", action="store_true", help="Enable the in-memory game store")
+    parser.add_argument("--auto-apply", action="store_true", help="Let the server play forced turns on roll")
+    parser.add_argument("--commands", action="store_true", help="Send turn actions as WebSocket commands")
+    parser.add_argument("--matchmaking", action="store_true", help="Seat the players through the matchmaker")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON report to this file")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    counter = None
+    if args.url:
+        base_url, database = args.url.rstrip("/"), "external server"
+        started = time.perf_counter()
+        stats = asyncio.run(run_load(base_url, args))
+        elapsed = time.perf_counter() - started
+    else:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/load_test.db"
+        os.environ["GAME_STORE_ENABLED"] = "true" if args.store else "false"
+        from app import queries
+        from app.database import async_engine
+
+        database = async_engine.dialect.name + (" + game store" if args.store else "")
+        with LocalServer() as base_url, queries.count_statements(async_engine) as counter:
+            started = time.perf_counter()
+            stats = asyncio.run(run_load(base_url, args))
+            elapsed = time.perf_counter() - started
+            statements = counter.count
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": database,
+        "params": {k: getattr(args, k) for k in ("games", "players", "turns", "connections", "seed", "store", "auto_apply", "commands", "matchmaking")},
+        "elapsed_seconds": elapsed,
+        "requests": stats.requests,
+        "requests_per_second": stats.requests / elapsed if elapsed else 0.0,
+        "turns": stats.turns,
+        "turns_per_second": stats.turns / elapsed if elapsed else 0.0,
+        "finished_games": stats.finished_games,
+        # Covers the whole run, so setup statements are spread over the turns
+        "db_statements_per_turn": statements / stats.turns if counter is not None and stats.turns else None,
+        "ws_messages_received": stats.deltas_received,
+        "endpoints": stats.summary(),
+    }
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nReport written to {args.output}")
+    return 1 if any(row["errors"] for row in report["endpoints"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
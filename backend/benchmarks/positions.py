@@ -0,0 +1,96 @@
+"""Generated board positions for game_logic benchmarks and equivalence checks.
+
+A Position is everything the rule functions take as input for one decision:
+the moving color, its pieces, the opponents' pieces and a dice value.
+Scenarios cover the shapes the rules branch on:
+
+    empty     every piece at home, only a 6 does anything
+    crowded   four players with most pieces on the track, many stacks
+    finish    pieces in or entering the finish area, where stacking is forbidden
+    random    anything goes, including mixed home/track/finish positions
+"""
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from app.game_logic import BOARD_SIZE, MAX_POSITION
+from app.models import PlayerColor
+
+COLORS = [PlayerColor.RED, PlayerColor.BLUE, PlayerColor.GREEN, PlayerColor.YELLOW]
+
+
+@dataclass
+class Position:
+    color: PlayerColor
+    pieces: List[int]
+    opponents: Dict[PlayerColor, List[int]]
+    dice: int
+    target: int  # Relative landing square used for capture checks
+
+    def players(self) -> dict:
+        """All pieces in the {player_id: (color, pieces)} shape check_capture takes"""
+        players = {f"player-{self.color.value}": (self.color, self.pieces)}
+        players.update({f"player-{c.value}": (c, p) for c, p in self.opponents.items()})
+        return players
+
+
+def _opponent_colors(rng: random.Random, color: PlayerColor, seats: int) -> List[PlayerColor]:
+    others = [c for c in COLORS if c != color]
+    return rng.sample(others, seats - 1)
+
+
+def empty(rng: random.Random) -> Position:
+    color = rng.choice(COLORS)
+    opponents = {c: [-1, -1, -1, -1] for c in _opponent_colors(rng, color, rng.randint(2, 4))}
+    return Position(color, [-1, -1, -1, -1], opponents, rng.randint(1, 6), rng.randrange(BOARD_SIZE))
+
+
+def crowded(rng: random.Random) -> Position:
+    color = rng.choice(COLORS)
+    # A handful of hot squares so that pieces pile up into stacks
+    hot = rng.sample(range(BOARD_SIZE), 5)
+
+    def pieces() -> List[int]:
+        return [rng.choice(hot) if rng.random() < 0.7 else rng.randrange(-1, BOARD_SIZE) for _ in range(4)]
+
+    opponents = {c: pieces() for c in _opponent_colors(rng, color, 4)}
+    own = pieces()
+    dice = rng.randint(1, 6)
+    on_board = [p for p in own if 0 <= p < BOARD_SIZE]
+    target = (rng.choice(on_board) + dice) % BOARD_SIZE if on_board else rng.choice(hot)
+    return Position(color, own, opponents, dice, target)
+
+
+def finish(rng: random.Random) -> Position:
+    color = rng.choice(COLORS)
+
+    def pieces() -> List[int]:
+        return [rng.choice([rng.randrange(BOARD_SIZE - 6, BOARD_SIZE), rng.randrange(BOARD_SIZE, MAX_POSITION + 1)])
+                for _ in range(4)]
+
+    opponents = {c: pieces() for c in _opponent_colors(rng, color, rng.randint(2, 4))}
+    return Position(color, pieces(), opponents, rng.randint(1, 6), rng.randrange(BOARD_SIZE - 6, MAX_POSITION + 1))
+
+
+def mixed(rng: random.Random) -> Position:
+    color = rng.choice(COLORS)
+
+    def pieces() -> List[int]:
+        return [rng.randrange(-1, MAX_POSITION + 1) for _ in range(4)]
+
+    opponents = {c: pieces() for c in _opponent_colors(rng, color, rng.randint(2, 4))}
+    return Position(color, pieces(), opponents, rng.randint(1, 6), rng.randrange(-1, MAX_POSITION + 1))
+
+
+SCENARIOS: Dict[str, Callable[[random.Random], Position]] = {
+    "empty": empty,
+    "crowded": crowded,
+    "finish": finish,
+    "random": mixed,
+}
+
+
+def generate(scenario: str, count: int, seed: int = 0) -> List[Position]:
+    rng = random.Random(f"{scenario}:{seed}")
+    make = SCENARIOS[scenario]
+    return [make(rng) for _ in range(count)]
@@ -0,0 +1,190 @@
+"""Measure the hot lookup queries with and without the migration 0003 indexes.
+
+Fills a scratch database with finished-looking games (players and move
+rows), then times the three hot lookups, first without and then with the
+composite indexes:
+
+  game_by_code     a game with its players by join code (join, get by code)
+  players_by_game  a game's players in seat order
+  moves_by_game    a game's moves in play order (history, exports)
+
+The query plan of each lookup is printed for both runs. On PostgreSQL the
+pieces column is also timed as JSON and as a smallint array (PIECES_STORAGE).
+
+Usage (from backend/):
+    python benchmarks/schema_bench.py                          # throwaway sqlite database
+    python benchmarks/schema_bench.py --database-url postgresql://... --games 20000
+
+The target database must be empty or disposable: the tables are dropped and
+recreated, and left filled afterwards for inspection.
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+parser = argparse.ArgumentParser(description="Benchmark hot lookups with and without indexes")
+parser.add_argument("--games", type=int, default=5000)
+parser.add_argument("--moves-per-game", type=int, default=80)
+parser.add_argument("--lookups", type=int, default=500, help="Timed lookups per query")
+parser.add_argument("--database-url", type=str, default=None)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/schema_bench.db"
+
+from sqlalchemy import JSON, Column, Integer, MetaData, SmallInteger, String, Table, bindparam, text  # noqa: E402
+from sqlalchemy.dialects.postgresql import ARRAY, UUID  # noqa: E402
+
+from app.database import Base, engine  # noqa: E402
+from app.models import Game, GameStatus, Move, Player, PlayerColor  # noqa: E402
+
+COLORS = list(PlayerColor)
+INDEXES = [idx for table in (Player.__table__, Move.__table__) for idx in table.indexes]
+
+QUERIES = {
+    "game_by_code": (
+        'SELECT games.id, players.id, players.pieces FROM games '
+        'LEFT OUTER JOIN players ON games.id = players.game_id '
+        'WHERE games.code = :code ORDER BY players."order"'
+    ),
+    "players_by_game": 'SELECT id, pieces FROM players WHERE game_id = :game_id ORDER BY "order"',
+    "moves_by_game": 'SELECT piece_index, to_position FROM moves WHERE game_id = :game_id ORDER BY created_at',
+}
+
+
+def fill(rng: random.Random) -> list:
+    """Insert the games in batches; returns (id, code) of every game"""
+    games = []
+    started = datetime(2024, 1, 1)
+    codes = set()
+    with engine.begin() as conn:
+        for batch_start in range(0, args.games, 500):
+            game_rows, player_rows, move_rows = [], [], []
+            for _ in range(batch_start, min(batch_start + 500, args.games)):
+                game_id = uuid.uuid4()
+                code = "".join(rng.choices(string.ascii_uppercase + string.digits, k=6))
+                while code in codes:
+                    code = "".join(rng.choices(string.ascii_uppercase + string.digits, k=6))
+                codes.add(code)
+                games.append((game_id, code))
+                game_rows.append({"id": game_id, "code": code, "status": GameStatus.FINISHED,
+                                  "current_player_index": 0, "version": args.moves_per_game,
+                                  "move_log": b"", "move_snapshots": b""})
+                seats = rng.randint(2, 4)
+                player_ids = [uuid.uuid4() for _ in range(seats)]
+                # Insert players in reverse seat order so the ORDER BY has work to do
+                for seat in reversed(range(seats)):
+                    player_rows.append({"id": player_ids[seat], "game_id": game_id, "name": f"p{seat}",
+                                        "color": COLORS[seat], "order": seat,
+                                        "pieces": [rng.randint(-1, 45) for _ in range(4)]})
+                for n in range(args.moves_per_game):
+                    move_rows.append({"id": uuid.uuid4(), "game_id": game_id, "player_id": player_ids[n % seats],
+                                      "dice_value": rng.randint(1, 6), "piece_index": rng.randint(0, 3),
+                                      "from_position": 0, "to_position": 0,
+                                      "created_at": started + timedelta(seconds=rng.random() * 1e7)})
+            conn.execute(Game.__table__.insert(), game_rows)
+            conn.execute(Player.__table__.insert(), player_rows)
+            conn.execute(Move.__table__.insert(), move_rows)
+    return games
+
+
+def statement(sql: str):
+    """text() with typed binds, so UUIDs are sent the way the ORM sends them"""
+    if ":code" in sql:
+        return text(sql).bindparams(bindparam("code", type_=String))
+    return text(sql).bindparams(bindparam("game_id", type_=UUID(as_uuid=True)))
+
+
+def explain(conn, sql: str, params: dict) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    rows = conn.execute(statement(prefix + sql), params).fetchall()
+    return "\n".join("    " + str(row[-1]) for row in rows)
+
+
+def time_queries(games: list, rng: random.Random, label: str) -> dict:
+    sample = [rng.choice(games) for _ in range(args.lookups)]
+    results = {}
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE"))
+        for name, sql in QUERIES.items():
+            params = [{"code": code} if "code" in sql else {"game_id": game_id} for game_id, code in sample]
+            print(f"  {name} plan ({label}):\n{explain(conn, sql, params[0])}")
+            query = statement(sql)
+            timings = []
+            for p in params:
+                started = time.perf_counter()
+                conn.execute(query, p).fetchall()
+                timings.append(time.perf_counter() - started)
+            results[name] = timings
+    return results
+
+
+def bench_pieces(games: list, rng: random.Random) -> None:
+    """Round trip of a game's pieces as JSON and as smallint[] (PostgreSQL only)"""
+    metadata = MetaData()
+    tables = {
+        "json": Table("bench_pieces_json", metadata, Column("id", UUID(as_uuid=True), primary_key=True),
+                      Column("seat", Integer), Column("pieces", JSON)),
+        "array": Table("bench_pieces_array", metadata, Column("id", UUID(as_uuid=True), primary_key=True),
+                       Column("seat", Integer), Column("pieces", ARRAY(SmallInteger))),
+    }
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    rows = [{"id": uuid.uuid4(), "seat": s, "pieces": [rng.randint(-1, 45) for _ in range(4)]}
+            for s in range(4) for _ in range(min(len(games), 5000))]
+    print("\npieces storage (update + read of one player, median us):")
+    with engine.begin() as conn:
+        for kind, table in tables.items():
+            conn.execute(table.insert(), rows)
+            timings = []
+            for row in rng.sample(rows, min(len(rows), args.lookups)):
+                started = time.perf_counter()
+                conn.execute(table.update().where(table.c.id == row["id"]).values(pieces=[0, 1, 2, 3]))
+                conn.execute(table.select().where(table.c.id == row["id"])).fetchall()
+                timings.append(time.perf_counter() - started)
+            size = conn.execute(text(f"SELECT pg_total_relation_size('{table.name}')")).scalar()
+            print(f"  {kind:<6} {statistics.median(timings) * 1e6:8.0f}   table size {size / 1024:,.0f} KiB")
+    metadata.drop_all(engine)
+
+
+def main() -> int:
+    rng = random.Random(args.seed)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    for index in INDEXES:
+        index.drop(engine)
+
+    print(f"{engine.dialect.name}: {args.games} games, {args.moves_per_game} moves each")
+    games = fill(rng)
+    without = time_queries(games, random.Random(args.seed), "no indexes")
+    for index in INDEXES:
+        index.create(engine)
+    with_indexes = time_queries(games, random.Random(args.seed), "indexed")
+
+    print(f"\n{'lookup':<16} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10}  (us)")
+    for name in QUERIES:
+        before, after = without[name], with_indexes[name]
+        p95 = lambda t: statistics.quantiles(t, n=20)[-1] * 1e6  # noqa: E731
+        print(f"{name:<16} {statistics.median(before) * 1e6:11.0f} {statistics.median(after) * 1e6:10.0f} "
+              f"{p95(before):11.0f} {p95(after):10.0f}")
+
+    if engine.dialect.name == "postgresql":
+        bench_pieces(games, rng)
+    else:
+        print("\npieces storage comparison skipped: smallint arrays need PostgreSQL")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
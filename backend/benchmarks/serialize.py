@@ -0,0 +1,129 @@
+"""Check and time the fast serialization path (see app/serialization.py).
+
+Plays seeded random 4-player games through the turn actions of main.py and
+samples game snapshots, both as GameStates and as ORM Games, and roll and
+move responses. Checks that every snapshot renders byte-for-byte like
+GameResponse.model_dump_json(), then times it against that, and times the
+responses as FastJSONResponse renders them against FastAPI's default path
+(response_model validation, JSON-mode dump, json.dumps).
+
+Usage (from backend/):
+    python benchmarks/serialize.py
+    python benchmarks/serialize.py --games 50
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from app import game_logic, serialization  # noqa: E402
+from app.game_state import GameState  # noqa: E402
+from app.main import move_action, roll_action  # noqa: E402
+from app.models import Game, GameStatus, Player  # noqa: E402
+from app.schemas import DiceRollResponse, GameResponse, MoveResponse  # noqa: E402
+from app.tournament import new_game  # noqa: E402
+
+
+def to_model(state: GameState) -> Game:
+    return Game(
+        id=state.id, code=state.code, status=state.status, current_player_index=state.current_player_index,
+        version=state.version, winner_id=state.winner_id, pending_roll=state.pending_roll,
+        created_at=state.created_at,
+        players=[
+            Player(id=p.id, name=p.name, color=p.color, pieces=list(p.pieces), order=p.order,
+                   is_connected=p.is_connected, is_bot=p.is_bot)
+            for p in state.players
+        ],
+    )
+
+
+def play(rng: random.Random, samples: Dict[str, list], max_turns: int = 400) -> None:
+    state = new_game(4)
+    state.id = uuid.uuid4()
+    state.code = "ABC123"
+    state.created_at = datetime.utcnow()
+    for player in state.players:
+        player.id = uuid.uuid4()
+    for _ in range(max_turns):
+        if state.status != GameStatus.IN_PROGRESS:
+            break
+        player = state.current_player
+        roll, _ = roll_action(state, player.id, auto_apply=True)
+        samples["roll response"].append(roll)
+        if roll.valid_moves and not roll.applied:
+            move, _ = move_action(state, player.id, rng.choice(roll.valid_moves)["piece_index"])
+            samples["move response"].append(move)
+        if rng.random() < 0.2:
+            snapshot = GameState.from_model(to_model(state))
+            samples["snapshot (GameState)"].append(snapshot)
+            samples["snapshot (ORM Game)"].append(to_model(snapshot))
+        state.unsaved_moves.clear()
+
+
+def fastapi_default(model: type) -> Callable:
+    """What FastAPI does with a returned value and a response_model"""
+    adapter = TypeAdapter(model)
+
+    def render(content):
+        document = adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json")
+        return json.dumps(document, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+    return render
+
+
+def timed(fn: Callable, items: list) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check and time the fast serialization path")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    game_logic.roll_dice = lambda: rng.randint(1, 6)
+    samples: Dict[str, List] = {
+        "snapshot (GameState)": [], "snapshot (ORM Game)": [], "roll response": [], "move response": [],
+    }
+    for _ in range(args.games):
+        play(rng, samples)
+
+    def model_dump_json(game):
+        return GameResponse.model_validate(game).model_dump_json().encode()
+
+    for kind in ("snapshot (GameState)", "snapshot (ORM Game)"):
+        for game in samples[kind]:
+            if serialization.serialize_game(game) != model_dump_json(game):
+                raise SystemExit(f"{kind} differs:\n  {serialization.serialize_game(game)}\n  {model_dump_json(game)}")
+    print(f"{len(samples['snapshot (ORM Game)']) * 2} snapshots render like GameResponse.model_dump_json()"
+          f" ({'orjson' if serialization.orjson else 'json'})\n")
+
+    paths = {
+        "snapshot (GameState)": (model_dump_json, serialization.serialize_game),
+        "snapshot (ORM Game)": (model_dump_json, serialization.serialize_game),
+        "roll response": (fastapi_default(DiceRollResponse), serialization.render),
+        "move response": (fastapi_default(MoveResponse), serialization.render),
+    }
+    print(f"{'payload':<22} {'count':>6} {'before us':>10} {'after us':>9} {'speedup':>8}")
+    for kind, (before, after) in paths.items():
+        items = samples[kind]
+        before_us, after_us = timed(before, items), timed(after, items)
+        print(f"{kind:<22} {len(items):6d} {before_us:10.1f} {after_us:9.1f} {before_us / after_us:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
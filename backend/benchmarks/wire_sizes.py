@@ -0,0 +1,101 @@
+"""Compare JSON and compact MessagePack payloads (see app/wire.py).
+
+Plays seeded random 4-player games through the turn actions of main.py,
+collecting the game snapshot and the deltas and responses clients receive,
+then reports the mean size of each kind in both formats and the time to
+encode it.
+
+Usage (from backend/):
+    python benchmarks/wire_sizes.py
+    python benchmarks/wire_sizes.py --games 50 --seats 2
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import game_logic, wire  # noqa: E402
+from app.main import move_action, roll_action, skip_action  # noqa: E402
+from app.models import GameStatus  # noqa: E402
+from app.pubsub import encode  # noqa: E402
+from app.schemas import GameResponse  # noqa: E402
+from app.tournament import new_game  # noqa: E402
+
+
+def play(rng: random.Random, seats: int, samples: Dict[str, List[dict]], max_turns: int = 400) -> None:
+    state = new_game(seats)
+    state.id = uuid.uuid4()
+    state.code = "ABC123"
+    state.created_at = datetime.utcnow()
+    for player in state.players:
+        player.id = uuid.uuid4()
+    for _ in range(max_turns):
+        if state.status != GameStatus.IN_PROGRESS:
+            break
+        player = state.current_player
+        roll, deltas = roll_action(state, player.id)
+        samples["roll response"].append(roll.model_dump(mode="json"))
+        if roll.valid_moves:
+            move, more = move_action(state, player.id, rng.choice(roll.valid_moves)["piece_index"])
+            samples["move response"].append(move.model_dump(mode="json"))
+            deltas += more
+        elif roll.value:
+            deltas += skip_action(state, player.id)
+        for delta in deltas:
+            samples.setdefault(f"{delta['event']} delta", []).append(delta)
+        if rng.random() < 0.1:
+            samples["game snapshot"].append(GameResponse.model_validate(state).model_dump(mode="json"))
+        state.unsaved_moves.clear()
+    samples["seats"].append(wire.seat_map(state.players))
+
+
+def timed(fn, documents: List[dict]) -> float:
+    started = time.perf_counter()
+    for document in documents:
+        fn(document)
+    return (time.perf_counter() - started) / len(documents) * 1e6
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare JSON and MessagePack payload sizes")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--seats", type=int, default=4, choices=[2, 3, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if not wire.available():
+        raise SystemExit("Needs the msgpack extra: poetry install -E msgpack")
+
+    rng = random.Random(args.seed)
+    game_logic.roll_dice = lambda: rng.randint(1, 6)
+    samples: Dict[str, List] = {
+        "game snapshot": [], "roll response": [], "move response": [],
+        "dice_rolled delta": [], "piece_moved delta": [], "turn_skipped delta": [], "seats": [],
+    }
+    for _ in range(args.games):
+        play(rng, args.seats, samples)
+    seats = {}
+    for game_seats in samples.pop("seats"):
+        seats.update(game_seats)
+
+    print(f"{'payload':<28} {'count':>6} {'json B':>8} {'msgpack B':>10} {'saved':>6} {'json us':>8} {'msgpack us':>11}")
+    for kind, documents in samples.items():
+        if not documents:
+            continue
+        json_size = statistics.mean(len(encode(d).encode()) for d in documents)
+        packed_size = statistics.mean(len(wire.pack(d, seats)) for d in documents)
+        json_us = timed(encode, documents)
+        packed_us = timed(lambda d: wire.pack(d, seats), documents)
+        print(f"{kind:<28} {len(documents):6d} {json_size:8.0f} {packed_size:10.0f} "
+              f"{1 - packed_size / json_size:6.0%} {json_us:8.1f} {packed_us:11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Initial schema: games, players and moves as first released
+
+Databases created by the app's create_all before migrations existed match
+this revision; mark them with `alembic stamp 0001` and upgrade from there.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+game_status = sa.Enum("WAITING", "IN_PROGRESS", "FINISHED", name="gamestatus")
+player_color = sa.Enum("RED", "BLUE", "GREEN", "YELLOW", name="playercolor")
+
+
+def upgrade() -> None:
+    # games.winner_id and players.game_id reference each other; the winner
+    # foreign key is added once both tables exist
+    op.create_table(
+        "games",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("code", sa.String(6), nullable=False, unique=True),
+        sa.Column("status", game_status),
+        sa.Column("current_player_index", sa.Integer),
+        sa.Column("winner_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    op.create_table(
+        "players",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("game_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("games.id"), nullable=False),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("color", player_color, nullable=False),
+        sa.Column("pieces", sa.JSON),
+        sa.Column("order", sa.Integer, nullable=False),
+        sa.Column("is_connected", sa.Boolean),
+        sa.Column("consecutive_sixes", sa.Integer),
+        sa.Column("turns_to_skip", sa.Integer),
+        sa.Column("created_at", sa.DateTime),
+    )
+    with op.batch_alter_table("games") as batch:
+        batch.create_foreign_key("games_winner_id_fkey", "players", ["winner_id"], ["id"])
+    op.create_table(
+        "moves",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("game_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("games.id"), nullable=False),
+        sa.Column("player_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("players.id"), nullable=False),
+        sa.Column("dice_value", sa.Integer, nullable=False),
+        sa.Column("piece_index", sa.Integer, nullable=False),
+        sa.Column("from_position", sa.Integer, nullable=False),
+        sa.Column("to_position", sa.Integer, nullable=False),
+        sa.Column("captured_player_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("players.id"), nullable=True),
+        sa.Column("captured_piece_index", sa.Integer, nullable=True),
+        sa.Column("created_at", sa.DateTime),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("moves")
+    with op.batch_alter_table("games") as batch:
+        batch.drop_constraint("games_winner_id_fkey", type_="foreignkey")
+    op.drop_table("players")
+    op.drop_table("games")
+    game_status.drop(op.get_bind(), checkfirst=True)
+    player_color.drop(op.get_bind(), checkfirst=True)
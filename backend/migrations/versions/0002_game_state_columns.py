@@ -0,0 +1,39 @@
+"""Game state columns: version, pending roll and the binary move log
+
+Games that were already running when this revision is applied get an empty
+move log, so their history only covers turns played afterwards.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("games") as batch:
+        batch.add_column(sa.Column("version", sa.Integer, nullable=False, server_default="0"))
+        batch.add_column(sa.Column("pending_roll", sa.Integer, nullable=True))
+        batch.add_column(sa.Column("move_log", sa.LargeBinary, nullable=True))
+        batch.add_column(sa.Column("move_snapshots", sa.LargeBinary, nullable=True))
+
+    games = sa.table("games", sa.column("move_log", sa.LargeBinary), sa.column("move_snapshots", sa.LargeBinary))
+    op.execute(games.update().values(move_log=b"", move_snapshots=b""))
+
+    with op.batch_alter_table("games") as batch:
+        batch.alter_column("move_log", existing_type=sa.LargeBinary, nullable=False)
+        batch.alter_column("move_snapshots", existing_type=sa.LargeBinary, nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("games") as batch:
+        batch.drop_column("move_snapshots")
+        batch.drop_column("move_log")
+        batch.drop_column("pending_roll")
+        batch.drop_column("version")
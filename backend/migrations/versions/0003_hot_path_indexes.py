@@ -0,0 +1,24 @@
+"""Indexes for the hot lookups: a game's players in seat order, its moves in play order
+
+games.code already has its unique index.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_players_game_id_order", "players", ["game_id", "order"])
+    op.create_index("ix_moves_game_id_created_at", "moves", ["game_id", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_moves_game_id_created_at", table_name="moves")
+    op.drop_index("ix_players_game_id_order", table_name="players")
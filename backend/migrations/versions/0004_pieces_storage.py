@@ -0,0 +1,44 @@
+"""Store players.pieces as a native smallint array when PIECES_STORAGE=array
+
+Only applies to PostgreSQL; elsewhere pieces stay JSON and this revision
+does nothing. Run it with the same PIECES_STORAGE as the app. To switch an
+upgraded database back to JSON, downgrade to 0003 and upgrade again with
+PIECES_STORAGE=json.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models import PIECES_STORAGE
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def _pieces_is_array(offline: bool) -> bool:
+    """Whether players.pieces is already an array; `offline` is assumed for --sql runs"""
+    if context.is_offline_mode():
+        return offline
+    columns = sa.inspect(op.get_bind()).get_columns("players")
+    return any(c["name"] == "pieces" and isinstance(c["type"], postgresql.ARRAY) for c in columns)
+
+
+def upgrade() -> None:
+    if PIECES_STORAGE != "array" or op.get_bind().dialect.name != "postgresql" or _pieces_is_array(False):
+        return
+    # '[-1, 5, 40, -1]' -> '{-1, 5, 40, -1}'; USING cannot hold a subquery
+    op.execute(
+        "ALTER TABLE players ALTER COLUMN pieces TYPE smallint[] "
+        "USING translate(pieces::text, '[]', '{}')::smallint[]"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql" and _pieces_is_array(True):
+        op.execute("ALTER TABLE players ALTER COLUMN pieces TYPE json USING to_json(pieces)")
@@ -0,0 +1,57 @@
+"""Game lifecycle: EXPIRED status, reaper scan index and archive tables
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        # ADD VALUE cannot run inside a transaction block on older servers
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE gamestatus ADD VALUE IF NOT EXISTS 'EXPIRED'")
+
+    op.create_index("ix_games_status_updated_at", "games", ["status", "updated_at"])
+    op.create_table(
+        "archived_games",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("code", sa.String(6), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("winner_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("players", sa.JSON, nullable=False),
+        sa.Column("move_log", sa.LargeBinary, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+        sa.Column("archived_at", sa.DateTime),
+    )
+    op.create_table(
+        "archived_moves",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("game_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("player_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("dice_value", sa.Integer, nullable=False),
+        sa.Column("piece_index", sa.Integer, nullable=False),
+        sa.Column("from_position", sa.Integer, nullable=False),
+        sa.Column("to_position", sa.Integer, nullable=False),
+        sa.Column("captured_player_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("captured_piece_index", sa.Integer, nullable=True),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_archived_moves_game_id", "archived_moves", ["game_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_archived_moves_game_id", table_name="archived_moves")
+    op.drop_table("archived_moves")
+    op.drop_table("archived_games")
+    op.drop_index("ix_games_status_updated_at", table_name="games")
+    # PostgreSQL cannot drop a value from an enum type; EXPIRED stays defined
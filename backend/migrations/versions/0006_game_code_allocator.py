@@ -0,0 +1,31 @@
+"""Game code allocator: counter block row and pool of reclaimed codes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    counter = op.create_table(
+        "game_code_counter",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("next_block", sa.BigInteger, nullable=False),
+    )
+    op.bulk_insert(counter, [{"id": 1, "next_block": 0}])
+    op.create_table(
+        "free_game_codes",
+        sa.Column("code", sa.String(6), primary_key=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("free_game_codes")
+    op.drop_table("game_code_counter")
@@ -0,0 +1,47 @@
+"""Shared test setup.
+
+The app reads its configuration from the environment at import, so it is
+set here, before any test module imports app: a throwaway sqlite database
+(unless DATABASE_URL points elsewhere) and no background matchmaker or
+reaper. The game store is off by default; use the store fixture to turn it on.
+"""
+import os
+import tempfile
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/tests.db"
+os.environ["GAME_STORE_ENABLED"] = "false"
+os.environ["MATCHMAKING_ENABLED"] = "false"
+os.environ["REAPER_ENABLED"] = "false"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import game_logic  # noqa: E402
+from app.game_store import game_store  # noqa: E402
+from app.main import app  # noqa: E402
+from app.snapshot_cache import snapshot_cache  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def dice(monkeypatch):
+    """Fixed dice: append the values the next rolls return"""
+    values = []
+    monkeypatch.setattr(game_logic, "roll_dice", lambda: values.pop(0))
+    return values
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Enable the in-memory game store, empty, for one test"""
+    monkeypatch.setattr(game_store, "enabled", True)
+    yield game_store
+    for game_id in game_store.game_ids():
+        game_store.evict(game_id)
+        snapshot_cache.invalidate(game_id)
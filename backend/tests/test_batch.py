@@ -0,0 +1,63 @@
+"""Turn actions in batches and as WebSocket commands."""
+import pytest
+
+from app.schemas import BATCH_LIMIT_DETAIL, BATCH_MAX_ACTIONS
+
+
+@pytest.fixture
+def game(client) -> dict:
+    """A started game of Red and Blue; Red is to move"""
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    client.post("/api/games/join", json={"code": game["code"], "player_name": "Blue"})
+    assert client.post(f"/api/games/{game['id']}/start").status_code == 200
+    return client.get(f"/api/games/{game['id']}").json()
+
+
+def action(game: dict, name: str, **fields) -> dict:
+    return {"action": name, "game_id": game["id"], "player_id": game["players"][0]["id"], **fields}
+
+
+def next_message(socket) -> dict:
+    while True:
+        message = socket.receive_json()
+        if message["type"] != "ping":
+            return message
+
+
+def test_batch_reports_each_action(client, dice, game):
+    dice.append(6)
+    response = client.post("/api/games/batch", json={"actions": [
+        action(game, "roll"),
+        action(game, "move", piece_index=0, dice_value=5),
+        action(game, "move", piece_index=0),
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["action"], r["ok"], r["status"]) for r in results] == [("roll", True, 200), ("move", False, 400),
+                                                                      ("move", True, 200)]
+    assert results[0]["roll"]["value"] == 6
+    assert results[1]["detail"] == "Dice value does not match the roll"
+    # The rejected move changed nothing; the one after it was played
+    assert results[2]["version"] == results[0]["version"] + 1
+    assert client.get(f"/api/games/{game['id']}").json()["version"] == results[2]["version"]
+
+
+def test_batch_limit(client, game):
+    actions = [action(game, "skip")] * (BATCH_MAX_ACTIONS + 1)
+    response = client.post("/api/games/batch", json={"actions": actions})
+    assert response.status_code == 400
+    assert response.json()["detail"] == BATCH_LIMIT_DETAIL
+
+
+def test_command_result_goes_to_the_sender_only(client, dice, game):
+    with client.websocket_connect(f"/ws/{game['code']}") as sender, \
+            client.websocket_connect(f"/ws/{game['code']}") as watcher:
+        dice.append(4)
+        sender.send_json({"type": "command", "id": 7, "action": "roll", "player_id": game["players"][0]["id"]})
+        reply = next_message(sender)
+        assert (reply["type"], reply["id"], reply["ok"], reply["roll"]["value"]) == ("command_result", 7, True, 4)
+        assert next_message(sender)["event"] == "dice_rolled"
+        # The watcher only gets the room's deltas
+        assert next_message(watcher)["event"] == "dice_rolled"
+        client.post(f"/api/games/{game['id']}/skip-turn", json={"player_id": game["players"][0]["id"]})
+        assert next_message(watcher)["event"] == "turn_skipped"
@@ -0,0 +1,35 @@
+"""Bot turns played by the server."""
+import asyncio
+from uuid import UUID
+
+from app import ai, main
+
+
+async def finish_bot_turns() -> None:
+    while main.bot_tasks:
+        await asyncio.gather(*list(main.bot_tasks.values()))
+
+
+def test_bot_searches_without_holding_the_game(store, client, dice, monkeypatch):
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    game_id, red = UUID(game["id"]), game["players"][0]["id"]
+    client.post(f"/api/games/{game['id']}/bots", json={})
+    client.post(f"/api/games/{game['id']}/start")
+
+    locked_during_search = []
+
+    async def choose(search, budget=ai.AI_TIME_BUDGET):
+        locked_during_search.append(store.lock(game_id).locked())
+        return ai.search_move(*search, budget=0.01)
+
+    monkeypatch.setattr(ai, "choose", choose)
+    # Red cannot enter on a 1; the bot enters one of its pieces with a 6, then moves it 2
+    dice.extend([1, 6, 2])
+    client.post("/api/games/roll-dice", json={"game_id": game["id"], "player_id": red})
+    assert client.post(f"/api/games/{game['id']}/skip-turn", json={"player_id": red}).status_code == 200
+    client.portal.call(finish_bot_turns)
+
+    assert locked_during_search == [False]
+    game = client.get(f"/api/games/{game['id']}").json()
+    assert game["current_player_index"] == 0
+    assert sorted(game["players"][1]["pieces"]) == [-1, -1, -1, 2]
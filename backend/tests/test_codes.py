@@ -0,0 +1,56 @@
+"""Game join codes: the keyed permutation and the per-process block allocators."""
+import random
+
+from app import codes
+from app.codes import CODE_LENGTH, CODE_SPACE, CodeAllocator
+from app.database import AsyncSessionLocal
+
+
+def unfeistel(value: int) -> int:
+    """Inverse of codes._feistel"""
+    left, right = value >> 16, value & 0xFFFF
+    for key in reversed(codes._ROUND_KEYS):
+        left, right = right ^ codes._round(left, key), left
+    return (left << 16) | right
+
+
+def test_feistel_is_invertible():
+    for value in random.Random(0).sample(range(2 ** 32), 10_000) + [0, 2 ** 32 - 1]:
+        assert unfeistel(codes._feistel(value)) == value
+
+
+def test_codes_are_distinct():
+    count = 50_000
+    values = [codes.permute(v) for v in (*range(count), *range(CODE_SPACE - count, CODE_SPACE))]
+    assert len(set(values)) == len(values)
+    assert all(0 <= v < CODE_SPACE for v in values)
+    assert all(len(codes.code_for(v)) == CODE_LENGTH for v in range(100))
+
+
+async def allocate(allocator: CodeAllocator, count: int) -> list:
+    return [await allocator.allocate() for _ in range(count)]
+
+
+def test_allocators_reserve_distinct_blocks(client):
+    first, second = CodeAllocator(AsyncSessionLocal, block_size=10), CodeAllocator(AsyncSessionLocal, block_size=10)
+    handed_out = []
+    # Interleaved, so each reserves several blocks while the other holds some
+    for _ in range(3):
+        handed_out += client.portal.call(allocate, first, 7) + client.portal.call(allocate, second, 7)
+    assert len(set(handed_out)) == len(handed_out)
+
+
+def test_reclaimed_codes_are_handed_out_first(client):
+    first = CodeAllocator(AsyncSessionLocal, block_size=10)
+    reclaimed = client.portal.call(allocate, first, 2)
+
+    async def reclaim():
+        async with AsyncSessionLocal() as db:
+            await codes.reclaim(db, reclaimed)
+            await db.commit()
+
+    client.portal.call(reclaim)
+    second = CodeAllocator(AsyncSessionLocal, block_size=10)
+    assert sorted(client.portal.call(allocate, second, 2)) == sorted(reclaimed)
+    # Then fresh counter values
+    assert not set(client.portal.call(allocate, second, 5)) & set(reclaimed)
@@ -0,0 +1,55 @@
+"""The in-memory game store against lobby changes made through the ORM."""
+from uuid import UUID
+
+from app.game_store import game_store
+
+
+def create_game(client) -> dict:
+    response = client.post("/api/games", json={"player_name": "Red"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def roll(client, game: dict, player_id: str):
+    return client.post("/api/games/roll-dice", json={"game_id": game["id"], "player_id": player_id})
+
+
+def test_turn_on_waiting_game_does_not_cache_it(store, client):
+    game = create_game(client)
+    red = game["players"][0]["id"]
+    assert roll(client, game, red).status_code == 400
+    assert game_store.get(UUID(game["id"])) is None
+
+
+def test_join_and_start_after_turn_on_waiting_game(store, client, dice):
+    game = create_game(client)
+    red = game["players"][0]["id"]
+    assert roll(client, game, red).status_code == 400
+
+    response = client.post("/api/games/join", json={"code": game["code"], "player_name": "Blue"})
+    assert response.status_code == 200
+    assert client.post(f"/api/games/{game['id']}/start").status_code == 200
+
+    dice.append(6)
+    response = roll(client, game, red)
+    assert response.status_code == 200, response.text
+    assert response.json()["value"] == 6
+    game = client.get(f"/api/games/{game['id']}").json()
+    assert game["status"] == "in_progress"
+    assert [p["name"] for p in game["players"]] == ["Red", "Blue"]
+
+
+def test_add_bot_after_turn_on_waiting_game(store, client, dice):
+    game = create_game(client)
+    red = game["players"][0]["id"]
+    assert roll(client, game, red).status_code == 400
+
+    response = client.post(f"/api/games/{game['id']}/bots", json={})
+    assert response.status_code == 200
+    assert client.post(f"/api/games/{game['id']}/start").status_code == 200
+
+    dice.append(3)
+    assert roll(client, game, red).status_code == 200
+    game = client.get(f"/api/games/{game['id']}").json()
+    assert game["status"] == "in_progress"
+    assert len(game["players"]) == 2
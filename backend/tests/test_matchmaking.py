@@ -0,0 +1,84 @@
+"""Matchmaking passes: which waiting tickets are seated together, and when."""
+import time
+
+import pytest
+
+from app import codes, queries
+from app.database import AsyncSessionLocal
+from app.matchmaking import CANCELLED, EXPIRED, MATCHED, WAITING, Matchmaker
+from app.models import GameStatus
+
+WINDOWS = {4: 0.0, 3: 5.0, 2: 15.0}
+TIMEOUT = 60.0
+
+
+@pytest.fixture
+def matchmaker() -> Matchmaker:
+    return Matchmaker(WINDOWS, TIMEOUT)
+
+
+def queue(matchmaker: Matchmaker, count: int) -> list:
+    return [matchmaker.join(f"Player {i}") for i in range(count)]
+
+
+def match(client, matchmaker: Matchmaker, after: float = 0.0) -> list:
+    """One pass, after seconds from now"""
+    return client.portal.call(matchmaker.match, AsyncSessionLocal, time.monotonic() + after)
+
+
+async def stored_seats(game_id) -> tuple:
+    async with AsyncSessionLocal() as db:
+        game = await queries.load_game(db, game_id)
+        return game.status, [p.name for p in sorted(game.players, key=lambda p: p.order)]
+
+
+def test_four_waiting_are_seated_at_once(client, matchmaker):
+    tickets = queue(matchmaker, 6)
+    games = match(client, matchmaker)
+    assert len(games) == 1
+    assert [t.status for t in tickets] == [MATCHED] * 4 + [WAITING] * 2
+    assert {t.game.id for t in tickets[:4]} == {games[0].id}
+    assert client.portal.call(stored_seats, games[0].id) == \
+        (GameStatus.IN_PROGRESS, [t.player_name for t in tickets[:4]])
+
+
+@pytest.mark.parametrize("seats", [3, 2])
+def test_smaller_games_wait_for_their_window(client, matchmaker, seats):
+    tickets = queue(matchmaker, seats)
+    assert match(client, matchmaker, WINDOWS[seats] - 1) == []
+    assert [t.status for t in tickets] == [WAITING] * seats
+    games = match(client, matchmaker, WINDOWS[seats])
+    assert [len(game.players) for game in games] == [seats]
+    assert all(t.status == MATCHED for t in tickets)
+
+
+def test_tickets_expire(client, matchmaker):
+    (ticket,) = queue(matchmaker, 1)
+    match(client, matchmaker, TIMEOUT - 1)
+    assert ticket.status == WAITING
+    match(client, matchmaker, TIMEOUT)
+    assert ticket.status == EXPIRED
+    assert len(matchmaker) == 0
+
+
+def test_cancelled_ticket_is_not_seated(client, matchmaker):
+    tickets = queue(matchmaker, 5)
+    assert matchmaker.cancel(tickets[0].id)
+    assert not matchmaker.cancel(tickets[0].id)
+    games = match(client, matchmaker)
+    assert tickets[0].status == CANCELLED and tickets[0].game is None
+    assert [p.name for p in games[0].players] == [t.player_name for t in tickets[1:]]
+
+
+def test_ticket_cancelled_during_a_pass_is_not_seated(client, matchmaker, monkeypatch):
+    tickets = queue(matchmaker, 4)
+    allocate = codes.code_allocator.allocate
+
+    async def allocate_then_cancel():
+        matchmaker.cancel(tickets[0].id)
+        return await allocate()
+
+    monkeypatch.setattr(codes.code_allocator, "allocate", allocate_then_cancel)
+    assert match(client, matchmaker) == []
+    assert tickets[0].status == CANCELLED
+    assert [t.status for t in tickets[1:]] == [WAITING] * 3
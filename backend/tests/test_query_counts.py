@@ -0,0 +1,160 @@
+"""Exact number of SQL statements issued by each game endpoint.
+
+Plays a scripted two-player game through the API with fixed dice, so every
+turn path is exercised: entering a piece, a capture, the consecutive-6s
+penalty, skipping a turn and forced turns played by roll-dice's auto_apply.
+Each request runs inside queries.count_statements and the totals are
+compared with EXPECTED. When a change legitimately alters a count, update
+EXPECTED in the same commit; run with -s to print every statement.
+"""
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import game_logic, queries
+from app.codes import CodeAllocator, code_allocator
+from app.database import AsyncSessionLocal, async_engine
+from app.game_store import game_store
+from app.main import app
+from app.matchmaking import matchmaker
+
+# Statements per request. A game is always read with its players in one
+# SELECT; writes are one statement per changed table (per distinct column set).
+EXPECTED = {
+    "create_game": 2,          # INSERT game, INSERT player (codes are reserved in blocks)
+    "create_game_block": 2,    # once per CODE_BLOCK_SIZE games: claim reclaimed codes, UPDATE counter
+    "get_game_by_code": 1,
+    "join_game": 3,            # SELECT, INSERT player, UPDATE game
+    "start_game": 2,           # SELECT, UPDATE game
+    "get_game": 1,
+    "get_game_cached": 1,      # SELECT version: unchanged, so served from the snapshot cache
+    "get_game_304": 1,         # If-None-Match with the current ETag: 304 after the version check
+    "roll_dice": 2,            # SELECT, UPDATE game (the pending roll)
+    "roll_dice_penalty": 3,    # SELECT, UPDATE player, UPDATE game
+    "roll_auto_skip": 2,       # SELECT, UPDATE game
+    "roll_auto_move": 4,       # SELECT, UPDATE player, INSERT move, UPDATE game
+    "move_enter": 4,           # SELECT, UPDATE player, INSERT move, UPDATE game
+    "move": 4,
+    "move_capture": 5,         # the captured player is updated separately
+    "move_penalty": 4,
+    "skip_turn": 2,            # SELECT, UPDATE game
+    "batch": 5,                # SELECT, UPDATE player x2 (different columns), INSERT move, UPDATE game
+    "matchmaking_pass": 2,     # two games formed: INSERT games, INSERT players
+}
+
+
+class Script:
+    def __init__(self, client: TestClient):
+        self.client = client
+        self.dice = []
+        self.counts = {}
+
+    def call(self, label: str, method: str, path: str, status: int = 200, **kwargs):
+        with queries.count_statements(async_engine) as counter:
+            response = self.client.request(method, path, **kwargs)
+        assert response.status_code == status, f"{label}: {method} {path} -> {response.text}"
+        # Repeated labels must agree; keep the highest so any drift is reported
+        self.counts[label] = max(self.counts.get(label, 0), counter.count)
+        print(f"-- {label}: {counter.count}")
+        for statement in counter.statements:
+            print("   " + " ".join(statement.split()))
+        return response
+
+    def roll(self, label: str, game_id: str, player_id: str, value: Optional[int], auto_apply: bool = False):
+        # value is None for a penalty turn, which does not roll
+        if value is not None:
+            self.dice.append(value)
+        return self.call(label, "POST", "/api/games/roll-dice",
+                         json={"game_id": game_id, "player_id": player_id, "auto_apply": auto_apply}).json()
+
+    def move(self, label: str, game_id: str, player_id: str, piece_index: int, value: int):
+        return self.call(label, "POST", "/api/games/move", json={
+            "game_id": game_id, "player_id": player_id,
+            "piece_index": piece_index, "dice_value": value,
+        }).json()
+
+
+def play(client: TestClient) -> dict:
+    script = Script(client)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(game_logic, "roll_dice", lambda: script.dice.pop(0))
+
+        # Games are created from codes already reserved; the block is counted on a fresh pool
+        client.portal.call(code_allocator.refill)
+        with queries.count_statements(async_engine) as counter:
+            client.portal.call(CodeAllocator(AsyncSessionLocal).refill)
+        script.counts["create_game_block"] = counter.count
+        game = script.call("create_game", "POST", "/api/games", json={"player_name": "Red"}).json()
+        game_id, code = game["id"], game["code"]
+        script.call("get_game_by_code", "GET", f"/api/games/code/{code}")
+        game = script.call("join_game", "POST", "/api/games/join",
+                           json={"code": code, "player_name": "Blue"}).json()
+        red, blue = (p["id"] for p in game["players"])
+        script.call("start_game", "POST", f"/api/games/{game_id}/start")
+        etag = script.call("get_game", "GET", f"/api/games/{game_id}").headers["etag"]
+        script.call("get_game_cached", "GET", f"/api/games/{game_id}")
+        script.call("get_game_304", "GET", f"/api/games/{game_id}", status=304,
+                    headers={"If-None-Match": etag})
+
+        # Red enters a piece with a 6 and uses the extra turn to reach square 5
+        script.roll("roll_dice", game_id, red, 6)
+        script.move("move_enter", game_id, red, 0, 6)
+        script.roll("roll_dice", game_id, red, 5)
+        script.move("move", game_id, red, 0, 5)
+        # Blue enters on absolute square 10 and moves to 11
+        script.roll("roll_dice", game_id, blue, 6)
+        script.move("move_enter", game_id, blue, 0, 6)
+        script.roll("roll_dice", game_id, blue, 1)
+        script.move("move", game_id, blue, 0, 1)
+        # Red lands on 11 and captures Blue
+        script.roll("roll_dice", game_id, red, 6)
+        result = script.move("move_capture", game_id, red, 0, 6)
+        assert result["captured"], result
+        # A second consecutive 6 gives Red a 4-turn penalty
+        script.roll("roll_dice", game_id, red, 6)
+        script.move("move_penalty", game_id, red, 0, 6)
+        # Blue has nothing at home that can leave on a 3
+        roll = script.roll("roll_dice", game_id, blue, 3)
+        assert not roll["can_move"], roll
+        script.call("skip_turn", "POST", f"/api/games/{game_id}/skip-turn", json={"player_id": blue})
+        roll = script.roll("roll_dice_penalty", game_id, red, None)
+        assert roll["value"] == 0, roll
+        # Blue has all pieces home again: a 2 is skipped automatically
+        roll = script.roll("roll_auto_skip", game_id, blue, 2, auto_apply=True)
+        assert roll["applied"] == "skipped", roll
+        script.roll("roll_dice_penalty", game_id, red, None)
+        # Blue enters a piece; on the extra turn a 3 can only move that piece
+        script.roll("roll_dice", game_id, blue, 6)
+        script.move("move_enter", game_id, blue, 0, 6)
+        roll = script.roll("roll_auto_move", game_id, blue, 3, auto_apply=True)
+        assert roll["applied"] == "moved", roll
+        # Red serves a penalty turn, Blue enters a second piece: one transaction
+        script.dice.append(6)
+        results = script.call("batch", "POST", "/api/games/batch", json={"actions": [
+            {"action": "roll", "game_id": game_id, "player_id": red},
+            {"action": "roll", "game_id": game_id, "player_id": blue},
+            {"action": "move", "game_id": game_id, "player_id": blue, "piece_index": 1},
+        ]}).json()["results"]
+        assert all(r["ok"] for r in results), results
+
+    for i in range(8):
+        matchmaker.join(f"Player {i}")
+    with queries.count_statements(async_engine) as counter:
+        started = client.portal.call(matchmaker.match, AsyncSessionLocal)
+    assert len(started) == 2, started
+    script.counts["matchmaking_pass"] = counter.count
+    return script.counts
+
+
+@pytest.fixture(scope="module")
+def counts():
+    # Turn endpoints must hit the database for the counts to mean anything
+    assert not game_store.enabled
+    with TestClient(app) as client:
+        return play(client)
+
+
+@pytest.mark.parametrize("label", list(EXPECTED))
+def test_statement_count(counts, label):
+    assert counts.get(label) == EXPECTED[label]
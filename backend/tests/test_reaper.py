@@ -0,0 +1,58 @@
+"""The reaper against games held in the in-memory store."""
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from app import queries, reaper
+from app.database import AsyncSessionLocal
+from app.models import GameStatus
+
+
+async def expire_idle() -> list:
+    later = datetime.utcnow() + timedelta(seconds=reaper.IDLE_GAME_TTL + 1)
+    async with AsyncSessionLocal() as db:
+        return await reaper.expire_idle_games(db, later)
+
+
+async def flush(store) -> int:
+    async with AsyncSessionLocal() as db:
+        return await store.flush(db)
+
+
+async def stored_status(game_id: UUID) -> GameStatus:
+    async with AsyncSessionLocal() as db:
+        return (await queries.load_game(db, game_id)).status
+
+
+def test_flush_does_not_revive_expired_game(store, client, dice):
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    client.post("/api/games/join", json={"code": game["code"], "player_name": "Blue"})
+    client.post(f"/api/games/{game['id']}/start")
+    game_id, red = UUID(game["id"]), game["players"][0]["id"]
+    dice.append(6)
+    assert client.post("/api/games/roll-dice", json={"game_id": game["id"], "player_id": red}).status_code == 200
+    client.portal.call(flush, store)
+
+    expired = client.portal.call(expire_idle)
+    assert game_id in [row[0] for row in expired]
+    # A turn played on the cached state before the reaper evicts it
+    response = client.post("/api/games/move", json={"game_id": game["id"], "player_id": red, "piece_index": 0})
+    assert response.status_code == 200
+    assert client.portal.call(flush, store) == 0
+
+    assert client.portal.call(stored_status, game_id) == GameStatus.EXPIRED
+    assert store.get(game_id) is None
+
+
+def test_shard_expires_its_games_behind_those_of_other_shards(client):
+    games = [client.post("/api/games", json={"player_name": "Red"}).json() for _ in range(3)]
+    ours = UUID(games[-1]["id"])
+
+    async def expire_ours() -> list:
+        later = datetime.utcnow() + timedelta(seconds=reaper.WAITING_GAME_TTL + 1)
+        async with AsyncSessionLocal() as db:
+            return await reaper.expire_idle_games(db, later, batch_size=1, owns=lambda game_id: game_id == ours)
+
+    # The older idle games, here and of earlier tests, belong to other shards
+    assert [row[0] for row in client.portal.call(expire_ours)] == [ours]
+    assert client.portal.call(stored_status, ours) == GameStatus.EXPIRED
+    assert client.portal.call(stored_status, UUID(games[0]["id"])) == GameStatus.WAITING
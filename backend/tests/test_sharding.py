@@ -0,0 +1,159 @@
+"""Game-affinity sharding: the ring, request routing, the middleware and the router's batch split."""
+import asyncio
+import json
+from uuid import uuid4
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import sharding
+from app.schemas import BATCH_MAX_ACTIONS
+from app.shard_router import ShardRouter
+from app.sharding import HashRing, RouteKeys, Shard, ShardMiddleware, route_keys
+
+SHARDS = ["http://a", "http://b", "http://c"]
+KEYS = [str(uuid4()) for _ in range(3000)]
+
+
+def owners(ring: HashRing) -> dict:
+    return {key: ring.owner(key) for key in KEYS}
+
+
+def game_owned_by(ring: HashRing, shard: str) -> str:
+    while True:
+        game_id = str(uuid4())
+        if ring.owner(game_id) == shard:
+            return game_id
+
+
+def test_adding_a_shard_only_moves_keys_to_it():
+    before = owners(HashRing(SHARDS))
+    after = owners(HashRing(SHARDS + ["http://d"]))
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == "http://d" for key in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_removing_a_shard_only_moves_its_keys():
+    before = owners(HashRing(SHARDS))
+    after = owners(HashRing(SHARDS[:2]))
+    assert [key for key in KEYS if before[key] != after[key]] == [key for key in KEYS if before[key] == "http://c"]
+
+
+def test_ring_is_independent_of_shard_order():
+    assert owners(HashRing(SHARDS)) == owners(HashRing(reversed(SHARDS)))
+    assert HashRing(()).owner(KEYS[0]) is None
+
+
+def test_route_keys():
+    game_id = str(uuid4())
+    assert route_keys(f"/api/games/{game_id}/start") == RouteKeys([game_id])
+    assert route_keys("/api/games/code/ab12") == RouteKeys(code="AB12")
+    assert route_keys("/ws/AB12") == RouteKeys(code="AB12")
+    assert route_keys("/ws/matchmaking") == RouteKeys([sharding.MATCHMAKING_KEY])
+    assert route_keys("/api/matchmaking/tickets") == RouteKeys([sharding.MATCHMAKING_KEY])
+    assert route_keys("/api/games/move", json.dumps({"game_id": game_id}).encode()) == RouteKeys([game_id])
+    assert route_keys("/api/games/join", json.dumps({"code": "ab12"}).encode()) == RouteKeys(code="AB12")
+    # Creating a game, or a request that cannot be parsed, goes to any shard
+    assert not route_keys("/api/games")
+    assert not route_keys("/api/games/move", b"not json")
+    assert not route_keys("/api/games/not-an-id")
+
+
+def test_route_keys_of_a_batch():
+    first, second = str(uuid4()), str(uuid4())
+    body = {"actions": [{"game_id": first}, {"game_id": second}, {"game_id": first}, "junk"]}
+    assert route_keys("/api/games/batch", json.dumps(body).encode()) == RouteKeys([first, second])
+
+
+def test_middleware_turns_away_games_of_other_shards():
+    api = FastAPI()
+
+    @api.get("/api/games/{game_id}")
+    async def get_game(game_id: str):
+        return {"id": game_id}
+
+    @api.post("/api/games/move")
+    async def move(body: dict):
+        return body
+
+    shard = Shard("http://a")
+    shard.set_ring(HashRing(SHARDS[:2]))
+    ours, theirs = game_owned_by(shard.ring, "http://a"), game_owned_by(shard.ring, "http://b")
+
+    async def resolve_code(code):
+        return None
+
+    with TestClient(ShardMiddleware(api, resolve_code, shard)) as client:
+        assert client.get(f"/api/games/{ours}").json() == {"id": ours}
+        response = client.get(f"/api/games/{theirs}")
+        assert response.status_code == sharding.MISDIRECTED
+        assert response.json() == {"detail": sharding.MISDIRECTED_DETAIL}
+        # The body routed by is still passed on to the endpoint
+        assert client.post("/api/games/move", json={"game_id": ours}).json() == {"game_id": ours}
+        assert client.post("/api/games/move", json={"game_id": theirs}).status_code == sharding.MISDIRECTED
+
+
+def batch_router(handle) -> ShardRouter:
+    """A router over shards a and b answering with handle(shard, actions)"""
+    router = ShardRouter(SHARDS[:2])
+    router.ring = HashRing(SHARDS[:2])
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        return handle(f"{request.url.scheme}://{request.url.host}", json.loads(request.content)["actions"])
+
+    router.client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    return router
+
+
+def post_batch(router: ShardRouter, actions: list) -> httpx.Response:
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=router), base_url="http://router") as client:
+            return await client.post("/api/games/batch", json={"actions": actions})
+
+    return asyncio.run(post())
+
+
+def test_router_splits_and_merges_a_cross_shard_batch():
+    ring = HashRing(SHARDS[:2])
+    on_a, on_b = game_owned_by(ring, "http://a"), game_owned_by(ring, "http://b")
+    seen = {}
+
+    def handle(shard, actions):
+        seen[shard] = [action["game_id"] for action in actions]
+        return httpx.Response(200, json={"results": [{"game_id": action["game_id"], "ok": True, "shard": shard}
+                                                     for action in actions]})
+
+    actions = [{"action": "roll", "game_id": game_id} for game_id in (on_a, on_b, on_a)]
+    response = post_batch(batch_router(handle), actions)
+    assert response.status_code == 200
+    assert seen == {"http://a": [on_a, on_a], "http://b": [on_b]}
+    assert [(r["game_id"], r["shard"]) for r in response.json()["results"]] == \
+        [(on_a, "http://a"), (on_b, "http://b"), (on_a, "http://a")]
+
+
+def test_router_fails_only_the_actions_of_a_failed_part():
+    ring = HashRing(SHARDS[:2])
+    on_a, on_b = game_owned_by(ring, "http://a"), game_owned_by(ring, "http://b")
+
+    def handle(shard, actions):
+        if shard == "http://b":
+            return httpx.Response(500, json={"detail": "Internal Server Error"})
+        return httpx.Response(200, json={"results": [{"game_id": a["game_id"], "ok": True} for a in actions]})
+
+    response = post_batch(batch_router(handle), [{"action": "roll", "game_id": on_a},
+                                                 {"action": "roll", "game_id": on_b}])
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"game_id": on_a, "ok": True},
+        {"action": "roll", "game_id": on_b, "ok": False, "status": 500, "detail": "Internal Server Error"},
+    ]
+
+
+def test_router_rejects_an_oversized_batch_before_splitting():
+    def handle(shard, actions):
+        raise AssertionError("forwarded")
+
+    actions = [{"action": "roll", "game_id": str(uuid4())} for _ in range(BATCH_MAX_ACTIONS + 1)]
+    assert post_batch(batch_router(handle), actions).status_code == 400
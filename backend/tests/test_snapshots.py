@@ -0,0 +1,40 @@
+"""Polling a game with ETag / If-None-Match, served from the snapshot cache."""
+from uuid import UUID
+
+from sqlalchemy import update
+
+from app.database import AsyncSessionLocal
+from app.models import Game
+
+
+async def change_elsewhere(game_id: UUID) -> None:
+    """Change a game behind this process's back, as another worker would"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Game).where(Game.id == game_id).values(version=Game.version + 1))
+        await db.commit()
+
+
+def test_if_none_match(client):
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    path = f"/api/games/{game['id']}"
+    etag = client.get(path).headers["etag"]
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert client.get(f"/api/games/code/{game['code']}", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/api/games/join", json={"code": game["code"], "player_name": "Blue"})
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [p["name"] for p in response.json()["players"]] == ["Red", "Blue"]
+
+
+def test_cached_snapshot_of_a_game_changed_elsewhere_is_not_served(client):
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    path = f"/api/games/{game['id']}"
+    etag = client.get(path).headers["etag"]
+    client.portal.call(change_elsewhere, UUID(game["id"]))
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["version"] == game["version"] + 1
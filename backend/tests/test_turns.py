@@ -0,0 +1,72 @@
+"""Turn rules of the pending roll: rolling, moving by it and skipping it."""
+import pytest
+
+
+@pytest.fixture
+def game(client) -> dict:
+    """A started game of Red and Blue; Red is to move"""
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    client.post("/api/games/join", json={"code": game["code"], "player_name": "Blue"})
+    assert client.post(f"/api/games/{game['id']}/start").status_code == 200
+    return client.get(f"/api/games/{game['id']}").json()
+
+
+def roll(client, game: dict, seat: int = 0, **fields):
+    player_id = game["players"][seat]["id"]
+    return client.post("/api/games/roll-dice", json={"game_id": game["id"], "player_id": player_id, **fields})
+
+
+def move(client, game: dict, piece_index: int, seat: int = 0, **fields):
+    player_id = game["players"][seat]["id"]
+    return client.post("/api/games/move", json={"game_id": game["id"], "player_id": player_id,
+                                                "piece_index": piece_index, **fields})
+
+
+def skip(client, game: dict, seat: int = 0):
+    return client.post(f"/api/games/{game['id']}/skip-turn", json={"player_id": game["players"][seat]["id"]})
+
+
+def test_move_before_roll(client, game):
+    response = move(client, game, 0)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Roll the dice first"
+
+
+def test_move_must_match_the_roll(client, dice, game):
+    dice.append(6)
+    roll(client, game)
+    response = move(client, game, 0, dice_value=5)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Dice value does not match the roll"
+    assert move(client, game, 0, dice_value=6).status_code == 200
+
+
+def test_cannot_skip_a_playable_roll(client, dice, game):
+    dice.append(6)
+    roll(client, game)
+    response = skip(client, game)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "A valid move is available"
+
+
+def test_rolling_again_returns_the_pending_roll(client, dice, game):
+    dice.append(6)
+    first = roll(client, game).json()
+    # No die is left to roll: the second roll must not roll
+    again = roll(client, game).json()
+    assert (again["value"], again["valid_moves"], again["version"]) == \
+        (first["value"], first["valid_moves"], first["version"])
+
+
+def test_auto_apply_plays_forced_turns(client, dice, game):
+    # Entering a piece with a 6 is a choice of four; then a 3 can only move that piece
+    dice.extend([6, 3])
+    assert roll(client, game, auto_apply=True).json()["applied"] is None
+    entered = move(client, game, 0).json()["new_position"]
+    response = roll(client, game, auto_apply=True).json()
+    assert response["applied"] == "moved"
+    assert response["move"]["new_position"] == entered + 3
+    # Blue has no piece out, so a 2 is skipped
+    dice.append(2)
+    assert roll(client, game, seat=1, auto_apply=True).json()["applied"] == "skipped"
+    assert client.get(f"/api/games/{game['id']}").json()["current_player_index"] == 0
@@ -0,0 +1,60 @@
+"""Optimistic concurrency on the game version: expected_version and the row version check."""
+from uuid import UUID
+
+import pytest
+
+from app import main, queries
+from app.database import AsyncSessionLocal
+
+
+@pytest.fixture
+def game(client) -> dict:
+    """A started game of Red and Blue; Red is to move"""
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    client.post("/api/games/join", json={"code": game["code"], "player_name": "Blue"})
+    assert client.post(f"/api/games/{game['id']}/start").status_code == 200
+    return client.get(f"/api/games/{game['id']}").json()
+
+
+def roll(client, game: dict, **fields):
+    return client.post("/api/games/roll-dice", json={"game_id": game["id"], "player_id": game["players"][0]["id"],
+                                                     **fields})
+
+
+def test_stale_expected_version_is_rejected(client, dice, game):
+    red, version = game["players"][0]["id"], game["version"]
+    assert roll(client, game, expected_version=version - 1).status_code == 409
+
+    dice.append(6)
+    assert roll(client, game, expected_version=version).json()["version"] == version + 1
+    response = client.post("/api/games/move", json={"game_id": game["id"], "player_id": red, "piece_index": 0,
+                                                     "expected_version": version})
+    assert response.status_code == 409
+    response = client.post(f"/api/games/{game['id']}/skip-turn", json={"player_id": red, "expected_version": version})
+    assert response.status_code == 409
+    # Nothing was played
+    assert client.get(f"/api/games/{game['id']}").json()["version"] == version + 1
+
+
+def test_racing_writers_one_commits_one_conflicts(client, dice, game, monkeypatch):
+    load_games = queries.load_games
+    raced = []
+
+    async def load_then_race(db, game_ids):
+        games = await load_games(db, game_ids)
+        if not raced:
+            raced.append(True)
+            # Another writer commits a turn on the same version before this request does
+            async with AsyncSessionLocal() as other:
+                async with main.game_turn(other, UUID(game["id"])) as state:
+                    main.roll_action(state, UUID(game["players"][0]["id"]))
+        return games
+
+    monkeypatch.setattr(queries, "load_games", load_then_race)
+    dice.extend([3, 5])
+    response = roll(client, game)
+    assert response.status_code == 409
+    assert response.json() == {"detail": main.GAME_CONFLICT_DETAIL}
+    game_now = client.get(f"/api/games/{game['id']}").json()
+    assert game_now["version"] == game["version"] + 1
+    assert game_now["pending_roll"] == 3
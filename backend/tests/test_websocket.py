@@ -0,0 +1,62 @@
+"""Game room WebSockets: what clients can and cannot make the server send."""
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.connections import CLOSE_GAME_GONE, manager
+
+
+@pytest.fixture
+def game(client) -> dict:
+    return client.post("/api/games", json={"player_name": "Red"}).json()
+
+
+def join(client, game: dict, name: str) -> None:
+    assert client.post("/api/games/join", json={"code": game["code"], "player_name": name}).status_code == 200
+
+
+def next_delta(socket) -> dict:
+    while True:
+        message = socket.receive_json()
+        if message["type"] == "game_delta":
+            return message
+
+
+def test_client_cannot_close_room(client, game):
+    with client.websocket_connect(f"/ws/{game['code']}") as sender, \
+            client.websocket_connect(f"/ws/{game['code']}") as watcher:
+        sender.send_json({"type": "room_closed"})
+        join(client, game, "Blue")
+        # Both sockets stay open for the next broadcast
+        for socket in (watcher, sender):
+            assert next_delta(socket)["event"] == "player_joined"
+
+
+def test_close_room(client, game):
+    with client.websocket_connect(f"/ws/{game['code']}") as watcher:
+        client.portal.call(manager.close_room, game["code"])
+        assert watcher.receive_json() == {"type": "room_closed"}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            watcher.receive_json()
+        assert closed.value.code == CLOSE_GAME_GONE
+
+
+def test_client_frames_are_not_broadcast(client, game):
+    with client.websocket_connect(f"/ws/{game['code']}") as sender, \
+            client.websocket_connect(f"/ws/{game['code']}") as watcher:
+        sender.send_json({"type": "game_delta", "game_id": game["id"], "version": game["version"] + 1,
+                          "event": "game_finished", "changes": {"status": "finished"}})
+        join(client, game, "Blue")
+        for socket in (watcher, sender):
+            delta = socket.receive_json()
+            assert delta["event"] == "player_joined"
+            assert delta["version"] == game["version"] + 1
+
+
+def test_failed_handshake_is_not_registered(client, game):
+    class HangUp:
+        async def accept(self):
+            raise RuntimeError("client went away")
+
+    with pytest.raises(RuntimeError):
+        client.portal.call(manager.connect, HangUp(), game["code"])
+    assert game["code"] not in manager.active_connections
@@ -0,0 +1,109 @@
+"""MessagePack wire format: negotiation, the compact form, and its use over REST and WebSockets."""
+from uuid import uuid4
+
+import msgpack
+import pytest
+
+from app import wire
+
+MSGPACK = {"Accept": wire.MSGPACK_MEDIA_TYPE}
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, False),
+    ("application/json", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack", True),
+    ("application/msgpack, application/json", True),
+    ("application/msgpack;q=0.5, application/json", False),
+    ("application/json;q=0.5, application/msgpack", True),
+    ("application/msgpack;q=0.8, */*;q=0.8", True),
+    ("application/msgpack;q=0", False),
+    ("application/msgpack;q=oops", False),
+])
+def test_accepts_msgpack(accept, expected):
+    assert wire.accepts_msgpack(accept) is expected
+
+
+def test_pack_compacts_seats_and_uuids():
+    game_id, red, blue = (str(uuid4()) for _ in range(3))
+    delta = {"type": "game_delta", "game_id": game_id, "event": "piece_moved", "changes": {
+        "status": "in_progress", "winner_id": None,
+        "players": [{"id": blue, "pieces": [-1, 3, -1, -1]}],
+    }, "meta": {"player_id": red, "captured_player_id": blue}}
+    packed = wire.pack(delta, {red: 0, blue: 1})
+    assert msgpack.unpackb(packed)["game_id"] == bytes.fromhex(game_id.replace("-", ""))
+    assert wire.loads(packed) == {"type": "game_delta", "game_id": game_id, "event": "piece_moved", "changes": {
+        "status": wire.STATUSES.index("in_progress"), "winner_id": None,
+        "players": [{"id": 1, "pieces": [-1, 3, -1, -1]}],
+    }, "meta": {"player_id": 0, "captured_player_id": 1}}
+
+
+def test_pack_keeps_complete_players_and_learns_their_seats():
+    game_id, red = str(uuid4()), str(uuid4())
+    snapshot = {"id": game_id, "players": [{"id": red, "name": "Red", "order": 0, "color": "red"}],
+                "current_player_id": None, "winner_id": red}
+    assert wire.loads(wire.pack(snapshot)) == {
+        "id": game_id, "players": [{"id": red, "name": "Red", "order": 0, "color": wire.COLORS.index("red")}],
+        "current_player_id": None, "winner_id": 0,
+    }
+
+
+def test_loads_rejects_garbage():
+    with pytest.raises(ValueError):
+        wire.loads(b"\xc1")
+    with pytest.raises(ValueError):
+        wire.loads("{")
+
+
+def test_rest_responses_in_msgpack(client):
+    response = client.post("/api/games", json={"player_name": "Red"}, headers=MSGPACK)
+    assert response.headers["content-type"] == wire.MSGPACK_MEDIA_TYPE
+    game = wire.loads(response.content)
+    assert game["players"][0]["name"] == "Red"
+    assert game["status"] == wire.STATUSES.index("waiting")
+    # Errors stay JSON
+    response = client.get(f"/api/games/{uuid4()}", headers=MSGPACK)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Game not found"}
+
+
+def test_etag_varies_per_format(client):
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    path = f"/api/games/{game['id']}"
+    as_json, as_msgpack = client.get(path), client.get(path, headers=MSGPACK)
+    assert as_json.headers["etag"] != as_msgpack.headers["etag"]
+    assert as_msgpack.headers["content-type"] == wire.MSGPACK_MEDIA_TYPE
+    assert wire.loads(as_msgpack.content)["code"] == game["code"]
+    assert client.get(path, headers={"If-None-Match": as_json.headers["etag"], **MSGPACK}).status_code == 200
+    assert client.get(path, headers={"If-None-Match": as_msgpack.headers["etag"], **MSGPACK}).status_code == 304
+
+
+def next_delta(socket) -> dict:
+    while True:
+        message = wire.loads(socket.receive_bytes())
+        if message["type"] == "game_delta":
+            return message
+
+
+def test_msgpack_socket(client, dice):
+    game = client.post("/api/games", json={"player_name": "Red"}).json()
+    with client.websocket_connect(f"/ws/{game['code']}?format={wire.WS_FORMAT}") as socket:
+        client.post("/api/games/join", json={"code": game["code"], "player_name": "Blue"})
+        joined = next_delta(socket)
+        assert joined["game_id"] == game["id"]
+        # Complete players keep their UUID
+        blue = joined["changes"]["players"][0]
+        assert (blue["name"], blue["order"]) == ("Blue", 1)
+        client.post(f"/api/games/{game['id']}/start")
+        next_delta(socket)
+        # Commands may be sent as MessagePack frames too, with the player named by UUID
+        dice.append(4)
+        socket.send_bytes(msgpack.packb({"type": "command", "action": "roll",
+                                         "player_id": bytes.fromhex(blue["id"].replace("-", ""))}))
+        socket.send_bytes(msgpack.packb({"type": "command", "action": "roll", "player_id": game["players"][0]["id"]}))
+        assert wire.loads(socket.receive_bytes())["detail"] == "Not your turn"
+        reply = wire.loads(socket.receive_bytes())
+        assert (reply["type"], reply["ok"]) == ("command_result", True)
+        rolled = next_delta(socket)
+        assert (rolled["event"], rolled["meta"]["player_id"], rolled["meta"]["value"]) == ("dice_rolled", 0, 4)
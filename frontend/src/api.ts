@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { Game, DiceRollResponse, MoveResponse } from './types';
+import type { Game, DiceRollResponse, MatchTicket, MoveResponse } from './types';
 
 const API_BASE = '/api';
 
@@ -16,6 +16,12 @@ export const api = {
     return response.data;
   },
 
+  // Queue for a game with other players; wait for it with waitForMatch
+  findMatch: async (playerName: string): Promise<MatchTicket> => {
+    const response = await axios.post(`${API_BASE}/matchmaking`, { player_name: playerName });
+    return response.data;
+  },
+
   // Get game by ID
   getGame: async (gameId: string): Promise<Game> => {
     const response = await axios.get(`${API_BASE}/games/${gameId}`);
@@ -34,11 +40,20 @@ export const api = {
     return response.data;
   },
 
-  // Roll the dice
-  rollDice: async (gameId: string, playerId: string): Promise<DiceRollResponse> => {
+  // Roll the dice. expectedVersion makes the server reject the request with
+  // 409 if the game changed since the client last saw it (e.g. double clicks).
+  // With autoApply the server plays forced turns (one valid move, or none) itself
+  rollDice: async (
+    gameId: string,
+    playerId: string,
+    expectedVersion?: number,
+    autoApply = false
+  ): Promise<DiceRollResponse> => {
     const response = await axios.post(`${API_BASE}/games/roll-dice`, {
       game_id: gameId,
       player_id: playerId,
+      expected_version: expectedVersion,
+      auto_apply: autoApply,
     });
     return response.data;
   },
@@ -48,19 +63,24 @@ export const api = {
     gameId: string,
     playerId: string,
     pieceIndex: number,
-    diceValue: number
+    diceValue: number,
+    expectedVersion?: number
   ): Promise<MoveResponse> => {
     const response = await axios.post(`${API_BASE}/games/move`, {
       game_id: gameId,
       player_id: playerId,
       piece_index: pieceIndex,
       dice_value: diceValue,
+      expected_version: expectedVersion,
     });
     return response.data;
   },
 
   // Skip turn
-  skipTurn: async (gameId: string, playerId: string): Promise<void> => {
-    await axios.post(`${API_BASE}/games/${gameId}/skip-turn`, { player_id: playerId });
+  skipTurn: async (gameId: string, playerId: string, expectedVersion?: number): Promise<void> => {
+    await axios.post(`${API_BASE}/games/${gameId}/skip-turn`, {
+      player_id: playerId,
+      expected_version: expectedVersion,
+    });
   },
 };
@@ -37,7 +37,7 @@ const PlayerList: React.FC<PlayerListProps> = ({ players, currentPlayerIndex, cu
             >
               <div className="flex items-center gap-2">
                 <div className={`w-8 h-8 rounded-full ${colorConfig.bg} shadow-md flex items-center justify-center`}>
-                  <span className="text-white text-sm">🎮</span>
+                  <span className="text-white text-sm">{player.is_bot ? '🤖' : '🎮'}</span>
                 </div>
                 <div className="flex-1">
                   <div className={`font-bold ${colorConfig.text} flex items-center gap-1`}>
@@ -0,0 +1,53 @@
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { api } from '../api';
+import { applyGameDelta, subscribeToGame } from '../realtime';
+import type { Game, GameDelta } from '../types';
+
+// Keeps a game snapshot in sync: one fetch on mount, then pushed deltas.
+// A full snapshot is only requested again after a version gap or a reconnect.
+export const useGameState = (code: string | undefined, onDelta?: (delta: GameDelta) => void) => {
+  const [game, setGame] = useState<Game | null>(null);
+  const [error, setError] = useState(false);
+  const gameRef = useRef<Game | null>(null);
+  const onDeltaRef = useRef(onDelta);
+
+  useEffect(() => {
+    onDeltaRef.current = onDelta;
+  }, [onDelta]);
+
+  const update = useCallback((next: Game) => {
+    gameRef.current = next;
+    setGame(next);
+  }, []);
+
+  const refresh = useCallback(async () => {
+    if (!code) return;
+    try {
+      update(await api.getGameByCode(code));
+    } catch {
+      setError(true);
+    }
+  }, [code, update]);
+
+  useEffect(() => {
+    if (!code) return;
+    void refresh();
+    return subscribeToGame(
+      code,
+      delta => {
+        onDeltaRef.current?.(delta);
+        const current = gameRef.current;
+        if (!current) return;
+        const next = applyGameDelta(current, delta);
+        if (next === null) {
+          void refresh();
+        } else if (next !== current) {
+          update(next);
+        }
+      },
+      () => void refresh()
+    );
+  }, [code, refresh, update]);
+
+  return { game, error, refresh };
+};
@@ -1,7 +1,8 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { api } from '../api';
-import type { Game, DiceRollResponse, ValidMove } from '../types';
+import { useGameState } from '../hooks/useGameState';
+import type { DiceRollResponse, ValidMove } from '../types';
 import GameBoard from '../components/GameBoard';
 import Dice from '../components/Dice';
 import PlayerList from '../components/PlayerList';
@@ -9,37 +10,27 @@ import PlayerList from '../components/PlayerList';
 const GamePage: React.FC = () => {
   const { code } = useParams<{ code: string }>();
   const navigate = useNavigate();
-  const [game, setGame] = useState<Game | null>(null);
+  const { game, error, refresh } = useGameState(code);
   const [diceValue, setDiceValue] = useState<number | null>(null);
   const [isRolling, setIsRolling] = useState(false);
   const [validMoves, setValidMoves] = useState<ValidMove[]>([]);
   const [hasRolled, setHasRolled] = useState(false);
+  // Game version after our roll; the move is made against it
+  const [rollVersion, setRollVersion] = useState<number | null>(null);
   const [message, setMessage] = useState('');
   const [showWinner, setShowWinner] = useState(false);
 
   const playerId = localStorage.getItem('playerId');
 
-  const fetchGame = useCallback(async () => {
-    if (!code) return;
-    try {
-      const gameData = await api.getGameByCode(code);
-      setGame(gameData);
-
-      if (gameData.status === 'finished' && gameData.winner_id) {
-        setShowWinner(true);
-      }
-    } catch {
-      navigate('/');
-    }
-  }, [code, navigate]);
+  useEffect(() => {
+    if (error) navigate('/');
+  }, [error, navigate]);
 
   useEffect(() => {
-    void (async () => {
-      await fetchGame();
-    })();
-    const interval = setInterval(fetchGame, 2000);
-    return () => clearInterval(interval);
-  }, [fetchGame]);
+    if (game?.status === 'finished' && game.winner_id) {
+      setShowWinner(true);
+    }
+  }, [game?.status, game?.winner_id]);
 
   const currentPlayer = game?.players[game.current_player_index];
   const isMyTurn = currentPlayer?.id === playerId;
@@ -51,22 +42,40 @@ const GamePage: React.FC = () => {
     setMessage('');
 
     try {
-      const result: DiceRollResponse = await api.rollDice(game.id, playerId);
+      const result: DiceRollResponse = await api.rollDice(game.id, playerId, game.version, true);
       
       setTimeout(() => {
         setDiceValue(result.value);
         setIsRolling(false);
         setHasRolled(true);
-        setValidMoves(result.valid_moves);
-
-        if (!result.can_move) {
+        setRollVersion(result.version);
+        setValidMoves(result.applied ? [] : result.valid_moves);
+
+        const resetRoll = () => {
+          setHasRolled(false);
+          setDiceValue(null);
+          setValidMoves([]);
+        };
+
+        if (result.applied || result.value === 0) {
+          // The server already played the turn: the only move, a skip, or a penalty turn (value 0)
+          if (result.value === 0) {
+            setMessage('Пропускаш хода заради две шестици подред ⏳');
+          } else {
+            setMessage(result.applied === 'moved' ? '✅ Единствен възможен ход!' : 'Няма възможен ход! 😢');
+          }
+          if (result.move?.winner_id) setShowWinner(true);
+          setTimeout(resetRoll, 1500);
+        } else if (!result.can_move) {
           setMessage('Няма възможен ход! 😢');
           setTimeout(async () => {
-            await api.skipTurn(game.id, playerId);
-            setHasRolled(false);
-            setDiceValue(null);
-            setValidMoves([]);
-            fetchGame();
+            try {
+              await api.skipTurn(game.id, playerId, result.version);
+            } catch {
+              // The turn has already passed; the next delta shows the current state
+            } finally {
+              resetRoll();
+            }
           }, 1500);
         } else {
           setMessage(`Избери пионка за местене! (${result.valid_moves.length} възможни хода)`);
@@ -85,7 +94,7 @@ const GamePage: React.FC = () => {
     if (!move) return;
 
     try {
-      const result = await api.makeMove(game.id, playerId, pieceIndex, diceValue);
+      const result = await api.makeMove(game.id, playerId, pieceIndex, diceValue, rollVersion ?? game.version);
 
       if (result.success) {
         if (result.captured) {
@@ -101,14 +110,22 @@ const GamePage: React.FC = () => {
           setMessage('🎉 Хвърли 6! Играй пак, ако още е твой ред.');
         }
 
-        // Винаги чистим локалното състояние за хода и дърпаме ново game състояние
+        // Винаги чистим локалното състояние за хода; новото game състояние идва по WebSocket
         setHasRolled(false);
         setDiceValue(null);
         setValidMoves([]);
-        fetchGame();
       }
-    } catch {
-      setMessage('Грешка при местене');
+    } catch (e: unknown) {
+      const status = (e as { response?: { status?: number } })?.response?.status;
+      if (status === 409) {
+        // Играта се е променила междувременно (напр. двоен клик) - дърпаме актуалното състояние
+        setHasRolled(false);
+        setDiceValue(null);
+        setValidMoves([]);
+        void refresh();
+      } else {
+        setMessage('Грешка при местене');
+      }
     }
   };
 
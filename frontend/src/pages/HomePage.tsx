@@ -1,6 +1,7 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { api } from '../api';
+import { waitForMatch } from '../realtime';
 import type { Player } from '../types';
 
 const HomePage: React.FC = () => {
@@ -9,7 +10,11 @@ const HomePage: React.FC = () => {
   const [gameCode, setGameCode] = useState('');
   const [isCreating, setIsCreating] = useState(false);
   const [isJoining, setIsJoining] = useState(false);
+  const [isMatching, setIsMatching] = useState(false);
   const [error, setError] = useState('');
+  const leaveQueue = useRef<(() => void) | null>(null);
+
+  useEffect(() => () => leaveQueue.current?.(), []);
 
   const handleCreateGame = async () => {
     if (!playerName.trim()) {
@@ -57,6 +62,38 @@ const HomePage: React.FC = () => {
     }
   };
 
+  const handleQuickMatch = async () => {
+    if (isMatching) {
+      leaveQueue.current?.();
+      leaveQueue.current = null;
+      setIsMatching(false);
+      return;
+    }
+    if (!playerName.trim()) {
+      setError('Моля, въведи името си!');
+      return;
+    }
+    setIsMatching(true);
+    setError('');
+    try {
+      const ticket = await api.findMatch(playerName.trim());
+      leaveQueue.current = waitForMatch(ticket.ticket_id, message => {
+        leaveQueue.current = null;
+        setIsMatching(false);
+        if (message?.type === 'match_found' && message.player_id && message.game_code) {
+          localStorage.setItem('playerId', message.player_id);
+          localStorage.setItem('playerName', playerName.trim());
+          navigate(`/game/${message.game_code}`);
+        } else {
+          setError('Няма свободни играчи в момента. Опитай пак!');
+        }
+      });
+    } catch {
+      setIsMatching(false);
+      setError('Грешка при търсене на игра. Опитай пак!');
+    }
+  };
+
   return (
     <div className="min-h-screen flex items-center justify-center p-4">
       <div className="bg-white/95 backdrop-blur-sm rounded-3xl shadow-2xl p-8 w-full max-w-md">
@@ -97,6 +134,13 @@ const HomePage: React.FC = () => {
               {isCreating ? '⏳ Създавам...' : '🎮 Създай нова игра'}
             </button>
 
+            <button
+              onClick={handleQuickMatch}
+              className="w-full py-4 text-xl font-bold text-white bg-gradient-to-r from-purple-400 to-purple-600 rounded-xl shadow-lg hover:scale-105 transform transition-all duration-200"
+            >
+              {isMatching ? '⏳ Търся играчи... (откажи)' : '⚡ Бърза игра'}
+            </button>
+
             <div className="relative">
               <div className="absolute inset-0 flex items-center">
                 <div className="w-full border-t border-gray-300"></div>
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { api } from '../api';
-import type { Game } from '../types';
+import { useGameState } from '../hooks/useGameState';
 
 const COLORS = {
   red: { bg: 'bg-red-500', text: 'text-red-800', light: 'bg-red-100', border: 'border-red-300' },
@@ -13,33 +13,19 @@ const COLORS = {
 const LobbyPage: React.FC = () => {
   const { code } = useParams<{ code: string }>();
   const navigate = useNavigate();
-  const [game, setGame] = useState<Game | null>(null);
-  const [error, setError] = useState('');
+  const { game, error: notFound } = useGameState(code);
+  const [startError, setStartError] = useState('');
+  const error = notFound ? 'Играта не е намерена' : startError;
   const [isStarting, setIsStarting] = useState(false);
 
   const playerId = localStorage.getItem('playerId');
   const isHost = game?.players[0]?.id === playerId;
 
   useEffect(() => {
-    if (!code) return;
-
-    const fetchGame = async () => {
-      try {
-        const gameData = await api.getGameByCode(code);
-        setGame(gameData);
-
-        if (gameData.status === 'in_progress') {
-          navigate(`/game/${code}`);
-        }
-      } catch {
-        setError('Играта не е намерена');
-      }
-    };
-
-    fetchGame();
-    const interval = setInterval(fetchGame, 2000);
-    return () => clearInterval(interval);
-  }, [code, navigate]);
+    if (game?.status === 'in_progress') {
+      navigate(`/game/${code}`);
+    }
+  }, [game?.status, code, navigate]);
 
   const handleStartGame = async () => {
     if (!game) return;
@@ -49,7 +35,7 @@ const LobbyPage: React.FC = () => {
       navigate(`/game/${code}`);
     } catch (e: unknown) {
       const errorMessage = (e as { response?: { data?: { detail?: string } } })?.response?.data?.detail;
-      setError(errorMessage || 'Грешка при стартиране');
+      setStartError(errorMessage || 'Грешка при стартиране');
     } finally {
       setIsStarting(false);
     }
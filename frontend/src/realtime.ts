@@ -0,0 +1,122 @@
+import type { Game, GameDelta, MatchMessage } from './types';
+
+const RECONNECT_BASE_MS = 500;
+const RECONNECT_MAX_MS = 10000;
+// The server pings every 20s; a socket silent for longer is treated as dead
+const HEARTBEAT_TIMEOUT_MS = 45000;
+// Close code of a room whose game was expired or archived; do not reconnect
+const CLOSE_GAME_GONE = 4410;
+
+// Apply a versioned delta to a snapshot. Returns the same object for stale or
+// informational deltas, and null when a version gap means a snapshot is needed.
+export const applyGameDelta = (game: Game, delta: GameDelta): Game | null => {
+  if (delta.version <= game.version) return game;
+  if (delta.version !== game.version + 1) return null;
+
+  const { players: changedPlayers, ...fields } = delta.changes;
+  let players = game.players;
+  if (changedPlayers) {
+    players = [...game.players];
+    for (const change of changedPlayers) {
+      const idx = players.findIndex(p => p.id === change.id);
+      if (idx >= 0) {
+        players[idx] = { ...players[idx], ...change };
+      } else {
+        players.push(change as Game['players'][number]);
+      }
+    }
+  }
+  return { ...game, ...fields, players, version: delta.version };
+};
+
+// Subscribe to pushed deltas for a game. onReconnect fires after the socket is
+// re-established, since deltas sent while disconnected are lost.
+export const subscribeToGame = (
+  code: string,
+  onDelta: (delta: GameDelta) => void,
+  onReconnect: () => void
+): (() => void) => {
+  const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+  const url = `${protocol}://${window.location.host}/ws/${code}`;
+  let socket: WebSocket | null = null;
+  let attempts = 0;
+  let closed = false;
+  let timer: ReturnType<typeof setTimeout> | undefined;
+  let watchdog: ReturnType<typeof setTimeout> | undefined;
+
+  const scheduleReconnect = () => {
+    clearTimeout(watchdog);
+    if (closed) return;
+    const delay = Math.min(RECONNECT_BASE_MS * 2 ** attempts, RECONNECT_MAX_MS);
+    attempts += 1;
+    timer = setTimeout(connect, delay);
+  };
+
+  // Half-open connections may never fire onclose; abandon them after missed pings
+  const resetWatchdog = (ws: WebSocket) => {
+    clearTimeout(watchdog);
+    watchdog = setTimeout(() => {
+      ws.onclose = null;
+      ws.close();
+      scheduleReconnect();
+    }, HEARTBEAT_TIMEOUT_MS);
+  };
+
+  function connect() {
+    const ws = new WebSocket(url);
+    socket = ws;
+    ws.onopen = () => {
+      resetWatchdog(ws);
+      if (attempts > 0) onReconnect();
+      attempts = 0;
+    };
+    ws.onmessage = event => {
+      resetWatchdog(ws);
+      const message = JSON.parse(event.data);
+      if (message?.type === 'ping') {
+        ws.send(JSON.stringify({ type: 'pong' }));
+      } else if (message?.type === 'game_delta') {
+        onDelta(message as GameDelta);
+      }
+    };
+    ws.onclose = event => {
+      if (event.code === CLOSE_GAME_GONE) {
+        clearTimeout(watchdog);
+        return;
+      }
+      scheduleReconnect();
+    };
+  }
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    clearTimeout(watchdog);
+    socket?.close();
+  };
+};
+
+// Wait for a matchmaking ticket's game. onResult gets the one message the
+// server sends, or null if the socket closed without one. The returned
+// function leaves the queue.
+export const waitForMatch = (
+  ticketId: string,
+  onResult: (message: MatchMessage | null) => void
+): (() => void) => {
+  const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+  const ws = new WebSocket(`${protocol}://${window.location.host}/ws/matchmaking/${ticketId}`);
+  let done = false;
+  ws.onmessage = event => {
+    done = true;
+    onResult(JSON.parse(event.data) as MatchMessage);
+  };
+  ws.onclose = () => {
+    if (!done) onResult(null);
+    done = true;
+  };
+  return () => {
+    done = true;
+    ws.close();
+  };
+};
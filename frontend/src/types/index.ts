@@ -5,14 +5,17 @@ export interface Player {
   pieces: number[];
   order: number;
   is_connected: boolean;
+  is_bot: boolean;
 }
 
 export interface Game {
   id: string;
   code: string;
-  status: 'waiting' | 'in_progress' | 'finished';
+  status: 'waiting' | 'in_progress' | 'finished' | 'expired';
   current_player_index: number;
+  version: number;
   winner_id: string | null;
+  pending_roll: number | null;
   players: Player[];
   created_at: string;
 }
@@ -21,6 +24,9 @@ export interface DiceRollResponse {
   value: number;
   can_move: boolean;
   valid_moves: ValidMove[];
+  version: number;
+  applied: 'moved' | 'skipped' | null;
+  move: MoveResponse | null;
 }
 
 export interface ValidMove {
@@ -37,3 +43,26 @@ export interface MoveResponse {
   winner_id: string | null;
   message: string;
 }
+
+export interface GameDelta {
+  type: 'game_delta';
+  game_id: string;
+  version: number;
+  event: string;
+  changes: Partial<Omit<Game, 'players'>> & { players?: Array<Partial<Player> & { id: string }> };
+  meta: Record<string, unknown>;
+}
+
+export interface MatchTicket {
+  ticket_id: string;
+  status: 'waiting' | 'matched' | 'expired' | 'cancelled';
+  game_id: string | null;
+  game_code: string | null;
+  player_id: string | null;
+}
+
+// Sent once on /ws/matchmaking/{ticket_id} when the ticket stops waiting
+export interface MatchMessage extends MatchTicket {
+  type: 'match_found' | 'match_expired' | 'match_cancelled';
+  game: Game | null;
+}